@@ -5,3 +5,6 @@ from gflex import *
 from f1d import *
 from f2d import *
 from base import *
+from solvers import *
+from matrix_cache import *
+from profiling import *
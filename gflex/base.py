@@ -21,10 +21,15 @@ from __future__ import print_function
 import sys, os
 from six.moves import configparser
 import numpy as np
+import scipy.sparse
+import scipy.fft
 import time # For efficiency counting
 import types # For flow control
 from matplotlib import pyplot as plt
 from _version import __version__
+from solvers import factor_nnz
+import matrix_cache
+import profiling
 
 class Utility(object):
 
@@ -569,6 +574,109 @@ class Flexure(Utility, Plotting):
     except:
       self.PlanetaryRadius = None
 
+    # Reuse of the finite difference operator between runs.
+    # The coefficient matrix signature records the parameters that a
+    # gFlex-built coefficient matrix was made with, so it can be discarded
+    # when they change. If ReuseFactorization is True, the coefficient matrix
+    # is kept through finalize() and its LU factorization is stored, so
+    # subsequent runs with new loads need only forward/back substitution.
+    self.ReuseFactorization = False
+    self.coeff_matrix_signature = None
+    self.coeff_factor = None
+    self.coeff_factor_matrix = None
+    self.coeff_factor_options = None
+    # F2D direct solutions: fill-reducing ordering of the unknowns for the
+    # sparse factorization ('nested_dissection', 'rcm', 'colamd', 'mmd_ata',
+    # 'mmd_at_plus_a', 'natural', or None for the default of the solver),
+    # the permutation for it (kept for as long as the grid and boundary
+    # conditions are the same), and the number of nonzeros in the factors
+    self.Ordering = None
+    self.coeff_permutation = None
+    self.coeff_permutation_key = None
+    self.factor_nnz = None
+    # Weights applied to the loads for operators assembled from the plate
+    # energy (F2D, PlateSolutionType = 'energy'); None otherwise
+    self.coeff_load_weights = None
+
+    # Iterative solutions: relative residual tolerance, maximum number of
+    # (outer) iterations (None for the scipy default), preconditioner
+    # for the F2D iterative solver ('ilu', 'jacobi', 'multigrid' or None),
+    # and whether to start from the previous solution (e.g., the deflection
+    # at the last time step)
+    self.iterative_ConvergenceTolerance = 1E-8
+    self.MaxIterations = None
+    self.Preconditioner = 'ilu'
+    self.WarmStart = True
+    # Iterative solutions: how they converged (see record_convergence;
+    # None for direct solutions), functions called as callback(iteration,
+    # residual) at each iteration, and whether a solution that does not
+    # converge is an error (otherwise, a warning)
+    self.convergence = None
+    self.iterative_callbacks = []
+    self.RequireConvergence = False
+    # F2D iterative solutions: apply the finite difference stencil directly
+    # instead of building the sparse coefficient matrix (less memory)
+    self.MatrixFree = False
+    # F2D Schwarz domain decomposition: size of the subdomains and their
+    # overlap (in cells), and the number of worker processes to factorize
+    # and solve them (None: one for each core); this is also the number of
+    # threads for the fast Fourier transforms
+    self.SubdomainSize = 256
+    self.SubdomainOverlap = 8
+    self.Processes = None
+    # F2D gridded SAS solutions: how the solutions for the loaded cells are
+    # summed: 'fft' (a convolution), 'direct' (one by one), or 'auto'
+    # (whichever should be faster for the number of loaded cells)
+    self.SASConvolution = 'auto'
+    # FFT solutions: the Fourier transform of the plate, kept for the next
+    # load, and what it was computed from (see fft_transfer)
+    self.fft_transfer_array = None
+    self.fft_transfer_signature = None
+    # F2D quadtree solutions: the number of times that the largest blocks
+    # (cells of the coarsest level) are split (None: chosen from the
+    # flexural wavelength), the relative change in the load or elastic
+    # thickness from one cell to the next that the quadtree is refined
+    # around, and how many blocks of each size there are before the next
+    # larger size
+    self.QuadtreeLevels = None
+    self.QuadtreeTolerance = 0.01
+    self.QuadtreeGrading = 4
+    # F2D mixed-precision solutions: relative residual |q - A w| / |q| reached
+    # by iterative refinement of the single-precision solution
+    self.refinement_residual = None
+    # F1D finite differences: coordinates [m] of the nodes, which may be
+    # unevenly spaced, in place of an even spacing dx (None: use dx)
+    self.x_nodes = None
+    # Finite differences: pad the grid out by one maximum flexural wavelength
+    # past each edge that is not periodic or mirrored, in cells that grow
+    # coarser away from it (F1D: each PaddingGrowth times the size of the
+    # one before it), and the numbers of cells added at the edges (F1D:
+    # west, east; F2D: north, south, west, east)
+    self.Padding = False
+    self.PaddingGrowth = 1.1
+    self.padding_cells = None
+    # On-disk cache of finite difference coefficient matrices (None: not
+    # used), with the limits on its total size [MB] and on how long a matrix
+    # may go unused [days] before it is evicted (None: no limit), and the
+    # numbers of matrices that this model has found and not found there
+    self.CacheDirectory = None
+    self.CacheMaxSize = None
+    self.CacheMaxAge = None
+    self.cache_hits = 0
+    self.cache_misses = 0
+    # Share coefficient matrices and factorizations with the other models in
+    # this process that set this, through matrix_cache.operator_cache
+    self.ShareOperators = False
+    # Metrics of the last run: the wall time [s] of each of its stages (see
+    # stage()), and with ProfileMemory, the peak memory [bytes] that each
+    # allocates, and the sizes of the grid, coefficient matrix and factors;
+    # functions called as callback(stage, record) at the end of each stage;
+    # and a file (.json or .csv) to which output() writes the metrics
+    self.metrics = {'stages': {}}
+    self.metrics_callbacks = []
+    self.ProfileMemory = False
+    self.metricsOutFile = None
+
   def initialize(self, filename=None):
     # Values from configuration file
 
@@ -614,6 +722,10 @@ class Flexure(Utility, Plotting):
         self.Quiet = self.configGet("bool", "verbosity", "Quiet", optional=False)
       except:
         pass
+      # Tracing of the memory allocated in each stage of the run
+      ProfileMemory = self.configGet("bool", "output", "ProfileMemory", optional=True)
+      if ProfileMemory is not None:
+        self.ProfileMemory = ProfileMemory
     # Quiet overrides all others
     if self.Quiet:
       self.Debug = False
@@ -659,7 +771,13 @@ class Flexure(Utility, Plotting):
       if self.Method != 'SAS_NG':
         # No meaning for ungridded superimposed analytical solutions
         # From configuration file
-        self.dx = self.configGet("float", "numerical", "GridSpacing_x")
+        if self.dimension == 1:
+          # Or the coordinates of unevenly spaced nodes
+          x_nodes = self.configGet("string", "numerical", "GridCoordinates_x", optional=True)
+          if x_nodes:
+            self.x_nodes = self.loadFile(x_nodes)
+        if self.x_nodes is None:
+          self.dx = self.configGet("float", "numerical", "GridSpacing_x")
         if self.dimension == 2:
           self.dy = self.configGet("float", "numerical2D", "GridSpacing_y")
 
@@ -707,7 +825,7 @@ class Flexure(Utility, Plotting):
       self.q0
     except:
       self.q0 = None
-    if self.q0 == '':
+    if isinstance(self.q0, str) and self.q0 == '':
       self.q0 = None
     if type(self.q0) == str:
       self.q0 = self.loadFile(self.q0) # Won't do this if q0 is None
@@ -743,13 +861,26 @@ class Flexure(Utility, Plotting):
 
   # Finalize
   def finalize(self):
-    # Can include an option for this later, but for the moment, this will
-    # clear the coefficient array so it doens't cause problems for model runs
-    # searching for the proper rigidity
-    try:
-      del self.coeff_matrix
-    except:
+    # Clear the coefficient array so it doens't cause problems for model runs
+    # searching for the proper rigidity -- unless it has been requested that
+    # it be kept (with its factorization) for repeated runs. In that case,
+    # it is checked against the model parameters at the start of each run.
+    if self.ReuseFactorization:
       pass
+    else:
+      try:
+        del self.coeff_matrix
+      except:
+        pass
+      self.coeff_matrix_signature = None
+      self.release_coeff_factor()
+      self.fft_transfer_array = None
+      self.fft_transfer_signature = None
+    if self.CacheDirectory is not None and self.Quiet == False:
+      report = matrix_cache.cache_report(self.CacheDirectory)
+      print("Coefficient matrix cache:", report['entries'], "matrices,",
+            "%.1f MB;" % report['size'], report['hits'], "hits and",
+            report['misses'], "misses in all")
     if self.Quiet==False:
       print("")
 
@@ -759,8 +890,10 @@ class Flexure(Utility, Plotting):
   # (for standalone model use)
   def output(self):
     if self.Verbose: print("Output step")
-    self.outputDeflections()
-    self.plotting()
+    with self.stage('output'):
+      self.outputDeflections()
+      self.plotting()
+    self.outputMetrics()
 
   # Save output deflections to file, if desired
   def outputDeflections(self):
@@ -794,11 +927,82 @@ class Flexure(Utility, Plotting):
           save(self.wOutFile,self.w)
         else:
           from numpy import savetxt
+          if self.w.ndim > 2:
+            sys.exit("A stack of 2D deflection grids can only be written to a .npy file. Exiting.")
           # Shouldn't need more than mm precision, at very most
           savetxt(self.wOutFile,self.w,fmt='%.3f')
           if self.Verbose:
             print("Saving deflections --> " + self.wOutFile)
 
+  # Save the metrics of the run to file, if desired
+  def outputMetrics(self):
+    """
+    Writes the metrics of the run (self.metrics) to a file if one is named
+    by MetricsOut in the configuration file (or by metricsOutFile): a JSON
+    file, or if the filename ends in ".csv", a row of a CSV file, which is
+    added to the file if it is already there.
+    """
+    if self.metricsOutFile is None and self.filename:
+      self.metricsOutFile = self.configGet("string", "output", "MetricsOut", optional=True)
+    if self.metricsOutFile:
+      profiling.write_metrics(self.metrics, self.metricsOutFile)
+      if self.Verbose:
+        print("Saving metrics --> " + self.metricsOutFile)
+
+  # PROFILING
+
+  def stage(self, name):
+    """
+    with self.stage(name):
+      ...
+
+    Records the wall time (and with ProfileMemory, the peak memory) of
+    what it encloses as that of the named stage of the run, in
+    self.metrics['stages'][name], and calls each of the metrics_callbacks
+    with it (see profiling.Stage). Stages may be nested: the solution
+    includes the factorization, for example.
+    """
+    return profiling.Stage(self.metrics, name, self.ProfileMemory,
+                           self.metrics_callbacks)
+
+  def start_metrics(self):
+    """
+    Clears the metrics of the last run, at the start of a new one
+    """
+    self.metrics = {'stages': {}}
+
+  def record_metrics(self):
+    """
+    Adds the size of the problem, and of the coefficient matrix and its
+    factors (for the finite difference method), to the metrics at the end
+    of the run
+    """
+    metrics = self.metrics
+    metrics['dimension'] = self.dimension
+    metrics['method'] = self.Method
+    metrics['time_to_solve'] = self.time_to_solve
+    metrics['max_rss'] = profiling.max_rss()
+    grid_shape = getattr(self, 'grid_shape', None)
+    if grid_shape is not None:
+      metrics['grid_shape'] = [int(n) for n in grid_shape]
+      metrics['cells'] = int(np.prod(grid_shape))
+      metrics['nloads'] = self.nloads
+    if self.Method == 'FD':
+      metrics['solver'] = self.Solver
+      metrics['plate_solution_type'] = getattr(self, 'PlateSolutionType', None)
+      if scipy.sparse.issparse(self.coeff_matrix):
+        metrics['unknowns'] = self.coeff_matrix.shape[0]
+        metrics['nnz'] = self.coeff_matrix.nnz
+      if self.coeff_factor is not None:
+        metrics['factor_nnz'] = self.factor_nnz
+        # Fewer for a reduced (e.g., quadtree) system
+        metrics['factor_unknowns'] = getattr(self.coeff_factor, 'unknowns', None)
+      if self.convergence is not None:
+        # The slowest of the loads
+        metrics['iterations'] = max(self.convergence['iterations'])
+        metrics['relative_residual'] = max(self.convergence['relative_residual'])
+        metrics['converged'] = self.convergence['converged']
+
   def bc_check(self):
     # Check that boundary conditions are acceptable with code implementation
     # Acceptable b.c.'s
@@ -843,6 +1047,28 @@ class Flexure(Utility, Plotting):
                        +"Exiting.")
           else:
             sys.exit("For a flexural solution, grid must be 1D or 2D. Exiting.")
+    elif self.Method == 'FFT':
+      # Spectral solution: each axis is periodic, or is padded with zeros to
+      # make the plate an isolated one, as in the analytical solutions
+      # (NoOutsideLoads, which is also what no entry means)
+      pairs = [['BC_W', 'BC_E']]
+      if self.dimension == 2:
+        pairs.append(['BC_N', 'BC_S'])
+      for pair in pairs:
+        bcs = []
+        for name in pair:
+          bc = getattr(self, name, '')
+          if bc == '':
+            bc = 'NoOutsideLoads'
+            setattr(self, name, bc)
+          if bc != 'Periodic' and bc != 'NoOutsideLoads':
+            sys.exit("'"+bc+"' is not an acceptable boundary condition for the FFT\n"\
+                     +"solution method, which must be either 'Periodic' or\n"\
+                     +"'NoOutsideLoads'. Exiting.")
+          bcs.append(bc)
+        if bcs[0] != bcs[1]:
+          sys.exit("For the FFT solution method, "+pair[0]+" and "+pair[1]+" must\n"\
+                   +"either both be 'Periodic' or both be 'NoOutsideLoads'. Exiting.")
     else:
       # Analytical solution boundary conditions
       # If they aren't set, it is because no input file has been used
@@ -903,7 +1129,7 @@ class Flexure(Utility, Plotting):
     each other (for finite difference if loading a pre-build coefficient
     array). Otherwise, exit.
     """
-    if prod(self.coeff_matrix.shape) != long(prod(np.array(self.qs.shape,dtype=int64)+2)**2):
+    if prod(self.coeff_matrix.shape) != long(prod(np.array(self.grid_shape,dtype=int64)+2)**2):
       print("Inconsistent size of q0 array and coefficient mattrix")
       print("Exiting.")
       sys.exit()
@@ -914,16 +1140,269 @@ class Flexure(Utility, Plotting):
     For finite difference solution.
     """
     # Only if they are both defined and are arrays
-    # Both being arrays is a possible bug in this check routine that I have 
+    # Both being arrays is a possible bug in this check routine that I have
     # intentionally introduced
     if type(self.Te) == np.ndarray and type(self.qs) == np.ndarray:
       # Doesn't touch non-arrays or 1D arrays
       if type(self.Te) is np.ndarray:
-        if (np.array(self.Te.shape) != np.array(self.qs.shape)).any():
+        if (np.array(self.Te.shape) != np.array(self.grid_shape)).any():
           sys.exit("q0 and Te arrays have incompatible shapes. Exiting.")
       else:
         if self.Debug: print("Te and qs array sizes pass consistency check")
 
+  def set_grid_shape(self):
+    """
+    Loads may be given either as a single grid or as a stack of grids along
+    an extra leading axis, all of which are solved for the same plate.
+    This records the shape of a single load grid (self.grid_shape) and the
+    number of stacked loads (self.nloads; None if qs is a single grid).
+    """
+    if self.qs.ndim == self.dimension:
+      self.nloads = None
+    elif self.qs.ndim == self.dimension + 1:
+      self.nloads = self.qs.shape[0]
+    else:
+      sys.exit("qs must have "+str(self.dimension)+" dimensions, or "\
+               +str(self.dimension+1)+" for a stack of loads. Exiting.")
+    self.grid_shape = self.qs.shape[-self.dimension:]
+
+  def operator_signature(self):
+    """
+    Returns a hash of all of the inputs that go into the finite difference
+    coefficient matrix: Te, grid size and spacing (or node coordinates), boundary conditions,
+    elastic and density parameters, and the plate solution type, and the
+    versions of gFlex and of the format of the cached matrices (so that a
+    matrix cached by another version is not used).
+
+    This is used to decide whether a coefficient matrix (and its
+    factorization) from a previous run can be used again.
+    """
+    import hashlib
+    sig = hashlib.sha1()
+    sig.update(repr((__version__, matrix_cache.FORMAT_VERSION)).encode())
+    if np.isscalar(self.Te):
+      sig.update(repr(float(self.Te)).encode())
+    else:
+      Te = np.ascontiguousarray(self.Te, dtype=float)
+      sig.update(repr(Te.shape).encode())
+      sig.update(Te.tobytes())
+    params = [self.dimension, self.grid_shape, getattr(self, 'dx', None), self.E, self.nu,
+              self.drho, self.g, self.BC_W, self.BC_E]
+    if self.dimension == 1 and self.x_nodes is not None:
+      sig.update(np.ascontiguousarray(self.x_nodes, dtype=float).tobytes())
+    if self.dimension == 2:
+      params += [self.dy, self.BC_N, self.BC_S, self.PlateSolutionType,
+                 self.MatrixFree]
+    sig.update(repr(params).encode())
+    return sig.hexdigest()
+
+  def check_coeff_matrix(self):
+    """
+    Discards a coefficient matrix that gFlex built during a previous run
+    (along with any stored factorization of it) if the parameters that
+    define it have since changed.
+    Coefficient matrices supplied by the user are left alone.
+    """
+    if self.coeff_matrix is not None and self.coeff_matrix_signature is not None:
+      if self.coeff_matrix_signature != self.operator_signature():
+        if self.Verbose:
+          print("Model parameters have changed: rebuilding coefficient matrix")
+        self.coeff_matrix = None
+        self.coeff_matrix_signature = None
+        self.release_coeff_factor()
+
+  def load_cached_coeff_matrix(self):
+    """
+    Looks for a coefficient matrix built with the same model parameters
+    (see operator_signature) by any model in this process (in the shared
+    operator_cache, with ShareOperators) or in the on-disk cache,
+    CacheDirectory, and if there is one, uses it (returning True) so that
+    it need not be built.
+    """
+    if self.MatrixFree:
+      return False
+    signature = self.operator_signature()
+    cached = None
+    if self.ShareOperators:
+      cached = matrix_cache.operator_cache.get(('matrix', signature))
+    if cached is not None:
+      A, load_weights = cached
+      if self.Verbose:
+        print("Using coefficient matrix shared with another model")
+    elif self.CacheDirectory is not None:
+      A, load_weights = matrix_cache.read_coeff_matrix(self.CacheDirectory, signature)
+      matrix_cache.record_lookup(self.CacheDirectory, A is not None)
+      if A is None:
+        self.cache_misses += 1
+        if self.Verbose:
+          print("Coefficient matrix not found in cache:", self.CacheDirectory)
+        return False
+      self.cache_hits += 1
+      self.share_coeff_matrix(signature, A, load_weights)
+      if self.Quiet == False:
+        print("Loaded coefficient matrix from cache:", self.CacheDirectory)
+    else:
+      return False
+    self.coeff_matrix = A
+    self.coeff_load_weights = load_weights
+    self.coeff_matrix_signature = signature
+    return True
+
+  def save_cached_coeff_matrix(self):
+    """
+    Shares the coefficient matrix that has just been built with the other
+    models in this process, and stores it in the on-disk cache,
+    CacheDirectory (if one is set). The matrices in that cache that have
+    gone unused for longer than CacheMaxAge days are then evicted, and then
+    the least recently used ones, until it is no larger than CacheMaxSize
+    megabytes.
+    """
+    if not scipy.sparse.issparse(self.coeff_matrix):
+      return
+    self.share_coeff_matrix(self.coeff_matrix_signature, self.coeff_matrix,
+                            self.coeff_load_weights)
+    if self.CacheDirectory is None:
+      return
+    # The cache is only an aid: failing to write to it does not stop the run
+    try:
+      matrix_cache.write_coeff_matrix(self.CacheDirectory,
+                                      self.coeff_matrix_signature,
+                                      self.coeff_matrix, self.coeff_load_weights)
+      evicted = matrix_cache.evict(self.CacheDirectory, self.CacheMaxSize,
+                                   self.CacheMaxAge)
+    except (IOError, OSError) as error:
+      print("Warning: could not save coefficient matrix to cache:", error)
+      return
+    if self.Verbose:
+      print("Saved coefficient matrix to cache:", self.CacheDirectory)
+      if evicted:
+        print("Evicted", evicted, "coefficient matrices from cache")
+
+  def share_coeff_matrix(self, signature, A, load_weights):
+    """
+    Adds the coefficient matrix A (and the weights for the loads) to the
+    operator_cache of this process, with ShareOperators
+    """
+    if not self.ShareOperators:
+      return
+    size = matrix_cache.nbytes(A)
+    if load_weights is not None:
+      size += load_weights.nbytes
+    matrix_cache.operator_cache.put(('matrix', signature), (A, load_weights), size)
+
+  def factorize_coeff_matrix(self):
+    """
+    LU-factorizes the coefficient matrix (SuperLU) and stores the factor
+    object in self.coeff_factor. Its solve() method can then be used for
+    any number of loads at the cost of forward and back substitution.
+
+    For iterative solvers, the stored object is instead the preconditioner
+    (or multigrid hierarchy), which is likewise set up once.
+
+    The factorization is redone only if the coefficient matrix (or the
+    choice of solver or preconditioner) has changed since it was last
+    factorized, and with ShareOperators, it is shared with the other models
+    in this process through the operator_cache.
+    """
+    options = self.factor_options()
+    if self.coeff_factor is None or self.coeff_factor_matrix is not self.coeff_matrix \
+       or self.coeff_factor_options != options:
+      # A factorization of the same matrix by another model in this process
+      # (only for matrices that gFlex built, which have a signature)
+      self.release_coeff_factor()
+      key = None
+      factor = None
+      if self.ShareOperators and self.coeff_matrix_signature is not None:
+        key = ('factor', self.coeff_matrix_signature, options,
+               self.iterative_ConvergenceTolerance, self.MaxIterations)
+        factor = matrix_cache.operator_cache.get(key)
+      if factor is not None:
+        self.coeff_factor = factor
+        self.coeff_factor_matrix = self.coeff_matrix
+        self.coeff_factor_options = options
+        self.factor_nnz = factor_nnz(factor)
+        if self.Verbose:
+          print("Using factorization shared with another model")
+        return
+      factor_start_time = time.time()
+      with self.stage('factorization'):
+        self.coeff_factor = self.new_coeff_factor()
+      self.coeff_factor_matrix = self.coeff_matrix
+      self.coeff_factor_options = options
+      if key is not None:
+        matrix_cache.operator_cache.put(key, self.coeff_factor)
+      self.factorization_time = time.time() - factor_start_time
+      self.factor_nnz = factor_nnz(self.coeff_factor)
+      if self.Quiet == False:
+        print("Time to factorize coefficient matrix [s]:", self.factorization_time)
+        if self.factor_nnz is not None:
+          print("Nonzero entries in factors:", self.factor_nnz)
+    elif self.Debug:
+      print("Using stored factorization of coefficient matrix")
+
+  def release_coeff_factor(self):
+    """
+    Drops the stored factorization, first stopping the worker processes of
+    one that has them (the Schwarz solver)
+    """
+    try:
+      self.coeff_factor.close()
+    except AttributeError:
+      pass
+    self.coeff_factor = None
+    self.coeff_factor_matrix = None
+
+  def record_convergence(self, A, x, b, history, info):
+    """
+    Stores how an iterative solution of A x = b (with a column for each
+    load) converged in self.convergence:
+      history: the relative residual at each iteration (see KrylovMonitor)
+      iterations: the number of iterations
+      info: the flag returned by the solver (0 if it converged)
+      residual: the final true residual |A x - b| (i.e., |A w + q|)
+      relative_residual: the final residual relative to |b|
+      converged: whether the solution for every load converged
+    (each but the last with one entry for each load), and warns if it did
+    not converge, or with RequireConvergence, exits.
+    """
+    x = x.reshape(b.shape[0], -1)
+    b = b.reshape(b.shape[0], -1)
+    residual = np.linalg.norm(A.dot(x) - b, axis=0)
+    bnorm = np.linalg.norm(b, axis=0)
+    relative_residual = residual / np.where(bnorm > 0, bnorm, 1.)
+    info = [int(flag) for flag in info]
+    self.convergence = {'history': history,
+                        'iterations': [len(h) for h in history],
+                        'info': info,
+                        'residual': residual.tolist(),
+                        'relative_residual': relative_residual.tolist(),
+                        'converged': all(flag == 0 for flag in info)}
+    if not self.convergence['converged']:
+      message = "iterative solution did not converge: relative residual " \
+                + str(relative_residual.max()) + " after " \
+                + str(max(self.convergence['iterations'])) + " iterations"
+      if self.RequireConvergence:
+        sys.exit("Error: " + message + ". Exiting.")
+      else:
+        print("Warning: " + message)
+
+  def factor_options(self):
+    """
+    The choices, besides the coefficient matrix itself, that its
+    factorization depends on: if any of them change, it is redone
+    """
+    return (self.Solver, self.Preconditioner, self.Ordering,
+            self.SubdomainSize, self.SubdomainOverlap, self.Processes)
+
+  def new_coeff_factor(self):
+    """
+    Returns a new factorization of the coefficient matrix; the general
+    sparse LU (SuperLU) unless a subclass has a better option for its
+    operator.
+    """
+    from scipy.sparse.linalg import splu
+    return splu(self.coeff_matrix.tocsc())
+
   ### need to determine its interface, it is best to have a uniform interface
   ### no matter it is 1D or 2D; but if it can't be that way, we can set up a
   ### variable-length arguments, which is the way how Python overloads functions.
@@ -947,11 +1426,21 @@ class Flexure(Utility, Plotting):
       # Remove self.q0 to avoid issues with multiply-defined inputs
       # q0 is the parsable input to either a qs grid or contains (x,(y),q)
       del self.q0
+    # Single load grid or a stack of them
+    self.set_grid_shape()
     # Give it x and y dimensions for help with plotting tools
     # (not implemented internally, but a help with external methods)
-    self.x = np.arange(self.dx/2., self.dx * self.qs.shape[0], self.dx)
+    if self.dimension == 1 and self.x_nodes is not None:
+      self.x_nodes = np.asarray(self.x_nodes, dtype=float)
+      if self.x_nodes.shape != self.grid_shape:
+        sys.exit("x_nodes must have one coordinate for each node of qs. Exiting.")
+      if (np.diff(self.x_nodes) <= 0).any():
+        sys.exit("x_nodes must be monotonically increasing. Exiting.")
+      self.x = self.x_nodes
+    else:
+      self.x = np.arange(self.dx/2., self.dx * self.grid_shape[0], self.dx)
     if self.dimension == 2:
-      self.y = np.arange(self.dy/2., self.dy * self.qs.shape[1], self.dy)
+      self.y = np.arange(self.dy/2., self.dy * self.grid_shape[1], self.dy)
     # Is there a solver defined
     try:
       self.Solver # See if it exists already
@@ -966,24 +1455,72 @@ class Flexure(Utility, Plotting):
     if self.filename:
       # In the case that it is iterative, find the convergence criterion
       self.iterative_ConvergenceTolerance = self.configGet("float", "numerical", "ConvergenceTolerance")    
-      # Try to import Te grid or scalar for the finite difference solution
+      # Optional limit on iterations and choice of preconditioner
+      MaxIterations = self.configGet("integer", "numerical", "MaxIterations", optional=True)
+      if MaxIterations is not None:
+        self.MaxIterations = MaxIterations
+      RequireConvergence = self.configGet("bool", "numerical", "RequireConvergence", optional=True)
+      if RequireConvergence is not None:
+        self.RequireConvergence = RequireConvergence
+      CacheDirectory = self.configGet("string", "numerical", "CacheDirectory", optional=True)
+      if CacheDirectory:
+        self.CacheDirectory = CacheDirectory
+      for name in ["CacheMaxSize", "CacheMaxAge", "PaddingGrowth"]:
+        value = self.configGet("float", "numerical", name, optional=True)
+        if value is not None:
+          setattr(self, name, value)
+      Padding = self.configGet("bool", "numerical", "Padding", optional=True)
+      if Padding is not None:
+        self.Padding = Padding
+      ShareOperators = self.configGet("bool", "numerical", "ShareOperators", optional=True)
+      if ShareOperators is not None:
+        self.ShareOperators = ShareOperators
+      if self.dimension == 2:
+        Preconditioner = self.configGet("string", "numerical2D", "Preconditioner", optional=True)
+        if Preconditioner is not None:
+          self.Preconditioner = Preconditioner
+        MatrixFree = self.configGet("bool", "numerical2D", "MatrixFree", optional=True)
+        if MatrixFree is not None:
+          self.MatrixFree = MatrixFree
+        Ordering = self.configGet("string", "numerical2D", "Ordering", optional=True)
+        if Ordering:
+          self.Ordering = Ordering
+        for name in ["SubdomainSize", "SubdomainOverlap", "Processes",
+                     "QuadtreeLevels", "QuadtreeGrading"]:
+          value = self.configGet("integer", "numerical2D", name, optional=True)
+          if value is not None:
+            setattr(self, name, value)
+        QuadtreeTolerance = self.configGet("float", "numerical2D", "QuadtreeTolerance", optional=True)
+        if QuadtreeTolerance is not None:
+          self.QuadtreeTolerance = QuadtreeTolerance
+      # Try to import Te grid or scalar for the finite difference solution,
+      # but only on the first run: after that, Te may have been changed
+      # (e.g., by update_Te or sweep_Te), and the change is kept
       try:
-        self.Te = self.configGet("float", "input", "ElasticThickness", optional=False)
-        if self.Te is None:
+        self.Te
+      except AttributeError:
+        try:
+          self.Te = self.configGet("float", "input", "ElasticThickness", optional=False)
+          if self.Te is None:
+            Tepath = self.configGet("string", "input", "ElasticThickness", optional=False)
+            self.Te = Tepath
+          else:
+            Tepath = None
+        except:
           Tepath = self.configGet("string", "input", "ElasticThickness", optional=False)
           self.Te = Tepath
-        else:
-          Tepath = None
-      except:
-        Tepath = self.configGet("string", "input", "ElasticThickness", optional=False)
-        self.Te = Tepath
-      if self.Te is None:
-        if self.coeff_matrix is not None:
-          pass
-        else:
-          # Have to bring this out here in case it was discovered in the 
-          # try statement that there is no value given
-          sys.exit("No input elastic thickness or coefficient matrix supplied.")
+        if self.Te is None:
+          if self.coeff_matrix is not None:
+            pass
+          else:
+            # Have to bring this out here in case it was discovered in the 
+            # try statement that there is no value given
+            sys.exit("No input elastic thickness or coefficient matrix supplied.")
+    # Padding cells that shrank away from the grid would never reach past
+    # a flexural wavelength
+    if self.Padding and not self.PaddingGrowth >= 1:
+      sys.exit("PaddingGrowth must be at least 1: each padding cell is this\n"+
+               "many times the size of the one before it. Exiting.")
     # or if getter/setter
     if type(self.Te) == str: 
       # Try to import Te grid or scalar for the finite difference solution
@@ -1011,9 +1548,104 @@ class Flexure(Utility, Plotting):
       if self.Te.any():
         self.TeArraySizeCheck()
     
-  ### need work
+  def scalar_Te_from_config(self):
+    """
+    The elastic thickness from the configuration file, for the solution
+    methods that require a scalar one (FFT, SAS and SAS_NG); exits if it
+    is instead the path to a Te grid
+    """
+    Te = self.configGet("string", "input", "ElasticThickness")
+    try:
+      return float(Te)
+    except ValueError:
+      sys.exit("The " + self.Method + " solution method requires a scalar elastic\n"\
+               +"thickness, but ElasticThickness is '" + Te + "'.\n"\
+               +"Use FD for a Te grid. Exiting.")
+
   def FFT(self):
-    pass
+    """
+    Set-up for the spectral (fast Fourier transform) solution method, which
+    requires a constant elastic thickness
+    """
+    if self.Verbose:
+      print("Fast Fourier Transform Solution Technique")
+    if self.filename:
+      # Define the (scalar) elastic thickness
+      self.Te = self.scalar_Te_from_config()
+      if self.dimension == 2:
+        # Threads for the transforms
+        Processes = self.configGet("integer", "numerical2D", "Processes", optional=True)
+        if Processes is not None:
+          self.Processes = Processes
+    # Define a stress-based qs = q0
+    # But only if the latter has not already been defined
+    # (e.g., by the getters and setters)
+    try:
+      self.qs
+    except:
+      self.qs = self.q0.copy()
+      # Remove self.q0 to avoid issues with multiply-defined inputs
+      # q0 is the parsable input to either a qs grid or contains (x,(y),q)
+      del self.q0
+    # A uniform Te grid is as good as a scalar
+    if np.ndim(self.Te):
+      if np.ptp(self.Te) > 0:
+        sys.exit("The FFT solution method requires a constant elastic thickness.\n"\
+                 +"Use FD for a Te that varies. Exiting.")
+      self.Te = float(np.max(self.Te))
+    if self.dimension == 1 and self.x_nodes is not None:
+      sys.exit("The FFT solution method requires evenly spaced nodes. Exiting.")
+    # Single load grid or a stack of them
+    self.set_grid_shape()
+
+  def fft_transfer(self, shape):
+    """
+    Returns the Fourier transform of the plate, D k'^4 + drho g, at the
+    frequencies of the real FFT of a grid of the given shape (which is
+    larger than the grid if it is padded). k'^2 is the sum over the axes of
+    (2 sin(k d / 2) / d)^2, the wavenumbers of the finite difference
+    operator, so that the solution is exact to the discretization.
+    It is kept, and is used again for the next load of a stack, and for the
+    next run with the same plate and grid if ReuseFactorization is set.
+    """
+    if self.dimension == 1:
+      spacings = [self.dx]
+    else:
+      spacings = [self.dy, self.dx]
+    D = self.E*self.Te**3/(12*(1-self.nu**2))
+    signature = (tuple(shape), tuple(spacings), D, self.drho*self.g)
+    if self.fft_transfer_signature != signature:
+      k2 = 0.
+      for axis, (n, d) in enumerate(zip(shape, spacings)):
+        # The real FFT halves the last axis
+        if axis == len(shape) - 1:
+          k = 2*np.pi*np.fft.rfftfreq(n, d)
+        else:
+          k = 2*np.pi*np.fft.fftfreq(n, d)
+        k = k.reshape([-1 if i == axis else 1 for i in range(len(shape))])
+        k2 = k2 + (2*np.sin(k*d/2.)/d)**2
+      self.fft_transfer_array = D*k2**2 + self.drho*self.g
+      self.fft_transfer_signature = signature
+    return self.fft_transfer_array
+
+  def fft_solve(self, shape):
+    """
+    Deflections (w) under the loads (qs), from their real FFTs on a grid of
+    the given shape -- padded with zeros past the loads where it is larger --
+    divided by the transform of the plate, and cropped back to the grid.
+    The transforms use Processes threads (by default, one for each core).
+    """
+    if self.Processes is None:
+      workers = -1
+    else:
+      workers = self.Processes
+    axes = tuple(range(-self.dimension, 0))
+    # Downward (negative) deflections under positive loads
+    q_hat = scipy.fft.rfftn(-self.qs, s=shape, axes=axes, workers=workers)
+    q_hat /= self.fft_transfer(shape)
+    w = scipy.fft.irfftn(q_hat, s=shape, axes=axes, workers=workers)
+    crop = tuple(slice(0, n) for n in self.grid_shape)
+    self.w = np.ascontiguousarray(w[(Ellipsis,) + crop])
 
   # SAS and SAS_NG are the exact same here; leaving separate just for symmetry 
   # with other functions
@@ -1023,19 +1655,19 @@ class Flexure(Utility, Plotting):
     Set-up for the rectangularly-gridded superposition of analytical solutions 
     method for solving flexure
     """
-    if self.x is None:
-      self.x = np.arange(self.dx/2., self.dx * self.qs.shape[0], self.dx)
     if self.filename:
       # Define the (scalar) elastic thickness
-      self.Te = self.configGet("float", "input", "ElasticThickness")
+      self.Te = self.scalar_Te_from_config()
       # Define a stress-based qs = q0
       self.qs = self.q0.copy()
       # Remove self.q0 to avoid issues with multiply-defined inputs
       # q0 is the parsable input to either a qs grid or contains (x,(y),q)
       del self.q0
+    if self.x is None:
+      self.x = np.arange(self.dx/2., self.dx * self.qs.shape[-self.dimension], self.dx)
     if self.dimension == 2:
       if self.y is None:
-        self.y = np.arange(self.dy/2., self.dy * self.qs.shape[0], self.dy)
+        self.y = np.arange(self.dy/2., self.dy * self.qs.shape[-2], self.dy)
       # Define a stress-based qs = q0
       # But only if the latter has not already been defined
       # (e.g., by the getters and setters)
@@ -1047,6 +1679,12 @@ class Flexure(Utility, Plotting):
         # q0 is the parsable input to either a qs grid or contains (x,(y),q)
         del self.q0
       from scipy.special import kei
+      if self.filename:
+        SASConvolution = self.configGet("string", "numerical2D", "SASConvolution", optional=True)
+        if SASConvolution:
+          self.SASConvolution = SASConvolution
+    # Single load grid or a stack of them
+    self.set_grid_shape()
 
   def SAS_NG(self):
     """
@@ -1055,7 +1693,7 @@ class Flexure(Utility, Plotting):
     """
     if self.filename:
       # Define the (scalar) elastic thickness
-      self.Te = self.configGet("float", "input", "ElasticThickness")
+      self.Te = self.scalar_Te_from_config()
       # See if it wants to be run in lat/lon
       # Could put under in 2D if-statement, but could imagine an eventual desire
       # to change this and have 1D lat/lon profiles as well.
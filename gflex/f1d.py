@@ -19,8 +19,9 @@ along with gFlex.  If not, see <http://www.gnu.org/licenses/>.
 
 from __future__ import division, print_function # No automatic floor division
 from base import *
+from solvers import *
 from scipy.sparse import spdiags
-from scipy.sparse.linalg import spsolve, isolve
+from scipy.sparse.linalg import spsolve, lgmres
 
 class F1D(Flexure):
   def initialize(self, filename=None):
@@ -30,6 +31,7 @@ class F1D(Flexure):
 
   def run(self):
     self.bc_check()
+    self.start_metrics()
     self.solver_start_time = time.time()
     if self.Method == 'FD':
       # Finite difference
@@ -57,6 +59,7 @@ class F1D(Flexure):
     self.time_to_solve = time.time() - self.solver_start_time
     if self.Quiet == False:
       print("Time to solve [s]:", self.time_to_solve)
+    self.record_metrics()
 
   def finalize(self):
     # If elastic thickness has been padded, return it to its original
@@ -74,28 +77,42 @@ class F1D(Flexure):
   ########################################
   
   def FD(self):
+    if self.Padding:
+      self.pad_domain()
     self.gridded_x()
+    # Discard a coefficient matrix left from a previous run if the model
+    # parameters have changed since it was built
+    self.check_coeff_matrix()
     # Only generate coefficient matrix if it is not already provided
     if self.coeff_matrix is not None:
       pass
     else:
       self.elasprepFD() # define dx4 and D within self
-      self.BC_selector_and_coeff_matrix_creator()
-    self.fd_solve() # Get the deflection, "w"
+      # Or take it from the caches, if it has been built before
+      if not self.load_cached_coeff_matrix():
+        self.BC_selector_and_coeff_matrix_creator()
+        self.coeff_matrix_signature = self.operator_signature()
+        self.save_cached_coeff_matrix()
+    with self.stage('solve'):
+      self.fd_solve() # Get the deflection, "w"
+    if self.Padding:
+      self.crop_domain()
 
   def FFT(self):
-    if self.plotChoice:
-      self.gridded_x()
-    sys.exit("The fast Fourier transform solution method is not yet implemented.")
+    self.gridded_x()
+    with self.stage('FFT'):
+      self.spectralSolution()
     
   def SAS(self):
     self.gridded_x()
-    self.spatialDomainVarsSAS()
-    self.spatialDomainGridded()
+    with self.stage('SAS'):
+      self.spatialDomainVarsSAS()
+      self.spatialDomainGridded()
 
   def SAS_NG(self):
-    self.spatialDomainVarsSAS()
-    self.spatialDomainNoGrid()
+    with self.stage('SAS'):
+      self.spatialDomainVarsSAS()
+      self.spatialDomainNoGrid()
 
   ######################################
   ## FUNCTIONS TO SOLVE THE EQUATIONS ##
@@ -106,8 +123,11 @@ class F1D(Flexure):
   ############
 
   def gridded_x(self):
-    self.nx = self.qs.shape[0]
-    self._x_local = np.arange(0,self.dx*self.nx,self.dx)
+    self.nx = self.grid_shape[0]
+    if self.x_nodes is not None:
+      self._x_local = self.x_nodes - self.x_nodes[0]
+    else:
+      self._x_local = np.arange(0,self.dx*self.nx,self.dx)
     
   
   ## SPATIAL DOMAIN SUPERPOSITION OF ANALYTICAL SOLUTIONS
@@ -125,14 +145,15 @@ class F1D(Flexure):
 
   def spatialDomainGridded(self):
   
-    self.w = np.zeros(self.nx) # Deflection array
+    # Deflection array (or stack of them if there is a stack of loads)
+    self.w = np.zeros(self.qs.shape)
     
     for i in range(self.nx):
       # Loop over locations that have loads, and sum
-      if self.qs[i]:
+      if np.any(self.qs[...,i]):
         dist = abs(self._x_local[i]-self._x_local)
         # -= b/c pos load leads to neg (downward) deflection
-        self.w -= self.qs[i] * self.coeff * self.dx * np.exp(-dist/self.alpha) * \
+        self.w -= self.qs[...,i][...,np.newaxis] * self.coeff * self.dx * np.exp(-dist/self.alpha) * \
           (np.cos(dist/self.alpha) + np.sin(dist/self.alpha))
     # No need to return: w already belongs to "self"
     
@@ -158,6 +179,27 @@ class F1D(Flexure):
         self.w -= self.q[i] * self.coeff * np.exp(-dist/self.alpha) * \
           ( np.cos(dist/self.alpha) + np.sin(dist/self.alpha) )
 
+  ## SPECTRAL (FAST FOURIER TRANSFORM) SOLUTION
+  ###############################################
+
+  def spectralSolution(self):
+    """
+    Deflection of a plate of constant elastic thickness, from the Fourier
+    transform of the load divided by that of the plate (see fft_transfer).
+
+    With periodic boundaries, the grid wraps around. Otherwise
+    (NoOutsideLoads), it is padded with zeros by two maximum flexural
+    wavelengths, to a length that transforms quickly, past which the
+    deflections of an isolated plate have decayed to ~1E-5 of their size.
+    """
+    nx = self.grid_shape[0]
+    if self.BC_W == 'Periodic':
+      n = nx
+    else:
+      self.calc_max_flexural_wavelength()
+      n = scipy.fft.next_fast_len(nx + 2*self.maxFlexuralWavelength_ncells, real=True)
+    self.fft_solve((n,))
+
   ## FINITE DIFFERENCE
   ######################
   
@@ -168,7 +210,8 @@ class F1D(Flexure):
     Defines the variables (except for the subset flexural rigidity) that are
     needed to run "coeff_matrix_1d"
     """
-    self.dx4 = self.dx**4
+    if self.x_nodes is None:
+      self.dx4 = self.dx**4
     self.D = self.E*self.Te**3/(12*(1-self.nu**2))
 
   def BC_selector_and_coeff_matrix_creator(self):
@@ -186,17 +229,21 @@ class F1D(Flexure):
 
     # First, set flexural rigidity boundary conditions to flesh out this padded
     # array
-    self.BC_Rigidity()
+    with self.stage('BC_Rigidity'):
+      self.BC_Rigidity()
     
     # Second, build the coefficient arrays -- with the rigidity b.c.'s
-    self.get_coeff_values()
+    with self.stage('get_coeff_values'):
+      self.get_coeff_values()
 
     # Third, apply boundary conditions to the coeff_arrays to create the 
     # flexural solution
-    self.BC_Flexure()
+    with self.stage('BC_Flexure'):
+      self.BC_Flexure()
     
     # Fourth, construct the sparse diagonal array
-    self.build_diagonals()
+    with self.stage('build_diagonals'):
+      self.build_diagonals()
     
     # Finally, compute the total time this process took    
     self.coeff_creation_time = time.time() - self.coeff_start_time
@@ -235,7 +282,7 @@ class F1D(Flexure):
     # PAD ARRAY #
     #############
     if np.isscalar(self.Te):
-      self.D *= np.ones(self.qs.shape) # And leave Te as a scalar for checks
+      self.D *= np.ones(self.grid_shape) # And leave Te as a scalar for checks
     else:
       self.Te_unpadded = self.Te.copy()
     # F2D keeps this inside the "else" and handles this differently, 
@@ -281,12 +328,15 @@ class F1D(Flexure):
     ###########################################################
     # DEFINE COEFFICIENTS TO W_-2 -- W_+2 WITH B.C.'S APPLIED #
     ###########################################################
-    self.l2_coeff_i = ( Dm1/2. + D0 - Dp1/2. ) / self.dx4
-    self.l1_coeff_i = ( -6.*D0 + 2.*Dp1 ) / self.dx4
-    self.c0_coeff_i = ( -2.*Dm1 + 10.*D0 - 2.*Dp1 ) / self.dx4 + self.drho*self.g
-    self.r1_coeff_i = ( 2.*Dm1 - 6.*D0 ) / self.dx4
-    self.r2_coeff_i = ( -Dm1/2. + D0 + Dp1/2. ) / self.dx4
-    # These will be just the 1, -4, 6, -4, 1 for constant Te
+    if self.x_nodes is not None:
+      self.get_coeff_values_nonuniform(Dm1, D0, Dp1)
+    else:
+      self.l2_coeff_i = ( Dm1/2. + D0 - Dp1/2. ) / self.dx4
+      self.l1_coeff_i = ( -6.*D0 + 2.*Dp1 ) / self.dx4
+      self.c0_coeff_i = ( -2.*Dm1 + 10.*D0 - 2.*Dp1 ) / self.dx4 + self.drho*self.g
+      self.r1_coeff_i = ( 2.*Dm1 - 6.*D0 ) / self.dx4
+      self.r2_coeff_i = ( -Dm1/2. + D0 + Dp1/2. ) / self.dx4
+      # These will be just the 1, -4, 6, -4, 1 for constant Te
 
     ###################################################################
     # START DIAGONALS AS SIMPLY THE BASE COEFFICIENTS, WITH NO B.C.'S #
@@ -305,6 +355,44 @@ class F1D(Flexure):
     # to simulate this, I need to re-zero everything. To do so, I use 
     # numpy.roll. (See self.build_diagonals.)
     
+  def get_coeff_values_nonuniform(self, Dm1, D0, Dp1):
+    """
+    Coefficients to w_-2 -- w_+2 for nodes at the (unevenly spaced)
+    coordinates x_nodes.
+
+    (D w'')'' is expanded, as for even spacing, into
+    D w'''' + 2 D' w''' + D'' w'', and each derivative is taken with the
+    finite difference weights for the actual positions of the nodes
+    (fd_weights): w'''' and w''' from the five nodes around each node, and
+    w'', D' and D'' from the three. For evenly spaced nodes, these are the
+    same coefficients as above.
+
+    Beyond the edges, the nodes are the mirror images of those inside
+    (e.g., x_-1 = 2 x_0 - x_1), to which the boundary conditions refer;
+    for periodic boundary conditions, they are instead the nodes at the
+    other side of the grid, with the mean of the spacings at the two edges
+    between the last node and the first.
+    """
+    x = self.x_nodes
+    if self.BC_W == 'Periodic' and self.BC_E == 'Periodic':
+      period = x[-1] - x[0] + (x[1] - x[0] + x[-1] - x[-2])/2.
+      x = np.hstack(( x[-2:] - period, x, x[:2] + period ))
+    else:
+      x = np.hstack(( 2*x[0] - x[2:0:-1], x, 2*x[-1] - x[-2:-4:-1] ))
+    # Positions of the five nodes around each node, relative to it
+    stencil = np.array([x[k:k+len(x)-4] for k in range(5)]) - x[2:-2]
+    w4 = fd_weights(stencil, 4)
+    w3 = fd_weights(stencil, 3)
+    w2 = fd_weights(stencil[1:4], 2)
+    # Derivatives of the rigidity
+    Dx = np.sum(fd_weights(stencil[1:4], 1) * np.array([Dm1, D0, Dp1]), axis=0)
+    Dxx = np.sum(w2 * np.array([Dm1, D0, Dp1]), axis=0)
+    self.l2_coeff_i = D0*w4[0] + 2*Dx*w3[0]
+    self.l1_coeff_i = D0*w4[1] + 2*Dx*w3[1] + Dxx*w2[0]
+    self.c0_coeff_i = D0*w4[2] + 2*Dx*w3[2] + Dxx*w2[1] + self.drho*self.g
+    self.r1_coeff_i = D0*w4[3] + 2*Dx*w3[3] + Dxx*w2[2]
+    self.r2_coeff_i = D0*w4[4] + 2*Dx*w3[4]
+
   def BC_Flexure(self):
 
     # Some links that helped me teach myself how to set up the boundary conditions
@@ -567,16 +655,110 @@ class F1D(Flexure):
     case, the flexural wavelength is a good characteristic distance for any 
     truncation limit
     """
-    if np.isscalar(self.D):
-      Dmax = self.D
-    else:
-      Dmax = self.D.max()
+    # From Te, which (unlike D) is not padded by the boundary conditions
+    Dmax = self.E*np.max(self.Te)**3/(12*(1-self.nu**2))
     # This is an approximation if there is fill that evolves with iterations 
     # (e.g., water), but should be good enough that this won't do much to it
     alpha = (4*Dmax/(self.drho*self.g))**.25 # 2D flexural parameter
     self.maxFlexuralWavelength = 2*np.pi*alpha
-    self.maxFlexuralWavelength_ncells = int(np.ceil(self.maxFlexuralWavelength / self.dx))
+    if self.x_nodes is not None:
+      # In the smallest cells
+      dx = np.diff(self.x_nodes).min()
+    else:
+      dx = self.dx
+    self.maxFlexuralWavelength_ncells = int(np.ceil(self.maxFlexuralWavelength / dx))
     
+  def pad_domain(self):
+    """
+    Pads the grid out by (about) one maximum flexural wavelength past each
+    edge that is not periodic or mirrored, so that the boundary condition
+    there is applied far enough from the loads to have little effect on
+    their deflections.
+
+    The padding starts at the spacing of the nodes at the edge of the grid,
+    and each cell is PaddingGrowth times the size of the one before it, so
+    that it takes far fewer nodes than padding at the full resolution. The
+    load is zero in it, and the elastic thickness that at the edge of the
+    grid; crop_domain() undoes this.
+    """
+    self.calc_max_flexural_wavelength()
+    if self.x_nodes is not None:
+      x = self.x_nodes
+    else:
+      x = self.dx * np.arange(self.grid_shape[0])
+    width = self.maxFlexuralWavelength_ncells * np.diff(x).min()
+    def padding(BC, spacing):
+      # Distances of the padding nodes from the edge of the grid
+      steps = []
+      if BC != 'Periodic' and BC != 'Mirror':
+        while np.sum(steps) < width:
+          spacing *= self.PaddingGrowth
+          steps.append(spacing)
+      return np.cumsum(steps)
+    west = padding(self.BC_W, x[1] - x[0])
+    east = padding(self.BC_E, x[-1] - x[-2])
+    self.padding_cells = (len(west), len(east))
+    self.unpadded_domain = (self.qs, self.Te, self.x_nodes)
+    self.x_nodes = np.hstack(( x[0] - west[::-1], x, x[-1] + east ))
+    pad = [(0, 0)] * (self.qs.ndim - 1) + [self.padding_cells]
+    self.qs = np.pad(self.qs, pad, mode='constant')
+    if not np.isscalar(self.Te):
+      self.Te = np.pad(self.Te, self.padding_cells, mode='edge')
+    self.grid_shape = self.qs.shape[-1:]
+
+  def crop_domain(self):
+    """
+    Returns the grid, loads and elastic thickness to what they were before
+    pad_domain(), and the deflections to that grid (keeping those on the
+    padded grid as w_padded)
+    """
+    west, east = self.padding_cells
+    self.w_padded = self.w
+    self.w = self.w[..., west:self.w.shape[-1]-east]
+    self.qs, self.Te, self.x_nodes = self.unpadded_domain
+    # (and for finalize(), which resets Te to this)
+    self.Te_unpadded = self.Te
+    self.grid_shape = self.qs.shape[-1:]
+    self.gridded_x()
+
+  def banded_solver_applies(self):
+    """
+    The banded direct solver is used (in place of the general sparse one)
+    whenever the coefficient matrix is pentadiagonal, as it is for all
+    non-periodic boundary conditions, or pentadiagonal with wraparound
+    corners, as it is for periodic boundary conditions. This is automatic
+    for the "direct" solver and required for the "banded" solver.
+    """
+    if self.Solver == 'banded' or self.Solver == 'Banded':
+      required = True
+    elif self.Solver == 'direct' or self.Solver == 'Direct':
+      required = False
+    else:
+      return False
+    kl, ku = cyclic_bandwidths(self.coeff_matrix)
+    if kl <= 2 and ku <= 2:
+      return True
+    elif required:
+      sys.exit("The banded solver requires a pentadiagonal coefficient matrix.\n"+
+               "Use the direct solver instead. Exiting.")
+    else:
+      return False
+
+  def new_coeff_factor(self):
+    """
+    Banded LU factorization of the pentadiagonal coefficient matrix (with
+    a low-rank correction for the corners of periodic boundary conditions)
+    if it applies, otherwise the general sparse LU
+    """
+    if self.banded_solver_applies():
+      kl, ku = bandwidths(self.coeff_matrix)
+      if kl <= 2 and ku <= 2:
+        return BandedFactor(self.coeff_matrix, 2, 2)
+      else:
+        return CyclicBandedFactor(self.coeff_matrix, 2, 2)
+    else:
+      return super(F1D, self).new_coeff_factor()
+
   def fd_solve(self):
     """
     w = fd_solve()
@@ -592,27 +774,54 @@ class F1D(Flexure):
       self.calc_max_flexural_wavelength()
       print("maxFlexuralWavelength_ncells', self.maxFlexuralWavelength_ncells")
     
+    # qs negative so bends down with positive load, bends up with neative load 
+    # (i.e. material removed)
+    # Each load is a column of the right-hand side, so a stack of loads is
+    # solved as multiple right-hand sides against the same operator
+    rhs = -self.qs.reshape(-1, self.grid_shape[0]).T
+    
+    self.convergence = None
     if self.Solver == "iterative" or self.Solver == "Iterative":
       if self.Debug:
         print("Using generalized minimal residual method for iterative solution")
       if self.Verbose:
-        print("Converging to a tolerance of", self.iterative_ConvergenceTolerance, "m between iterations")
-      # qs negative so bends down with positive load, bends up with neative load 
-      # (i.e. material removed)
-      w = isolve.lgmres(self.coeff_matrix, -self.qs, tol=self.iterative_ConvergenceTolerance)  
-      self.w = w[0] # Reach into tuple to get my array back
+        print("Converging to a relative residual of", self.iterative_ConvergenceTolerance)
+      options = {}
+      if self.MaxIterations is not None:
+        options['maxiter'] = self.MaxIterations
+      w = np.zeros(rhs.shape)
+      history = []
+      info = []
+      for i in range(rhs.shape[1]):
+        # Records the residual at each iteration
+        monitor = KrylovMonitor(self.coeff_matrix, rhs[:,i], self.iterative_callbacks)
+        wi = krylov(lgmres, self.coeff_matrix, rhs[:,i], self.iterative_ConvergenceTolerance,
+                    monitor=monitor, **options)
+        w[:,i] = wi[0] # Reach into tuple to get my array back
+        history.append(monitor.history)
+        info.append(wi[1])
+      self.record_convergence(self.coeff_matrix, w, rhs, history, info)
     else:
       if self.Solver == 'direct' or self.Solver == 'Direct':
         if self.Debug:
           print("Using direct solution with UMFpack")
+      elif self.Solver == 'banded' or self.Solver == 'Banded':
+        if self.Debug:
+          print("Using banded direct solution")
       else:
         print("Solution type not understood:")
         print("Defaulting to direct solution with UMFpack")
-      # UMFpack is now the default, but setting true just to be sure in case
-      # anything changes
-      # qs negative so bends down with positive load, bends up with neative load 
-      # (i.e. material removed)
-      self.w = spsolve(self.coeff_matrix, -self.qs, use_umfpack=True)
+      if self.ReuseFactorization or self.banded_solver_applies():
+        # Factorize (banded LU if possible) and solve; with
+        # ReuseFactorization, the factor is kept for subsequent runs
+        self.factorize_coeff_matrix()
+        w = self.coeff_factor.solve(rhs)
+      else:
+        # UMFpack is now the default, but setting true just to be sure in case
+        # anything changes
+        w = spsolve(self.coeff_matrix, rhs, use_umfpack=True)
+    # Back to the shape of the load array
+    self.w = w.reshape(self.grid_shape[0], -1).T.reshape(self.qs.shape)
     
     if self.Debug:
       print("w.shape:")
@@ -19,6 +19,7 @@ along with gFlex.  If not, see <http://www.gnu.org/licenses/>.
 
 from __future__ import division, print_function # No automatic floor division
 from base import *
+from solvers import *
 import scipy
 from scipy.special import kei
 
@@ -26,6 +27,11 @@ from scipy.special import kei
 # three parameters as class Isostasy; and it then sets up more parameters specific
 # to its own type of simulation.
 class F2D(Flexure):
+
+  # Offsets (x, y) of the cells in the 13-point finite difference stencil
+  stencil_offsets = [(-2, 0), (-1, -1), (-1, 0), (-1, 1), (0, -2), (0, -1), (0, 0),
+                     (0, 1), (0, 2), (1, -1), (1, 0), (1, 1), (2, 0)]
+
   def initialize(self, filename=None):
     self.dimension = 2 # Set it here in case it wasn't set for selection before
     super(F2D, self).initialize()
@@ -33,6 +39,7 @@ class F2D(Flexure):
 
   def run(self):
     self.bc_check()
+    self.start_metrics()
     self.solver_start_time = time.time()
       
     if self.Method == 'FD':
@@ -61,6 +68,7 @@ class F2D(Flexure):
     self.time_to_solve = time.time() - self.solver_start_time
     if self.Quiet == False:
       print("Time to solve [s]:", self.time_to_solve)
+    self.record_metrics()
 
   def finalize(self):
     # If elastic thickness has been padded, return it to its original
@@ -78,24 +86,39 @@ class F2D(Flexure):
   ########################################
 
   def FD(self):
+    if self.Padding:
+      self.pad_domain()
+    # Discard a coefficient matrix left from a previous run if the model
+    # parameters have changed since it was built
+    self.check_coeff_matrix()
     # Only generate coefficient matrix if it is not already provided
     if self.coeff_matrix is not None:
       pass
     else:
       self.elasprep()
-      self.BC_selector_and_coeff_matrix_creator()
-    self.fd_solve()
+      # Or take it from the caches, if it has been built before
+      if not self.load_cached_coeff_matrix():
+        self.BC_selector_and_coeff_matrix_creator()
+        self.coeff_matrix_signature = self.operator_signature()
+        self.save_cached_coeff_matrix()
+    with self.stage('solve'):
+      self.fd_solve()
+    if self.Padding:
+      self.crop_domain()
 
   def FFT(self):
-    sys.exit("The fast Fourier transform solution method is not yet implemented.")
+    with self.stage('FFT'):
+      self.spectralSolution()
 
   def SAS(self):
-    self.spatialDomainVarsSAS()
-    self.spatialDomainGridded()
+    with self.stage('SAS'):
+      self.spatialDomainVarsSAS()
+      self.spatialDomainGridded()
 
   def SAS_NG(self):
-    self.spatialDomainVarsSAS()
-    self.spatialDomainNoGrid()
+    with self.stage('SAS'):
+      self.spatialDomainVarsSAS()
+      self.spatialDomainNoGrid()
 
   
   ######################################
@@ -103,6 +126,29 @@ class F2D(Flexure):
   ######################################
   
    
+  ## SPECTRAL (FAST FOURIER TRANSFORM) SOLUTION
+  ###############################################
+
+  def spectralSolution(self):
+    """
+    Deflection of a plate of constant elastic thickness, from the Fourier
+    transform of the load divided by that of the plate (see fft_transfer).
+
+    Along each axis with periodic boundaries, the grid wraps around (e.g.,
+    in longitude on a global grid). Along the others (NoOutsideLoads), it
+    is padded with zeros by two maximum flexural wavelengths, to a length
+    that transforms quickly, past which the deflections of an isolated
+    plate have decayed to ~1E-5 of their size.
+    """
+    ny, nx = self.grid_shape
+    if self.BC_W != 'Periodic' or self.BC_N != 'Periodic':
+      self.calc_max_flexural_wavelength()
+    if self.BC_W != 'Periodic':
+      nx = scipy.fft.next_fast_len(nx + 2*self.maxFlexuralWavelength_ncells_x, real=True)
+    if self.BC_N != 'Periodic':
+      ny = scipy.fft.next_fast_len(ny + 2*self.maxFlexuralWavelength_ncells_y)
+    self.fft_solve((ny, nx))
+
   ## SPATIAL DOMAIN SUPERPOSITION OF ANALYTICAL SOLUTIONS
   #########################################################
 
@@ -116,37 +162,61 @@ class F2D(Flexure):
   # GRIDDED
 
   def spatialDomainGridded(self):
-  
-    self.nx = self.qs.shape[1]
-    self.ny = self.qs.shape[0]
+    """
+    Deflections from the load in each cell of the grid, taken as a point
+    load at its center, for which the solution (coeff * kei(r/alpha)) is
+    computed once, at the distances to all of the other cells.
+
+    These are summed by a linear convolution, done by FFTs on a grid padded
+    so that the loads do not wrap around (NoOutsideLoads). If only a few
+    cells are loaded -- fewer than it takes for the FFTs to be faster, or if
+    SASConvolution is 'direct' -- the solution for each is added up instead.
+    """
+    self.ny, self.nx = self.grid_shape
     
     # Prepare a large grid of solutions beforehand, so we don't have to
     # keep calculating kei (time-intensive!)
-    # This pre-prepared solution will be for a unit load
-    bigshape = 2*self.ny+1,2*self.nx+1 # Tuple shape
-
-    dist_ny = np.arange(bigshape[0]) - self.ny
-    dist_nx = np.arange(bigshape[1]) - self.nx
-
-    dist_x,dist_y = np.meshgrid(dist_nx*self.dx,dist_ny*self.dy)
-
-    bigdist = np.sqrt(dist_x**2 + dist_y**2) # Distances from center
-                                          # Center at [ny,nx]
-    
-    biggrid = self.coeff * kei(bigdist/self.alpha) # Kelvin fcn solution
-
-    # Now compute the deflections
-    self.w = np.zeros((self.ny,self.nx)) # Deflection array
-    for i in range(self.nx):
-      for j in range(self.ny):
-        # Loop over locations that have loads, and sum
-        if self.qs[j,i]:
-          # Solve by summing portions of "biggrid" while moving origin
-          # to location of current cell
-          # Load must be multiplied by grid cell size
-          self.w += self.qs[j,i] * self.dx * self.dy \
-             * biggrid[self.ny-j:2*self.ny-j,self.nx-i:2*self.nx-i]
-      # No need to return: w already belongs to "self"
+    # This pre-prepared solution will be for a unit load, centered at
+    # [ny,nx]; it depends only on the distance, so it is computed for one
+    # quadrant and mirrored
+    with self.stage('SAS_kernel'):
+      dist_y = np.arange(self.ny+1) * self.dy
+      dist_x = np.arange(self.nx+1) * self.dx
+      quadrant = self.coeff * kei(np.hypot(dist_y[:,np.newaxis], dist_x)/self.alpha)
+      quadrant = np.concatenate((quadrant[::-1], quadrant[1:]), axis=0)
+      biggrid = np.concatenate((quadrant[:,::-1], quadrant[:,1:]), axis=1)
+
+    # Load must be multiplied by grid cell size
+    # (a stack of loads, and of deflection arrays, if there is a stack)
+    loads = self.qs * self.dx * self.dy
+    loaded = np.argwhere(np.any(loads.reshape((-1,) + self.grid_shape) != 0, axis=0))
+    fft_shape = [scipy.fft.next_fast_len(n, real=True) for n in biggrid.shape]
+    # About how long each takes: the direct sum scales with the number of
+    # loaded cells, and the FFTs do not
+    fft_cost = np.prod(fft_shape) * np.log2(np.prod(fft_shape))
+    direct_cost = len(loaded) * self.ny * self.nx
+    if self.SASConvolution == 'direct' \
+       or (self.SASConvolution == 'auto' and direct_cost < fft_cost):
+      self.w = np.zeros(self.qs.shape) # Deflection array
+      for j, i in loaded:
+        # Solve by summing portions of "biggrid" while moving origin
+        # to location of current cell
+        self.w += loads[...,j,i][...,np.newaxis,np.newaxis] \
+           * biggrid[self.ny-j:2*self.ny-j,self.nx-i:2*self.nx-i]
+    elif self.SASConvolution == 'fft' or self.SASConvolution == 'auto':
+      if self.Processes is None:
+        workers = -1
+      else:
+        workers = self.Processes
+      axes = (-2, -1)
+      w_hat = scipy.fft.rfftn(loads, s=fft_shape, axes=axes, workers=workers)
+      w_hat *= scipy.fft.rfftn(biggrid, s=fft_shape, workers=workers)
+      w = scipy.fft.irfftn(w_hat, s=fft_shape, axes=axes, workers=workers)
+      # The deflection of each cell is at its offset from the center of
+      # the kernel
+      self.w = np.ascontiguousarray(w[...,self.ny:2*self.ny,self.nx:2*self.nx])
+    else:
+      sys.exit("SASConvolution must be 'auto', 'fft' or 'direct'. Exiting.")
 
   # NO GRID
 
@@ -204,13 +274,12 @@ class F2D(Flexure):
     
     The method is spread across the subroutines here.
     
-    Important to this is the use of np.roll() to properly offset the 
-    diagonals that end up in the main matrix: spdiags() will put each vector
-    on the proper diagonal, but will align them such that their first cell is 
-    along the first column, instead of using a 45 degrees to matrix corner 
-    baseline that would stagger them appropriately for this solution method.
-    Therefore, np.roll() effectively does this staggering by having the 
-    appropriate cell in the vector start at the first column.
+    Important to this is the offset of each coefficient array along its
+    diagonal of the main matrix: in spdiags() convention, each value is
+    placed in the column of its cell, so the arrays are shifted by whole
+    cells in x and y (as np.roll() would) to stagger them appropriately for
+    this solution method. build_diagonals() applies these shifts as it
+    assembles the matrix.
     """
     
     # Zeroth, start the timer and print the boundary conditions to the screen
@@ -221,24 +290,43 @@ class F2D(Flexure):
       print("Boundary condition, North:", self.BC_N, type(self.BC_N))
       print("Boundary condition, South:", self.BC_S, type(self.BC_S))
     
-    # First, set flexural rigidity boundary conditions to flesh out this padded
-    # array
-    self.BC_Rigidity()
+    if self.PlateSolutionType == 'energy':
+      # Symmetric positive-definite operator, assembled directly from the
+      # discretized strain energy of the plate
+      with self.stage('energy_coeff_matrix'):
+        self.energy_coeff_matrix()
+    elif self.MatrixFree:
+      # Operator that applies the stencil without storing the matrix
+      with self.stage('matrix_free_operator'):
+        self.matrix_free_operator()
+      self.coeff_load_weights = None
+    else:
+      self.get_coeff_values_and_matrix()
+      self.coeff_load_weights = None
+
+    # Finally, compute the total time this process took    
+    self.coeff_creation_time = time.time() - self.coeff_start_time
+    if self.Quiet == False:
+      print("Time to construct coefficient (operator) array [s]:", self.coeff_creation_time)
+
+  def get_coeff_values_and_matrix(self):
+    # First, set flexural rigidity boundary conditions to flesh out this 
+    # padded array
+    with self.stage('BC_Rigidity'):
+      self.BC_Rigidity()
     
     # Second, build the coefficient arrays -- with the rigidity b.c.'s
-    self.get_coeff_values()
+    with self.stage('get_coeff_values'):
+      self.get_coeff_values()
     
     # Third, apply boundary conditions to the coeff_arrays to create the 
     # flexural solution
-    self.BC_Flexure()
+    with self.stage('BC_Flexure'):
+      self.BC_Flexure()
     
     # Fourth, construct the sparse diagonal array
-    self.build_diagonals()
-
-    # Finally, compute the total time this process took    
-    self.coeff_creation_time = time.time() - self.coeff_start_time
-    if self.Quiet == False:
-      print("Time to construct coefficient (operator) array [s]:", self.coeff_creation_time)
+    with self.stage('build_diagonals'):
+      self.build_diagonals()
 
   def BC_Rigidity(self):
     """
@@ -290,11 +378,11 @@ class F2D(Flexure):
     # PAD ARRAY #
     #############
     if np.isscalar(self.Te):
-      self.D *= np.ones(self.qs.shape) # And leave Te as a scalar for checks
+      self.D *= np.ones(self.grid_shape) # And leave Te as a scalar for checks
     else:
+      # Only D is padded: Te is left at the size of the grid so that it is
+      # still valid (and comparable) for repeated runs
       self.Te_unpadded = self.Te.copy()
-      self.Te = np.hstack(( np.nan*np.zeros((self.Te.shape[0], 1)), self.Te, np.nan*np.zeros((self.Te.shape[0], 1)) ))
-      self.Te = np.vstack(( np.nan*np.zeros(self.Te.shape[1]), self.Te, np.nan*np.zeros(self.Te.shape[1]) ))
       self.D = np.hstack(( np.nan*np.zeros((self.D.shape[0], 1)), self.D, np.nan*np.zeros((self.D.shape[0], 1)) ))
       self.D = np.vstack(( np.nan*np.zeros(self.D.shape[1]), self.D, np.nan*np.zeros(self.D.shape[1]) ))
 
@@ -350,44 +438,27 @@ class F2D(Flexure):
     i_2 = negative 2 offset (i2 = positive 2 offset)
     """
 
-    # don't want to keep typing "self." everwhere!
     D = self.D
-    drho = self.drho
-    dx4 = self.dx4
-    dy4 = self.dy4
-    dx2dy2 = self.dx2dy2
-    nu = self.nu
-    g = self.g
 
     if np.isscalar(self.Te):
       # So much simpler with constant D! And symmetrical stencil
-      self.cj2i0 = D/dy4
-      self.cj1i_1 = 2*D/dx2dy2
-      self.cj1i0 = -4*D/dy4 - 4*D/dx2dy2
-      self.cj1i1 = 2*D/dx2dy2
-      self.cj0i_2 = D/dx4
-      self.cj0i_1 = -4*D/dx4 - 4*D/dx2dy2
-      self.cj0i0 = 6*D/dx4 + 6*D/dy4 + 8*D/dx2dy2 + drho*g
-      self.cj0i1 = -4*D/dx4 - 4*D/dx2dy2 # Symmetry
-      self.cj0i2 = D/dx4 # Symmetry
-      self.cj_1i_1 = 2*D/dx2dy2 # Symmetry
-      self.cj_1i0 = -4*D/dy4 - 4*D/dx2dy2 # Symmetry
-      self.cj_1i1 = 2*D/dx2dy2 # Symmetry
-      self.cj_2i0 = D/dy4 # Symmetry
+      (self.cj_2i0, self.cj_1i_1, self.cj_1i0, self.cj_1i1, self.cj0i_2,
+       self.cj0i_1, self.cj0i0, self.cj0i1, self.cj0i2, self.cj1i_1,
+       self.cj1i0, self.cj1i1, self.cj2i0) = self.stencil_coefficients(D)
       # Bring up to size
-      self.cj2i0 *= np.ones(self.qs.shape)
-      self.cj1i_1 *= np.ones(self.qs.shape)
-      self.cj1i0 *= np.ones(self.qs.shape)
-      self.cj1i1 *= np.ones(self.qs.shape)
-      self.cj0i_2 *= np.ones(self.qs.shape)
-      self.cj0i_1 *= np.ones(self.qs.shape)
-      self.cj0i0 *= np.ones(self.qs.shape)
-      self.cj0i1 *= np.ones(self.qs.shape)
-      self.cj0i2 *= np.ones(self.qs.shape)
-      self.cj_1i_1 *= np.ones(self.qs.shape)
-      self.cj_1i0 *= np.ones(self.qs.shape)
-      self.cj_1i1 *= np.ones(self.qs.shape)
-      self.cj_2i0 *= np.ones(self.qs.shape)
+      self.cj2i0 *= np.ones(self.grid_shape)
+      self.cj1i_1 *= np.ones(self.grid_shape)
+      self.cj1i0 *= np.ones(self.grid_shape)
+      self.cj1i1 *= np.ones(self.grid_shape)
+      self.cj0i_2 *= np.ones(self.grid_shape)
+      self.cj0i_1 *= np.ones(self.grid_shape)
+      self.cj0i0 *= np.ones(self.grid_shape)
+      self.cj0i1 *= np.ones(self.grid_shape)
+      self.cj0i2 *= np.ones(self.grid_shape)
+      self.cj_1i_1 *= np.ones(self.grid_shape)
+      self.cj_1i0 *= np.ones(self.grid_shape)
+      self.cj_1i1 *= np.ones(self.grid_shape)
+      self.cj_2i0 *= np.ones(self.grid_shape)
       # Create coefficient arrays to manage boundary conditions
       self.cj2i0_coeff_ij = self.cj2i0.copy()
       self.cj1i_1_coeff_ij = self.cj1i_1.copy()
@@ -411,6 +482,80 @@ class F2D(Flexure):
       #        OTHERS HERE LARGELY FOR COMPARISON           #
       #######################################################
       
+      (self.cj_2i0_coeff_ij, self.cj_1i_1_coeff_ij, self.cj_1i0_coeff_ij,
+       self.cj_1i1_coeff_ij, self.cj0i_2_coeff_ij, self.cj0i_1_coeff_ij,
+       self.cj0i0_coeff_ij, self.cj0i1_coeff_ij, self.cj0i2_coeff_ij,
+       self.cj1i_1_coeff_ij, self.cj1i0_coeff_ij, self.cj1i1_coeff_ij,
+       self.cj2i0_coeff_ij) = self.stencil_coefficients(D)
+
+      ################################################################
+      # CREATE COEFFICIENT ARRAYS: PLAIN, WITH NO B.C.'S YET APPLIED #
+      ################################################################
+      # x = -2, y = 0
+      self.cj_2i0 = self.cj_2i0_coeff_ij.copy()
+      # x = -1, y = -1
+      self.cj_1i_1 = self.cj_1i_1_coeff_ij.copy()
+      # x = -1, y = 0
+      self.cj_1i0 = self.cj_1i0_coeff_ij.copy()
+      # x = -1, y = 1
+      self.cj_1i1 = self.cj_1i1_coeff_ij.copy()
+      # x = 0, y = -2
+      self.cj0i_2 = self.cj0i_2_coeff_ij.copy()
+      # x = 0, y = -1
+      self.cj0i_1 = self.cj0i_1_coeff_ij.copy()
+      # x = 0, y = 0
+      self.cj0i0 = self.cj0i0_coeff_ij.copy()
+      # x = 0, y = 1
+      self.cj0i1 = self.cj0i1_coeff_ij.copy()
+      # x = 0, y = 2
+      self.cj0i2 = self.cj0i2_coeff_ij.copy()
+      # x = 1, y = -1
+      self.cj1i_1 = self.cj1i_1_coeff_ij.copy()
+      # x = 1, y = 0
+      self.cj1i0 = self.cj1i0_coeff_ij.copy()
+      # x = 1, y = 1
+      self.cj1i1 = self.cj1i1_coeff_ij.copy()
+      # x = 2, y = 0
+      self.cj2i0 = self.cj2i0_coeff_ij.copy()
+
+    # Provide rows and columns in the 2D input to later functions
+    self.ncolsx = self.cj0i0.shape[1]
+    self.nrowsy = self.cj0i0.shape[0]
+
+  def stencil_coefficients(self, D):
+    """
+    Values of the 13 coefficients of the finite difference stencil, in the
+    order of self.stencil_offsets (x, y). For variable Te, D is the
+    flexural rigidity padded by one cell on each side (as by BC_Rigidity),
+    and the coefficients are for the cells inside of the padding; for
+    constant Te, D may be a scalar or an array of any shape.
+
+    No boundary conditions are applied here: see BC_Flexure.
+    """
+    # don't want to keep typing "self." everwhere!
+    drho = self.drho
+    dx4 = self.dx4
+    dy4 = self.dy4
+    dx2dy2 = self.dx2dy2
+    nu = self.nu
+    g = self.g
+
+    if np.isscalar(self.Te):
+      # Constant D: symmetrical stencil
+      cj2i0 = D/dy4
+      cj1i_1 = 2*D/dx2dy2
+      cj1i0 = -4*D/dy4 - 4*D/dx2dy2
+      cj1i1 = 2*D/dx2dy2
+      cj0i_2 = D/dx4
+      cj0i_1 = -4*D/dx4 - 4*D/dx2dy2
+      cj0i0 = 6*D/dx4 + 6*D/dy4 + 8*D/dx2dy2 + drho*g
+      cj0i1 = -4*D/dx4 - 4*D/dx2dy2 # Symmetry
+      cj0i2 = D/dx4 # Symmetry
+      cj_1i_1 = 2*D/dx2dy2 # Symmetry
+      cj_1i0 = -4*D/dy4 - 4*D/dx2dy2 # Symmetry
+      cj_1i1 = 2*D/dx2dy2 # Symmetry
+      cj_2i0 = D/dy4 # Symmetry
+    else:
       # All derivatives here, to make reading the equations below easier
       D00 = D[1:-1,1:-1]
       D10 = D[1:-1,2:]
@@ -434,34 +579,34 @@ class F2D(Flexure):
         # using a central difference approx. to 2nd order precision
         # NEW STENCIL
         # x = -2, y = 0
-        self.cj_2i0_coeff_ij = (D0 - Dx) / dx4
+        cj_2i0 = (D0 - Dx) / dx4
         # x = 0, y = -2
-        self.cj0i_2_coeff_ij = (D0 - Dy) / dy4
+        cj0i_2 = (D0 - Dy) / dy4
         # x = 0, y = 2
-        self.cj0i2_coeff_ij = (D0 + Dy) / dy4
+        cj0i2 = (D0 + Dy) / dy4
         # x = 2, y = 0
-        self.cj2i0_coeff_ij = (D0 + Dx) / dx4
+        cj2i0 = (D0 + Dx) / dx4
         # x = -1, y = -1
-        self.cj_1i_1_coeff_ij = (2.*D0 - Dx - Dy + Dxy*(1-nu)/2.) / dx2dy2
+        cj_1i_1 = (2.*D0 - Dx - Dy + Dxy*(1-nu)/2.) / dx2dy2
         # x = -1, y = 1
-        self.cj_1i1_coeff_ij = (2.*D0 - Dx + Dy - Dxy*(1-nu)/2.) / dx2dy2
+        cj_1i1 = (2.*D0 - Dx + Dy - Dxy*(1-nu)/2.) / dx2dy2
         # x = 1, y = -1
-        self.cj1i_1_coeff_ij = (2.*D0 + Dx - Dy - Dxy*(1-nu)/2.) / dx2dy2
+        cj1i_1 = (2.*D0 + Dx - Dy - Dxy*(1-nu)/2.) / dx2dy2
         # x = 1, y = 1
-        self.cj1i1_coeff_ij = (2.*D0 + Dx + Dy + Dxy*(1-nu)/2.) / dx2dy2
+        cj1i1 = (2.*D0 + Dx + Dy + Dxy*(1-nu)/2.) / dx2dy2
         # x = -1, y = 0
-        self.cj_1i0_coeff_ij = (-4.*D0 + 2.*Dx + Dxx)/dx4 + (-4.*D0 + 2.*Dx + nu*Dyy)/dx2dy2
+        cj_1i0 = (-4.*D0 + 2.*Dx + Dxx)/dx4 + (-4.*D0 + 2.*Dx + nu*Dyy)/dx2dy2
         # x = 0, y = -1
-        self.cj0i_1_coeff_ij = (-4.*D0 + 2.*Dy + Dyy)/dy4 + (-4.*D0 + 2.*Dy + nu*Dxx)/dx2dy2
+        cj0i_1 = (-4.*D0 + 2.*Dy + Dyy)/dy4 + (-4.*D0 + 2.*Dy + nu*Dxx)/dx2dy2
         # x = 0, y = 1
-        self.cj0i1_coeff_ij = (-4.*D0 - 2.*Dy + Dyy)/dy4 + (-4.*D0 - 2.*Dy + nu*Dxx)/dx2dy2
+        cj0i1 = (-4.*D0 - 2.*Dy + Dyy)/dy4 + (-4.*D0 - 2.*Dy + nu*Dxx)/dx2dy2
         # x = 1, y = 0
-        self.cj1i0_coeff_ij = (-4.*D0 - 2.*Dx + Dxx)/dx4 + (-4.*D0 - 2.*Dx + nu*Dyy)/dx2dy2
+        cj1i0 = (-4.*D0 - 2.*Dx + Dxx)/dx4 + (-4.*D0 - 2.*Dx + nu*Dyy)/dx2dy2
         # x = 0, y = 0
-        self.cj0i0_coeff_ij = (6.*D0 - 2.*Dxx)/dx4 \
-                     + (6.*D0 - 2.*Dyy)/dy4 \
-                     + (8.*D0 - 2.*nu*Dxx - 2.*nu*Dyy)/dx2dy2 \
-                     + drho*g
+        cj0i0 = (6.*D0 - 2.*Dxx)/dx4 \
+                + (6.*D0 - 2.*Dyy)/dy4 \
+                + (8.*D0 - 2.*nu*Dxx - 2.*nu*Dyy)/dx2dy2 \
+                + drho*g
                      
       elif self.PlateSolutionType == 'G2009':
         # STENCIL FROM GOVERS ET AL. 2009 -- first-order differences
@@ -469,70 +614,40 @@ class F2D(Flexure):
         # Note that this breaks down with b.c.'s that place too much control 
         # on the solution -- harmonic wavetrains
         # x = -2, y = 0
-        self.cj_2i0_coeff_ij = D_10/dx4
+        cj_2i0 = D_10/dx4
         # x = -1, y = -1
-        self.cj_1i_1_coeff_ij = (D_10 + D0_1)/dx2dy2
+        cj_1i_1 = (D_10 + D0_1)/dx2dy2
         # x = -1, y = 0
-        self.cj_1i0_coeff_ij = -2. * ( (D0_1 + D00)/dx2dy2 + (D00 + D_10)/dx4 )
+        cj_1i0 = -2. * ( (D0_1 + D00)/dx2dy2 + (D00 + D_10)/dx4 )
         # x = -1, y = 1
-        self.cj_1i1_coeff_ij = (D_10 + D01)/dx2dy2
+        cj_1i1 = (D_10 + D01)/dx2dy2
         # x = 0, y = -2
-        self.cj0i_2_coeff_ij = D0_1/dy4
+        cj0i_2 = D0_1/dy4
         # x = 0, y = -1
-        self.cj0i_1_coeff_ij = -2. * ( (D0_1 + D00)/dx2dy2 + (D00 + D0_1)/dy4)
+        cj0i_1 = -2. * ( (D0_1 + D00)/dx2dy2 + (D00 + D0_1)/dy4)
         # x = 0, y = 0
-        self.cj0i0_coeff_ij = (D10 + 4.*D00 + D_10)/dx4 + (D01 + 4.*D00 + D0_1)/dy4 + (8.*D00/dx2dy2) + drho*g
+        cj0i0 = (D10 + 4.*D00 + D_10)/dx4 + (D01 + 4.*D00 + D0_1)/dy4 + (8.*D00/dx2dy2) + drho*g
         # x = 0, y = 1
-        self.cj0i1_coeff_ij = -2. * ( (D01 + D00)/dy4 + (D00 + D01)/dx2dy2 )
+        cj0i1 = -2. * ( (D01 + D00)/dy4 + (D00 + D01)/dx2dy2 )
         # x = 0, y = 2
-        self.cj0i2_coeff_ij = D0_1/dy4
+        cj0i2 = D0_1/dy4
         # x = 1, y = -1
-        self.cj1i_1_coeff_ij = (D10+D0_1)/dx2dy2
+        cj1i_1 = (D10+D0_1)/dx2dy2
         # x = 1, y = 0
-        self.cj1i0_coeff_ij = -2. * ( (D10 + D00)/dx4 + (D10 + D00)/dx2dy2 )
+        cj1i0 = -2. * ( (D10 + D00)/dx4 + (D10 + D00)/dx2dy2 )
         # x = 1, y = 1
-        self.cj1i1_coeff_ij = (D10 + D01)/dx2dy2
+        cj1i1 = (D10 + D01)/dx2dy2
         # x = 2, y = 0
-        self.cj2i0_coeff_ij = D10/dx4
+        cj2i0 = D10/dx4
       else:
         sys.exit("Not an acceptable plate solution type. Please choose from:\n"+
                   "* vWC1994\n"+
                   "* G2009\n"+
+                  "* energy\n"+
                   "")
                   
-      ################################################################
-      # CREATE COEFFICIENT ARRAYS: PLAIN, WITH NO B.C.'S YET APPLIED #
-      ################################################################
-      # x = -2, y = 0
-      self.cj_2i0 = self.cj_2i0_coeff_ij.copy()
-      # x = -1, y = -1
-      self.cj_1i_1 = self.cj_1i_1_coeff_ij.copy()
-      # x = -1, y = 0
-      self.cj_1i0 = self.cj_1i0_coeff_ij.copy()
-      # x = -1, y = 1
-      self.cj_1i1 = self.cj_1i1_coeff_ij.copy()
-      # x = 0, y = -2
-      self.cj0i_2 = self.cj0i_2_coeff_ij.copy()
-      # x = 0, y = -1
-      self.cj0i_1 = self.cj0i_1_coeff_ij.copy()
-      # x = 0, y = 0
-      self.cj0i0 = self.cj0i0_coeff_ij.copy()
-      # x = 0, y = 1
-      self.cj0i1 = self.cj0i1_coeff_ij.copy()
-      # x = 0, y = 2
-      self.cj0i2 = self.cj0i2_coeff_ij.copy()
-      # x = 1, y = -1
-      self.cj1i_1 = self.cj1i_1_coeff_ij.copy()
-      # x = 1, y = 0
-      self.cj1i0 = self.cj1i0_coeff_ij.copy()
-      # x = 1, y = 1
-      self.cj1i1 = self.cj1i1_coeff_ij.copy()
-      # x = 2, y = 0
-      self.cj2i0 = self.cj2i0_coeff_ij.copy()
-
-    # Provide rows and columns in the 2D input to later functions
-    self.ncolsx = self.cj0i0.shape[1]
-    self.nrowsy = self.cj0i0.shape[0]
+    return (cj_2i0, cj_1i_1, cj_1i0, cj_1i1, cj0i_2, cj0i_1, cj0i0, cj0i1,
+            cj0i2, cj1i_1, cj1i0, cj1i1, cj2i0)
 
   def BC_Flexure(self):
 
@@ -563,8 +678,8 @@ class F2D(Flexure):
         # One of the two values here, that from the y -/+ 1, x +/- 1 (E/W)
         # boundary condition, will be in the same location that will be 
         # overwritten in the initiating grid by the next perioidic b.c. over
-        self.cj_1i1_Periodic_right = np.zeros(self.qs.shape)
-        self.cj_2i0_Periodic_right = np.zeros(self.qs.shape)
+        self.cj_1i1_Periodic_right = np.zeros(self.grid_shape)
+        self.cj_2i0_Periodic_right = np.zeros(self.grid_shape)
         j = 0
         self.cj_1i1_Periodic_right[:,j] = self.cj_1i_1[:,j]
         self.cj_2i0_Periodic_right[:,j] = self.cj_2i0[:,j]
@@ -724,8 +839,8 @@ class F2D(Flexure):
       if self.BC_W == 'Periodic':
         # New arrays -- new diagonals, but mostly empty. Just corners of blocks
         # (boxes) in block-diagonal matrix
-        self.cj1i_1_Periodic_left = np.zeros(self.qs.shape)
-        self.cj2i0_Periodic_left = np.zeros(self.qs.shape)
+        self.cj1i_1_Periodic_left = np.zeros(self.grid_shape)
+        self.cj2i0_Periodic_left = np.zeros(self.grid_shape)
         j = -1
         self.cj1i_1_Periodic_left[:,j] = self.cj1i_1[:,j]
         self.cj2i0_Periodic_left[:,j] = self.cj2i0[:,j]
@@ -1246,235 +1361,799 @@ class F2D(Flexure):
     # Nothing to be done here.
 
   def build_diagonals(self):
-
-    ##########################################################
-    # INCORPORATE BOUNDARY CONDITIONS INTO COEFFICIENT ARRAY #
-    ##########################################################
-
-    # Roll to keep the proper coefficients at the proper places in the
-    # arrays: Python will naturally just do vertical shifts instead of 
-    # diagonal shifts, so this takes into account the horizontal compoent 
-    # to ensure that boundary values are at the right place.
-        
-    # Roll x
-# ASYMMETRIC RESPONSE HERE -- THIS GETS TOWARDS SOURCE OF PROBLEM!
-    self.cj_2i0 = np.roll(self.cj_2i0, -2, 1)
-    self.cj_1i0 = np.roll(self.cj_1i0, -1, 1)
-    self.cj1i0 = np.roll(self.cj1i0, 1, 1)
-    self.cj2i0 = np.roll(self.cj2i0, 2, 1)
-    # Roll y
-    self.cj0i_2 = np.roll(self.cj0i_2, -2, 0)
-    self.cj0i_1 = np.roll(self.cj0i_1, -1, 0)
-    self.cj0i1 = np.roll(self.cj0i1, 1, 0)
-    self.cj0i2 = np.roll(self.cj0i2, 2, 0)
-    # Roll x and y
-    self.cj_1i_1 = np.roll(self.cj_1i_1, -1, 1)
-    self.cj_1i_1 = np.roll(self.cj_1i_1, -1, 0)
-    self.cj_1i1 = np.roll(self.cj_1i1, -1, 1)
-    self.cj_1i1 = np.roll(self.cj_1i1, 1, 0)
-    self.cj1i_1 = np.roll(self.cj1i_1, 1, 1)
-    self.cj1i_1 = np.roll(self.cj1i_1, -1, 0)
-    self.cj1i1 = np.roll(self.cj1i1, 1, 1)
-    self.cj1i1 = np.roll(self.cj1i1, 1, 0)
-
-    coeff_array_list = [self.cj_2i0, self.cj_1i0, self.cj1i0, self.cj2i0, self.cj0i_2, self.cj0i_1, self.cj0i1, self.cj0i2, self.cj_1i_1, self.cj_1i1, self.cj1i_1, self.cj1i1, self.cj0i0]
-    for array in coeff_array_list:
-      array[np.isinf(array)] = 0
-     #array[np.isnan(array)] = 0 # had been used for testing
-    
-    # Reshape to put in solver
-    vec_cj_2i0 = np.reshape(self.cj_2i0, -1, order='C')
-    vec_cj_1i_1 = np.reshape(self.cj_1i_1, -1, order='C')
-    vec_cj_1i0 = np.reshape(self.cj_1i0, -1, order='C')
-    vec_cj_1i1 = np.reshape(self.cj_1i1, -1, order='C')
-    vec_cj0i_2 = np.reshape(self.cj0i_2, -1, order='C')
-    vec_cj0i_1 = np.reshape(self.cj0i_1, -1, order='C')
-    vec_cj0i0 = np.reshape(self.cj0i0, -1, order='C')
-    vec_cj0i1 = np.reshape(self.cj0i1, -1, order='C')
-    vec_cj0i2 = np.reshape(self.cj0i2, -1, order='C')
-    vec_cj1i_1 = np.reshape(self.cj1i_1, -1, order='C')
-    vec_cj1i0 = np.reshape(self.cj1i0, -1, order='C')
-    vec_cj1i1 = np.reshape(self.cj1i1, -1, order='C')
-    vec_cj2i0 = np.reshape(self.cj2i0, -1, order='C')
-    
-    # Changed this 6 Nov. 2014 in betahaus Berlin to be x-based
-    Up2 = vec_cj0i2
-    Up1 = np.vstack(( vec_cj_1i1, vec_cj0i1, vec_cj1i1 ))
-    Mid = np.vstack(( vec_cj_2i0, vec_cj_1i0, vec_cj0i0, vec_cj1i0, vec_cj2i0 ))
-    Dn1 = np.vstack(( vec_cj_1i_1, vec_cj0i_1, vec_cj1i_1 ))
-    Dn2 = vec_cj0i_2
-
+    """
+    Assembles the sparse (CSR) coefficient matrix straight from the
+    coefficient arrays, with the boundary conditions applied to them.
+
+    Each coefficient array fills one diagonal of the matrix (or, with
+    periodic boundary conditions, more than one: the wrap-around entries
+    are on diagonals of their own). The value on a diagonal in the column
+    of cell c is the coefficient array, shifted by whole cells in x and y
+    (with wraparound), at cell c. Rather than shifting, stacking and
+    converting copies of all of the arrays, the row, column and value of
+    each entry are computed in place; see diagonals_to_csr.
+
+    Coefficients that are infinite (flagging cells beyond the edges of the
+    grid) are left out, as are zeros.
+    """
     # Number of rows and columns for array size and offsets
     self.ny = self.nrowsy
     self.nx = self.ncolsx
-
-    if (self.BC_N == 'Periodic' and self.BC_S == 'Periodic' and \
-        self.BC_W == 'Periodic' and self.BC_E == 'Periodic' ):
-      # Additional vector creation
-      # West
-      # Roll
-      self.cj_2i0_Periodic_right = np.roll(self.cj_2i0_Periodic_right, -2, 1)
-      self.cj_1i1_Periodic_right = np.roll(self.cj_1i1_Periodic_right, -1, 1)
-      self.cj_1i1_Periodic_right = np.roll(self.cj_1i1_Periodic_right, 1, 0)
-      # Reshape
-      vec_cj_2i0_Periodic_right = np.reshape(self.cj_2i0_Periodic_right, -1, order='C')
-      vec_cj_1i1_Periodic_right = np.reshape(self.cj_1i1_Periodic_right, -1, order='C')
-      # East
-      # Roll
-      self.cj1i_1_Periodic_left = np.roll(self.cj1i_1_Periodic_left, 1, 1)
-      self.cj1i_1_Periodic_left = np.roll(self.cj1i_1_Periodic_left, -1, 0)
-      self.cj2i0_Periodic_left = np.roll(self.cj2i0_Periodic_left, 2, 1)
-      # Reshape
-      vec_cj1i_1_Periodic_left = np.reshape(self.cj1i_1_Periodic_left, -1, order='C')
-      vec_cj2i0_Periodic_left = np.reshape(self.cj2i0_Periodic_left, -1, order='C')
+    nx = self.nx
+    N = self.ny * self.nx
+
+    # Coefficient arrays, each with the shift (x, y) that puts its values
+    # in the right places along its diagonal, grouped as the
+    # diagonals two rows down (Dn2), one row down (Dn1), in the same row
+    # (Mid), one row up (Up1) and two rows up (Up2)
+    Dn2 = [(self.cj0i_2, (0, -2))]
+    Dn1 = [(self.cj_1i_1, (-1, -1)), (self.cj0i_1, (0, -1)), (self.cj1i_1, (1, -1))]
+    Mid = [(self.cj_2i0, (-2, 0)), (self.cj_1i0, (-1, 0)), (self.cj0i0, (0, 0)),
+           (self.cj1i0, (1, 0)), (self.cj2i0, (2, 0))]
+    Up1 = [(self.cj_1i1, (-1, 1)), (self.cj0i1, (0, 1)), (self.cj1i1, (1, 1))]
+    Up2 = [(self.cj0i2, (0, 2))]
     
-      # Build diagonals with additional entries
-      # I think the fact that everything is rolled will make this work all right
-      # without any additional rolling.
-      # Checked -- and indeed, what would be in my mind the last value for 
-      # Mid[3] is the first value in its array. Hooray, patterns!
-      self.diags = np.vstack(( vec_cj1i_1_Periodic_left,
-                               Up1,
-                               vec_cj_1i1_Periodic_right,
-                               Up2,
-                               Dn2,
-                               vec_cj1i_1_Periodic_left,
-                               Dn1,
-                               vec_cj2i0_Periodic_left,
-                               Mid,
-                               vec_cj_2i0_Periodic_right,
-                               Up1,
-                               vec_cj_1i1_Periodic_right,
-                               Up2,
-                               Dn2,
-                               vec_cj1i_1_Periodic_left,
-                               Dn1,
-                               vec_cj_1i1_Periodic_right ))
-      # Getting too complicated to have everything together
-      self.offsets = [
-                      # New: LL corner of LL box
-                      -self.ny*self.nx+1,
-                      # Periodic b.c. tridiag
-                      self.nx-self.ny*self.nx-1, self.nx-self.ny*self.nx, self.nx-self.ny*self.nx+1,
-                      # New: UR corner of LL box
-                      2*self.nx-self.ny*self.nx-1,
-                      # Periodic b.c. single diag
-                      2*self.nx-self.ny*self.nx,
-                      -2*self.nx,
-                      # New:
-                      -2*self.nx+1,
-                      # Right term here (-self.nx+1) modified:
-                      -self.nx-1, -self.nx, -self.nx+1,
-                      # New:
-                      -self.nx+2,
-                      # -1 and 1 terms here modified:
-                      -2, -1, 0, 1, 2,
-                      # New:
-                      self.nx-2,
-                      # Left term here (self.nx-1) modified:
-                      self.nx-1, self.nx, self.nx+1,
-                      # New:
-                      2*self.nx-1,
-                      2*self.nx,
-                      # Periodic b.c. single diag
-                      self.ny*self.nx-2*self.nx,
-                      # New: LL corner of UR box
-                      self.ny*self.nx-2*self.nx+1,
-                      # Periodic b.c. tridiag
-                      self.ny*self.nx-self.nx-1, self.ny*self.nx-self.nx, self.ny*self.nx-self.nx+1,
-                      # New: UR corner of UR box
-                      self.ny*self.nx-1
-                     ]
-
-      # create banded sparse matrix
-      self.coeff_matrix = scipy.sparse.spdiags(self.diags, self.offsets,
-        self.ny*self.nx, self.ny*self.nx, format='csr') 
-    
-    elif (self.BC_W == 'Periodic' and self.BC_E == 'Periodic'):
-      # Additional vector creation
-      # West
-      # Roll
-      self.cj_2i0_Periodic_right = np.roll(self.cj_2i0_Periodic_right, -2, 1)
-      self.cj_1i1_Periodic_right = np.roll(self.cj_1i1_Periodic_right, -1, 1)
-      self.cj_1i1_Periodic_right = np.roll(self.cj_1i1_Periodic_right, 1, 0)
-      # Reshape
-      vec_cj_2i0_Periodic_right = np.reshape(self.cj_2i0_Periodic_right, -1, order='C')
-      vec_cj_1i1_Periodic_right = np.reshape(self.cj_1i1_Periodic_right, -1, order='C')
-      # East
-      # Roll
-      self.cj1i_1_Periodic_left = np.roll(self.cj1i_1_Periodic_left, 1, 1)
-      self.cj1i_1_Periodic_left = np.roll(self.cj1i_1_Periodic_left, -1, 0)
-      self.cj2i0_Periodic_left = np.roll(self.cj2i0_Periodic_left, 2, 1)
-      # Reshape
-      vec_cj1i_1_Periodic_left = np.reshape(self.cj1i_1_Periodic_left, -1, order='C')
-      vec_cj2i0_Periodic_left = np.reshape(self.cj2i0_Periodic_left, -1, order='C')
-
-      # Build diagonals with additional entries
-      self.diags = np.vstack(( Dn2,
-                               vec_cj1i_1_Periodic_left,
-                               Dn1,
-                               vec_cj2i0_Periodic_left,
-                               Mid,
-                               vec_cj_2i0_Periodic_right,
-                               Up1,
-                               vec_cj_1i1_Periodic_right,
-                               Up2 ))
-      # Getting too complicated to have everything together
-      self.offsets = [-2*self.nx,
-                      # New:
-                      -2*self.nx+1,
-                      # Right term here (-self.nx+1) modified:
-                      -self.nx-1, -self.nx, -self.nx+1,
-                      # New:
-                      -self.nx+2,
-                      # -1 and 1 terms here modified:
-                      -2, -1, 0, 1, 2,
-                      # New:
-                      self.nx-2,
-                      # Left term here (self.nx-1) modified:
-                      self.nx-1, self.nx, self.nx+1,
-                      # New:
-                      2*self.nx-1,
-                      2*self.nx]
-
-      # create banded sparse matrix
-      self.coeff_matrix = scipy.sparse.spdiags(self.diags, self.offsets,
-        self.ny*self.nx, self.ny*self.nx, format='csr') 
-    
-    elif (self.BC_N == 'Periodic' and self.BC_S == 'Periodic'):
-      # Periodic.
-      # If these are periodic, we need to wrap around the ends of the
-      # large-scale diagonal structure
-      self.diags = np.vstack(( Up1,
-                               Up2,
-                               Dn2,
-                               Dn1,
-                               Mid,
-                               Up1,
-                               Up2,
-                               Dn2,
-                               Dn1 ))
-      # Create banded sparse matrix
-      # Rows:
-      #      Lower left
-      #      Middle
-      #      Upper right
-      self.coeff_matrix = scipy.sparse.spdiags(self.diags, [self.nx-self.ny*self.nx-1, self.nx-self.ny*self.nx, self.nx-self.ny*self.nx+1, 2*self.nx-self.ny*self.nx,
-                                                            -2*self.nx, -self.nx-1, -self.nx, -self.nx+1, -2, -1, 0, 1, 2, self.nx-1, self.nx, self.nx+1, 2*self.nx,
-                                                            self.ny*self.nx-2*self.nx, self.ny*self.nx-self.nx-1, self.ny*self.nx-self.nx, self.ny*self.nx-self.nx+1],
-                                                            self.ny*self.nx, self.ny*self.nx, format='csr')
-                                                            
+    # Diagonal offsets of each group (each entry in the group goes one
+    # further to the right)
+    diagonals = []
+    def add(group, first_offset):
+      for k, (array, shift) in enumerate(group):
+        diagonals.append((array, shift, first_offset + k))
+    add(Dn2, -2*nx)
+    add(Dn1, -nx-1)
+    add(Mid, -2)
+    add(Up1, nx-1)
+    add(Up2, 2*nx)
+
+    if self.BC_W == 'Periodic' and self.BC_E == 'Periodic':
+      # Wraparound in x: new diagonals for entries that reach across to
+      # the other side of the grid
+      West = [(self.cj_2i0_Periodic_right, (-2, 0), nx-2),
+              (self.cj_1i1_Periodic_right, (-1, 1), 2*nx-1)]
+      East = [(self.cj1i_1_Periodic_left, (1, -1), -2*nx+1),
+              (self.cj2i0_Periodic_left, (2, 0), -nx+2)]
+      diagonals += West + East
+    if self.BC_N == 'Periodic' and self.BC_S == 'Periodic':
+      # Wraparound in y: the diagonals that reach past the top and bottom of
+      # the grid continue in the opposite corners of the matrix
+      add(Dn2, N-2*nx)
+      add(Dn1, N-nx-1)
+      add(Up1, nx-N-1)
+      add(Up2, 2*nx-N)
+      if self.BC_W == 'Periodic' and self.BC_E == 'Periodic':
+        # And the corners of the corner blocks
+        diagonals += [(self.cj1i_1_Periodic_left, (1, -1), -N+1),
+                      (self.cj_1i1_Periodic_right, (-1, 1), 2*nx-N-1),
+                      (self.cj1i_1_Periodic_left, (1, -1), N-2*nx+1),
+                      (self.cj_1i1_Periodic_right, (-1, 1), N-1)]
+
+    self.coeff_matrix = diagonals_to_csr(diagonals, (self.ny, self.nx))
+
+  def matrix_free_operator(self):
+    """
+    Sets self.coeff_matrix to a StencilOperator: a matrix-free version of
+    the coefficient matrix, for iterative solutions. It applies the stencil
+    straight from the (padded) flexural rigidity.
+
+    The rows for the cells next to the edges, which are changed by the
+    boundary conditions, are taken from the full coefficient matrices of
+    two thin strips of the grid: the four columns at each of the east and
+    west edges, and the four rows at each of the north and south edges.
+    Each of these rows depends only on the rigidity within one cell and on
+    the distance to the edges, so these are the same as the rows of the
+    full matrix, for a cost that scales with the perimeter of the grid
+    rather than its area.
+    """
+    ny, nx = self.grid_shape
+    if nx < 8 or ny < 8:
+      # Nothing to gain for such a small grid
+      self.get_coeff_values_and_matrix()
+      return
+    x_strip = np.hstack(( np.arange(4), np.arange(nx-4, nx) ))
+    y_strip = np.hstack(( np.arange(4), np.arange(ny-4, ny) ))
+    on_edge = np.array([True, True, False, False, False, False, True, True])
+    # Full-grid cell indices for the strips, and those strip cells that
+    # are next to the edges (in order of preference)
+    frame = []
+    for rows, cols, edge_cells in [
+        (np.arange(ny), x_strip, np.outer(np.ones(ny, dtype=bool), on_edge)),
+        (y_strip, np.arange(nx), np.outer(on_edge, np.ones(nx, dtype=bool)))]:
+      A = self.strip_coeff_matrix(rows, cols).tocoo()
+      cells = (rows[:,np.newaxis]*nx + cols).ravel()
+      keep = edge_cells.ravel()[A.row]
+      frame.append((cells[A.row[keep]], cells[A.col[keep]], A.data[keep]))
+    # Cells next to the east and west edges come from the first strip
+    in_first = np.zeros(ny*nx, dtype=bool)
+    in_first[frame[0][0]] = True
+    second = ~in_first[frame[1][0]]
+    rows = np.hstack(( frame[0][0], frame[1][0][second] ))
+    cols = np.hstack(( frame[0][1], frame[1][1][second] ))
+    data = np.hstack(( frame[0][2], frame[1][2][second] ))
+    frame_rows, frame_index = np.unique(rows, return_inverse=True)
+    frame_matrix = scipy.sparse.csr_matrix((data, (frame_index, cols)),
+                                           shape=(frame_rows.size, ny*nx))
+    frame_matrix.sum_duplicates()
+    if np.isscalar(self.Te):
+      D = self.D
+    else:
+      D = np.pad(self.D, 1, mode='edge')
+    self.coeff_matrix = StencilOperator(self.stencil_coefficients, D,
+                                        self.grid_shape, self.stencil_offsets,
+                                        frame_rows, frame_matrix)
+
+  def strip_coeff_matrix(self, rows, cols):
+    """
+    Coefficient matrix for the part of the grid made up of the given rows
+    and columns, with the same boundary conditions
+    """
+    import copy
+    strip = copy.copy(self)
+    strip.Quiet = True
+    strip.Verbose = False
+    strip.Debug = False
+    if not np.isscalar(self.Te):
+      strip.Te = self.Te[np.ix_(rows, cols)]
+    strip.grid_shape = (len(rows), len(cols))
+    strip.elasprep()
+    if self.PlateSolutionType == 'energy':
+      strip.energy_coeff_matrix()
+    else:
+      strip.get_coeff_values_and_matrix()
+    return strip.coeff_matrix
+
+  def subdomain_coeff_matrix(self, rows, cols, halo=3):
+    """
+    cells, A = subdomain_coeff_matrix((i0, i1), (j0, j1))
+
+    Rows and columns of the coefficient matrix for the cells in rows i0 to
+    i1 and columns j0 to j1 of the grid (which may run past a periodic
+    boundary), and the (row-major) indices of those cells in the full grid.
+
+    If the full matrix has been built, they are taken from it. Otherwise
+    (MatrixFree), they are taken from the coefficient matrix of that part
+    of the grid plus a halo of cells on each side that is not at an edge of
+    the grid: each row of the matrix depends only on the rigidity within
+    one cell and the deflections within two, so the rows for the cells
+    inside of the halo are the same as in the full matrix. The exceptions
+    are the rows for the cells next to the edges of the grid, which the
+    matrix-free operator has explicitly (see matrix_free_operator), and
+    which are taken from it: a part of the grid that crosses a periodic
+    boundary does not have the same rows there.
+    """
+    ny, nx = self.grid_shape
+    if scipy.sparse.issparse(self.coeff_matrix):
+      cells = ((np.arange(*rows) % ny)[:,np.newaxis]*nx + np.arange(*cols) % nx).ravel()
+      A = self.coeff_matrix.tocsr()
+      return cells, A[cells][:,cells]
+    windows = []
+    for (start, stop), n, periodic in [(rows, ny, self.BC_N == 'Periodic'),
+                                       (cols, nx, self.BC_W == 'Periodic')]:
+      if periodic:
+        lo, hi = start - halo, stop + halo
+      else:
+        lo, hi = max(start - halo, 0), min(stop + halo, n)
+      if hi - lo >= n:
+        # The whole grid in this direction
+        lo, hi = 0, n
+      windows.append(( np.arange(lo, hi) % n, np.arange(start - lo, stop - lo) % n ))
+    (window_rows, inner_rows), (window_cols, inner_cols) = windows
+    A = self.strip_coeff_matrix(window_rows, window_cols).tocsr()
+    inner = (inner_rows[:,np.newaxis]*len(window_cols) + inner_cols).ravel()
+    cells = (window_rows[inner_rows][:,np.newaxis]*nx + window_cols[inner_cols]).ravel()
+    A = A[inner][:,inner]
+    frame = np.flatnonzero(np.isin(cells, self.coeff_matrix.frame_rows))
+    if len(frame):
+      frame_matrix = self.coeff_matrix.frame_matrix[
+        np.searchsorted(self.coeff_matrix.frame_rows, cells[frame])][:,cells]
+      not_frame = np.ones(len(cells))
+      not_frame[frame] = 0
+      place = scipy.sparse.csr_matrix((np.ones(len(frame)),
+                                      (frame, np.arange(len(frame)))),
+                                      shape=(len(cells), len(frame)))
+      A = scipy.sparse.diags(not_frame).dot(A) + place.dot(frame_matrix)
+    return cells, A.tocsr()
+
+  def update_Te(self, Te, i0=0, j0=0):
+    """
+    Sets the elastic thickness in the part of the grid starting at row i0
+    and column j0 to the 2D array Te, and updates the coefficient matrix
+    from a previous run to match (see patch_coeff_matrix): only the rows
+    for the cells within two cells of the change are reassembled, so the
+    cost scales with the size of the change rather than that of the grid.
+    Without such a matrix, the next run builds one, as usual.
+    """
+    Te = np.asarray(Te, dtype=float)
+    i1 = i0 + Te.shape[0]
+    j1 = j0 + Te.shape[1]
+    if np.isscalar(self.Te):
+      self.Te = self.Te * np.ones(self.grid_shape)
+    self.Te[i0:i1, j0:j1] = Te
+    try:
+      if self.Te_unpadded is not self.Te:
+        self.Te_unpadded[i0:i1, j0:j1] = Te
+    except (AttributeError, TypeError):
+      pass
+    # And the rigidity (padded, if it has been by BC_Rigidity)
+    D = self.E*Te**3/(12*(1-self.nu**2))
+    try:
+      if np.isscalar(self.D):
+        self.D = self.D * np.ones(self.grid_shape)
+      pad = (self.D.shape[0] - self.grid_shape[0]) // 2
+      self.D[i0+pad:i1+pad, j0+pad:j1+pad] = D
+    except AttributeError:
+      pass
+    self.patch_coeff_matrix((i0-2, i1+2), (j0-2, j1+2))
+
+  def update_boundary_conditions(self, BC_W=None, BC_E=None, BC_N=None, BC_S=None):
+    """
+    Changes the boundary conditions that are given, and updates the
+    coefficient matrix from a previous run to match (see
+    patch_coeff_matrix): only the rows for the cells within two cells of
+    those edges are reassembled.
+    Periodic boundary conditions must still be set on both opposite edges.
+    """
+    ny, nx = self.grid_shape
+    edges = []
+    if BC_W is not None:
+      self.BC_W = BC_W
+      edges.append(((0, ny), (0, 2)))
+    if BC_E is not None:
+      self.BC_E = BC_E
+      edges.append(((0, ny), (nx-2, nx)))
+    if BC_N is not None:
+      self.BC_N = BC_N
+      edges.append(((0, 2), (0, nx)))
+    if BC_S is not None:
+      self.BC_S = BC_S
+      edges.append(((ny-2, ny), (0, nx)))
+    if self.PlateSolutionType == 'energy':
+      # The loads at the edges are weighted by their share of a cell
+      a = self.energy_operators_1D(nx, self.dx, self.BC_W, self.BC_E)[3]
+      b = self.energy_operators_1D(ny, self.dy, self.BC_N, self.BC_S)[3]
+      self.coeff_load_weights = np.outer(b[1:-1], a[1:-1]).ravel()
+    for rows, cols in edges:
+      self.patch_coeff_matrix(rows, cols)
+
+  def patch_coeff_matrix(self, rows, cols, halo=3):
+    """
+    Reassembles the rows of the coefficient matrix for the cells in rows i0
+    to i1 and columns j0 to j1 of the grid (which may run past a periodic
+    boundary; otherwise they are clipped to the grid), given as (i0, i1) and
+    (j0, j1), after a change to the elastic thickness or to the boundary
+    conditions there.
+
+    The rows are taken from the coefficient matrix of that part of the grid
+    plus a halo of cells on each side, as for subdomain_coeff_matrix.
+    Across a periodic boundary, the part of the grid is made up of the
+    cells on both sides of it, in the order of the full grid, so that its
+    own (periodic) boundary is the one of the full grid. Next to any other
+    edge, the rows for the two cells at the opposite edge are reassembled
+    as well, as build_diagonals takes some of the entries for the cells at
+    each edge from the coefficients at the opposite one.
+    If the new rows have the same nonzero entries as the old ones, as for a
+    change to the elastic thickness, their values are replaced in place;
+    otherwise, the matrix is rebuilt from the rest of its rows and these.
+    Either way, any stored factorization of it is discarded.
+
+    This is done only for a sparse coefficient matrix that gFlex built in a
+    previous run; otherwise, the next run builds the whole matrix anew.
+    """
+    if self.coeff_matrix is None or self.coeff_matrix_signature is None \
+       or not scipy.sparse.issparse(self.coeff_matrix):
+      return
+    patch_start_time = time.time()
+    ny, nx = self.grid_shape
+    windows = []
+    for (start, stop), n, periodic in [(rows, ny, self.BC_N == 'Periodic'),
+                                       (cols, nx, self.BC_W == 'Periodic')]:
+      if not periodic:
+        start, stop = max(start, 0), min(stop, n)
+      cells = np.arange(start, stop) % n
+      if stop - start + 2*halo >= n:
+        window = np.arange(n)
+      elif periodic:
+        window = np.unique(np.arange(start - halo, stop + halo) % n)
+      else:
+        window = np.arange(max(start - halo, 0), min(stop + halo, n))
+        if start < 2 or stop > n - 2:
+          # The diagonals wrap around, so the rows for the two cells at each
+          # edge take some of their entries from the coefficients at the
+          # opposite edge: these rows change together
+          window = np.unique(np.hstack(( window, np.arange(2 + halo),
+                                         np.arange(n - 2 - halo, n) )))
+          cells = np.hstack(( cells, np.arange(2), np.arange(n - 2, n) ))
+      windows.append(( window, np.isin(window, cells) ))
+    (window_rows, inner_rows), (window_cols, inner_cols) = windows
+    A = self.strip_coeff_matrix(window_rows, window_cols).tocoo()
+    window_cells = (window_rows[:,np.newaxis]*nx + window_cols).ravel()
+    inner = np.outer(inner_rows, inner_cols).ravel()
+    cells = window_cells[inner]
+    order = np.argsort(cells)
+    cells = cells[order]
+    # New rows, in the order of the cells, and with full-grid columns
+    row_index = np.empty(window_cells.size, dtype=int)
+    row_index[np.flatnonzero(inner)[order]] = np.arange(cells.size)
+    keep = inner[A.row]
+    new_rows = scipy.sparse.csr_matrix((A.data[keep],
+                 (row_index[A.row[keep]], window_cells[A.col[keep]])),
+                 shape=(cells.size, ny*nx))
+    new_rows.sum_duplicates()
+    new_rows.eliminate_zeros()
+    coeff_matrix = self.coeff_matrix.tocsr()
+    starts = coeff_matrix.indptr[cells]
+    counts = coeff_matrix.indptr[cells+1] - starts
+    in_place = False
+    if (counts == np.diff(new_rows.indptr)).all():
+      entries = np.repeat(starts - new_rows.indptr[:-1], counts) \
+                + np.arange(new_rows.nnz)
+      if (coeff_matrix.indices[entries] == new_rows.indices).all():
+        if matrix_cache.operator_cache.holds(coeff_matrix):
+          # Other models may be using it: change a copy
+          coeff_matrix = coeff_matrix.copy()
+        coeff_matrix.data[entries] = new_rows.data
+        in_place = True
+    if not in_place:
+      others = np.ones(ny*nx)
+      others[cells] = 0
+      place = scipy.sparse.csr_matrix((np.ones(cells.size),
+                                      (cells, np.arange(cells.size))),
+                                      shape=(ny*nx, cells.size))
+      coeff_matrix = scipy.sparse.diags(others).dot(coeff_matrix) \
+                     + place.dot(new_rows)
+      coeff_matrix.eliminate_zeros()
+    self.coeff_matrix = coeff_matrix
+    self.coeff_matrix_signature = self.operator_signature()
+    self.release_coeff_factor()
+    self.coeff_patch_time = time.time() - patch_start_time
+    if self.Quiet == False:
+      print("Time to update", cells.size, "rows of coefficient matrix [s]:",
+            self.coeff_patch_time)
+
+  def energy_coeff_matrix(self):
+    """
+    Builds a symmetric positive-definite coefficient matrix by minimizing
+    the discretized strain energy of the plate,
+
+      1/2 * integral of D * [ w_xx^2 + w_yy^2 + 2*nu*w_xx*w_yy
+                              + 2*(1-nu)*w_xy^2 ]  +  1/2 * drho*g*w^2,
+
+    with w_xx and w_yy evaluated at the nodes and w_xy in the cells between
+    them (where D is the average of its four corners). This gives
+    K = sum of L^T * diag(weight * D) * L over the curvature operators L,
+    which is symmetric and, for nu < 1 and drho*g > 0, positive definite.
+
+    For constant Te and clamped or periodic boundaries, K is identical to
+    the vWC1994 operator; with variable Te the two are different
+    discretizations of the same equation. Cells on a mirror, 0Slope0Shear
+    or free (0Moment0Shear) edge have half of a control volume, so the
+    loads there are weighted by the same amount (self.coeff_load_weights);
+    zero moment and shear at free edges are the natural boundary
+    conditions of the energy.
+    """
+    from scipy.sparse import diags, kron
+    self.ny, self.nx = self.grid_shape
+    Ex, Lx, Gx, ax, cx = self.energy_operators_1D(self.nx, self.dx, self.BC_W, self.BC_E)
+    Ey, Ly, Gy, ay, cy = self.energy_operators_1D(self.ny, self.dy, self.BC_N, self.BC_S)
+    # Rigidity at the nodes, including the ghost nodes just outside the grid
+    D = np.pad(self.D * np.ones(self.grid_shape), 1, mode='edge')
+    if self.BC_W == 'Periodic':
+      D[:,0] = D[:,-2]
+      D[:,-1] = D[:,1]
+    if self.BC_N == 'Periodic':
+      D[0,:] = D[-2,:]
+      D[-1,:] = D[1,:]
+    D_cells = (D[:-1,:-1] + D[1:,:-1] + D[:-1,1:] + D[1:,1:]) / 4.
+    node_weights = diags((np.outer(ay, ax) * D).ravel())
+    cell_weights = diags((np.outer(cy, cx) * D_cells).ravel())
+    # Curvature operators on the grid (row-major: y = rows, x = columns)
+    Lxx = kron(Ey, Lx, format='csr')
+    Lyy = kron(Ly, Ex, format='csr')
+    Lxy = kron(Gy, Gx, format='csr')
+    self.coeff_load_weights = np.outer(ay[1:-1], ax[1:-1]).ravel()
+    K = Lxx.T.dot(node_weights).dot(Lxx) + Lyy.T.dot(node_weights).dot(Lyy) \
+        + self.nu * Lxx.T.dot(node_weights).dot(Lyy) \
+        + self.nu * Lyy.T.dot(node_weights).dot(Lxx) \
+        + 2*(1-self.nu) * Lxy.T.dot(cell_weights).dot(Lxy) \
+        + diags(self.coeff_load_weights * self.drho * self.g)
+    # Symmetric to round-off; make it exactly so
+    K = (K + K.T) / 2.
+    self.coeff_matrix = K.tocsr()
+    self.coeff_matrix.sum_duplicates()
+    self.coeff_matrix.eliminate_zeros()
+
+  def energy_operators_1D(self, n, d, BC_start, BC_end):
+    """
+    E, L, G, a, c = energy_operators_1D(n, d, BC_start, BC_end)
+
+    Operators along one direction of the grid for energy_coeff_matrix, on
+    the n nodes plus one ghost node at each end:
+    E -- values at the n+2 nodes, with the ghosts set by the b.c.'s
+    L -- second differences (curvature) at the n+2 nodes
+    G -- first differences in the n+1 cells between them
+    a, c -- quadrature weights for the nodes and the cells
+    """
+    import scipy.sparse
+    # Values at the grid nodes and two ghost nodes at each end
+    rows = list(range(2, n+2))
+    cols = list(range(n))
+    values = [1.]*n
+    a = np.ones(n+2)
+    c = np.ones(n+1)
+    for BC, ghost, node, step in [(BC_start, [1, 0], 0, 1), (BC_end, [n+2, n+3], n-1, -1)]:
+      # ghost[k-1] is the ghost node k cells outside of the edge "node"
+      for k in [1, 2]:
+        if BC == 'Periodic':
+          rows += [ghost[k-1]]
+          cols += [(node - step*k) % n]
+          values += [1.]
+        elif BC == 'Mirror' or BC == '0Slope0Shear':
+          # Reflection across the edge node
+          rows += [ghost[k-1]]
+          cols += [node + step*k]
+          values += [1.]
+        elif BC == '0Moment0Shear':
+          # Linear extrapolation: no curvature at or beyond the edge
+          rows += [ghost[k-1], ghost[k-1]]
+          cols += [node, node + step]
+          values += [1. + k, -k]
+        elif BC == '0Displacement0Slope':
+          # Fixed at 0 beyond the edge
+          pass
+        else:
+          sys.exit("Invalid boundary condition")
+      # Index of the ghost node (in a) and of the cell outside the edge (in c)
+      a_ghost, c_ghost = (0, 0) if step == 1 else (-1, -1)
+      a_edge = 1 if step == 1 else -2
+      if BC == '0Displacement0Slope':
+        # The curvature and twist just outside of the clamped edge count
+        pass
+      elif BC == 'Periodic':
+        a[a_ghost] = 0
+        # The cell that wraps around is counted once, at the end
+        if step == 1:
+          c[c_ghost] = 0
+      else:
+        # Half of a control volume at the edge node
+        a[a_ghost] = 0
+        a[a_edge] = 0.5
+        c[c_ghost] = 0
+    E = scipy.sparse.csr_matrix((values, (rows, cols)), shape=(n+4, n))
+    second_difference = scipy.sparse.diags([1., -2., 1.], [0, 1, 2], shape=(n+2, n+4))
+    L = second_difference.dot(E) / d**2
+    first_difference = scipy.sparse.diags([-1., 1.], [0, 1], shape=(n+1, n+2))
+    E = E[1:-1]
+    G = first_difference.dot(E) / d
+    return E, L.tocsr(), G.tocsr(), a, c
+
+  def new_coeff_factor(self):
+    """
+    For the multigrid solver, its hierarchy of coarse-grid operators and
+    smoothers, and for the Schwarz solver, its subdomain factorizations
+    (which likewise need only be set up once for a given coefficient
+    matrix), and for the quadtree solver, the factorization of the
+    coefficient matrix reduced to the B-splines on the quadtree; otherwise
+    the sparse factorization from
+    sparse_factorization(), which the mixed-precision solver does in single
+    precision.
+    """
+    if self.Solver == "multigrid" or self.Solver == "Multigrid":
+      return self.multigrid()
+    elif self.Solver == "schwarz" or self.Solver == "Schwarz":
+      return self.schwarz()
+    elif self.Solver == "quadtree" or self.Solver == "Quadtree" \
+      or self.coarsened_padding():
+      return self.quadtree()
+    elif self.Solver == "iterative" or self.Solver == "Iterative":
+      return self.preconditioner()
+    elif self.Solver == "mixed" or self.Solver == "Mixed":
+      return MixedPrecisionFactor(self.coeff_matrix, self.sparse_factorization)
     else:
-      # No periodic boundary conditions -- original form of coeff_matrix
-      # creator.
-      # Arrange in solver
-      self.diags = np.vstack(( Dn2,
-                               Dn1,
-                               Mid,
-                               Up1,
-                               Up2 ))
-      # Create banded sparse matrix
-      self.coeff_matrix = scipy.sparse.spdiags(self.diags, [-2*self.nx, -self.nx-1, -self.nx, -self.nx+1, -2, -1, 0, 1, 2, self.nx-1, self.nx, self.nx+1, 2*self.nx], self.ny*self.nx, self.ny*self.nx, format='csr') # create banded sparse matrix
+      return self.sparse_factorization(self.coeff_matrix)
+
+  def sparse_factorization(self, A):
+    """
+    Factorization of A (the coefficient matrix, or a single-precision copy
+    of it): Cholesky (or symmetric-mode LU) for the symmetric
+    positive-definite ("energy") operator and sparse LU otherwise, with the
+    unknowns in the order chosen by self.Ordering:
+      None: the default of the factorization (COLAMD for LU, minimum
+            degree on A^T+A for the symmetric operator)
+      'nested_dissection': nested dissection of the grid (least fill-in)
+      'rcm': reverse Cuthill-McKee (a narrow band)
+      'colamd', 'mmd_ata', 'mmd_at_plus_a', 'natural': SuperLU's orderings
+    """
+    from scipy.sparse.linalg import splu
+    if self.PlateSolutionType == 'energy':
+      factorize = SymmetricFactor
+      in_order = lambda A: SymmetricFactor(A, 'NATURAL')
+    else:
+      factorize = lambda A, permc_spec='COLAMD': splu(A, permc_spec=permc_spec)
+      # Threshold pivoting keeps close to the given order
+      in_order = lambda A: splu(A, permc_spec='NATURAL', diag_pivot_thresh=0.1)
+    permutation = self.fill_reducing_permutation()
+    if permutation is not None:
+      return PermutedFactor(A, permutation, in_order)
+    elif self.Ordering is None:
+      return factorize(A.tocsc())
+    else:
+      return factorize(A.tocsc(), self.Ordering.upper())
+
+  def fill_reducing_permutation(self):
+    """
+    Permutation of the unknowns for the nested dissection or reverse
+    Cuthill-McKee orderings (None for the others, which are computed inside
+    of SuperLU). It depends only on the grid and the boundary conditions,
+    so it is kept, and reused for as long as these stay the same (e.g., for
+    a new Te).
+    """
+    if self.Ordering is None:
+      return None
+    ordering = self.Ordering.lower()
+    if ordering not in ['nested_dissection', 'rcm']:
+      if ordering not in ['colamd', 'mmd_ata', 'mmd_at_plus_a', 'natural']:
+        sys.exit("Ordering must be 'nested_dissection', 'rcm', 'colamd',\n"+
+                 "'mmd_ata', 'mmd_at_plus_a', 'natural', or None. Exiting.")
+      return None
+    key = (ordering, self.grid_shape, self.BC_W, self.BC_E, self.BC_N,
+           self.BC_S, self.PlateSolutionType)
+    if self.coeff_permutation_key != key:
+      if ordering == 'nested_dissection':
+        self.coeff_permutation = nested_dissection(self.grid_shape,
+                                   periodic_x=(self.BC_W == 'Periodic'),
+                                   periodic_y=(self.BC_N == 'Periodic'))
+      else:
+        from scipy.sparse.csgraph import reverse_cuthill_mckee
+        self.coeff_permutation = \
+          reverse_cuthill_mckee(self.coeff_matrix.tocsr(), symmetric_mode=True)
+      self.coeff_permutation_key = key
+    elif self.Debug:
+      print("Using stored", self.Ordering, "ordering")
+    return self.coeff_permutation
+
+  def schwarz(self):
+    """
+    Overlapping Schwarz domain decomposition for the coefficient matrix.
+
+    The grid is split into subdomains of about SubdomainSize cells on a
+    side, each of which is extended by SubdomainOverlap cells. Their
+    matrices are assembled from their own parts of the grid (see
+    subdomain_coeff_matrix) and factorized, in nested dissection order,
+    by Processes worker processes (by default, one for each core). The
+    coarse grid for the coarse-grid correction has four to eight cells
+    across each subdomain, and its operator is the Galerkin product
+    P^T A P, summed over the rows that the subdomains own.
+    """
+    import multiprocessing
+    ny, nx = self.grid_shape
+    periodic_x = (self.BC_W == 'Periodic')
+    periodic_y = (self.BC_N == 'Periodic')
+    size = self.SubdomainSize
+    # The rows of the cells that a subdomain owns must be complete for the
+    # coarse-grid operator: the stencil reaches two cells out
+    overlap = max(self.SubdomainOverlap, 2)
+    ybreaks = np.linspace(0, ny, max(1, int(round(ny / float(size)))) + 1).astype(int)
+    xbreaks = np.linspace(0, nx, max(1, int(round(nx / float(size)))) + 1).astype(int)
+    subdomains = []
+    for i0, i1 in zip(ybreaks[:-1], ybreaks[1:]):
+      for j0, j1 in zip(xbreaks[:-1], xbreaks[1:]):
+        ranges = []
+        for start, stop, n, parts, periodic in [(i0, i1, ny, len(ybreaks)-1, periodic_y),
+                                                (j0, j1, nx, len(xbreaks)-1, periodic_x)]:
+          if parts == 1:
+            ranges.append((0, n))
+          elif periodic:
+            ranges.append((start - overlap, stop + overlap))
+          else:
+            ranges.append((max(start - overlap, 0), min(stop + overlap, n)))
+        cells, A = self.subdomain_coeff_matrix(*ranges)
+        row, col = divmod(cells, nx)
+        owned = (row >= i0) & (row < i1) & (col >= j0) & (col < j1)
+        shape = (ranges[0][1] - ranges[0][0], ranges[1][1] - ranges[1][0])
+        permutation = nested_dissection(shape,
+                        periodic_x=(periodic_x and shape[1] == nx),
+                        periodic_y=(periodic_y and shape[0] == ny))
+        subdomains.append((cells, owned, A, permutation))
+    # Coarse grid: halve the grid (as for multigrid) until its cells are
+    # between an eighth and a quarter of the size of the subdomains
+    if len(subdomains) > 1:
+      P = scipy.sparse.identity(ny*nx, format='csr')
+      coarse_shape = (ny, nx)
+      factor = 1
+      while 8*factor <= size and min(coarse_shape) >= 16:
+        Py = cell_centered_prolongation(coarse_shape[0], periodic_y)
+        Px = cell_centered_prolongation(coarse_shape[1], periodic_x)
+        P = P.dot(scipy.sparse.kron(Py, Px, format='csr'))
+        coarse_shape = (Py.shape[1], Px.shape[1])
+        factor *= 2
+      Ac = scipy.sparse.csr_matrix((P.shape[1], P.shape[1]))
+      for cells, owned, A, permutation in subdomains:
+        Ac = Ac + P[cells[owned]].T.dot(A[owned].dot(P[cells]))
+      coarse = (P, Ac)
+    else:
+      coarse = None
+    processes = self.Processes
+    if processes is None:
+      processes = multiprocessing.cpu_count()
+    if self.MaxIterations is None:
+      maxiter = 100
+    else:
+      maxiter = self.MaxIterations
+    return Schwarz(self.coeff_matrix, subdomains, coarse, processes=processes,
+                   tol=self.iterative_ConvergenceTolerance, maxiter=maxiter)
+
+  def quadtree(self):
+    """
+    Adaptive solution on a quadtree: the grid is split into square blocks,
+    which are split into four, recursively, down to single cells near the
+    edges of the loads and jumps in elastic thickness, and left whole
+    elsewhere, where the plate bends smoothly.
+
+    The blocks of each size are the knot spans of cubic B-splines, of which
+    those that are "active" on the quadtree (Kraft, 1997) span the space in
+    which the deflection is found: a B-spline of level k is used if all of
+    the blocks under it are split at least k times, but not all of them
+    more. Sampled on the grid, these are the columns of P, and the
+    deflection is the Ritz-Galerkin solution in their span (see
+    QuadtreeFactor), which is returned on the grid.
+
+    The size of the blocks doubles every QuadtreeGrading blocks of the
+    smaller size away from a feature (i.e., where the load or the elastic
+    thickness changes by more than QuadtreeTolerance of its largest value
+    from one cell to the next). The largest blocks are 2**QuadtreeLevels
+    cells on a side; by default, they are as large as possible but no more
+    than half of the shortest flexural wavelength in the grid.
+
+    For the direct solver on a padded grid (see pad_domain()), the grid
+    inside of the padding is taken as the feature, so that only the padding
+    is coarsened, and its cells are themselves the unknowns.
+    """
+    from scipy.ndimage import distance_transform_edt
+    ny, nx = self.grid_shape
+    periodic = (self.BC_N == 'Periodic', self.BC_W == 'Periodic')
+    # Features: changes in the load (or in any of a stack of loads) and in
+    # the elastic thickness from one cell to the next
+    features = np.zeros((ny, nx), dtype=bool)
+    fields = list(self.qs.reshape(-1, ny, nx))
+    if not np.isscalar(self.Te):
+      fields.append(self.Te)
+    if self.coarsened_padding():
+      # Or only the padding is coarsened, and the grid inside of it is
+      # kept at its full resolution
+      north, south, west, east = self.padding_cells
+      features[north:ny-south, west:nx-east] = True
+      fields = []
+    for field in fields:
+      tolerance = self.QuadtreeTolerance * np.abs(field).max()
+      for axis in [0, 1]:
+        jump = np.abs(np.diff(field, axis=axis)) > tolerance
+        if periodic[axis]:
+          jump = np.concatenate(( jump, np.abs(np.take(field, [0], axis)
+                     - np.take(field, [-1], axis)) > tolerance ), axis=axis)
+          features |= jump | np.roll(jump, 1, axis=axis)
+        else:
+          pad = [(0, 0), (0, 0)]
+          pad[axis] = (1, 0)
+          features |= np.pad(jump, pad, mode='constant')
+          pad[axis] = (0, 1)
+          features |= np.pad(jump, pad, mode='constant')
+    # Number of times that the largest blocks are split
+    levels = self.QuadtreeLevels
+    if levels is None:
+      Te = np.asarray(self.Te, dtype=float)
+      Dmin = self.E*Te[Te > 0].min()**3/(12*(1-self.nu**2))
+      wavelength = 2*np.pi*(Dmin/(self.drho*self.g))**.25
+      levels = int(np.log2(max(wavelength / (2 * max(self.dx, self.dy)), 1)))
+    # ... with at least four of them across the grid, fitting exactly into
+    # it across periodic boundaries
+    while levels > 0 and (min(ny, nx) < 4 * 2**levels
+                          or (periodic[0] and ny % 2**levels)
+                          or (periodic[1] and nx % 2**levels)):
+      levels -= 1
+    # Size of the blocks needed in each cell, and the number of times that
+    # the block around it is split
+    if features.any():
+      distance = distance_transform_edt(~features)
+    else:
+      distance = np.inf * np.ones((ny, nx))
+    size = 2**np.clip(np.floor(np.log2(1 + distance/self.QuadtreeGrading)), 0, levels)
+    def block_min(a, s):
+      nby, nbx = -(-ny // s), -(-nx // s)
+      a = np.pad(a, ((0, nby*s - ny), (0, nbx*s - nx)), mode='edge')
+      return a.reshape(nby, s, nbx, s).min(axis=(1, 3))
+    depth = np.zeros((ny, nx), dtype=int)
+    for k in range(levels):
+      s = 2**(levels - k)
+      split = block_min(size, s) < s
+      depth += np.repeat(np.repeat(split, s, axis=0), s, axis=1)[:ny, :nx]
+    self.quadtree_depth = depth
+    # Active B-splines of each level: those for which the least depth under
+    # them is that level
+    def window_min(a, axis, periodic):
+      if periodic:
+        shifted = [np.roll(a, -i, axis=axis) for i in range(4)]
+      else:
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (3, 3)
+        a = np.pad(a, pad, mode='constant', constant_values=levels+1)
+        n = a.shape[axis] - 3
+        shifted = [np.take(a, np.arange(i, i + n), axis=axis) for i in range(4)]
+      return np.min(shifted, axis=0)
+    columns = []
+    for k in range(levels + 1):
+      s = 2**(levels - k)
+      if k == levels and self.coarsened_padding():
+        # The cells at the full resolution themselves, rather than the
+        # B-splines on them, so that the operator there is as sparse as it
+        # is on the grid
+        cells = np.flatnonzero(depth == levels)
+        columns.append(scipy.sparse.identity(ny*nx, format='csc')[:,cells])
+        continue
+      least_depth = window_min(window_min(block_min(depth, s), 0, periodic[0]),
+                               1, periodic[1])
+      active = np.flatnonzero(least_depth == k)
+      if len(active):
+        B = scipy.sparse.kron(bspline_basis(ny, s, periodic[0]),
+                              bspline_basis(nx, s, periodic[1]), format='csc')
+        columns.append(B[:,active])
+    P = scipy.sparse.hstack(columns, format='csc')
+    # Fill-reducing order: that of nested dissection of the grid, with each
+    # unknown after all of the cells that it spans
+    rank = np.empty(ny*nx, dtype=int)
+    rank[nested_dissection(self.grid_shape, periodic_x=periodic[1],
+                           periodic_y=periodic[0])] = np.arange(ny*nx)
+    last = np.maximum.reduceat(rank[P.indices], P.indptr[:-1])
+    factor = QuadtreeFactor(self.coeff_matrix, P,
+                            symmetric=(self.PlateSolutionType == 'energy'),
+                            permutation=np.argsort(last, kind='stable'))
+    if self.Quiet == False:
+      print("Quadtree:", levels, "levels;", factor.unknowns, "unknowns for",
+            ny*nx, "cells")
+    return factor
+
+  def multigrid(self):
+    """
+    Multigrid hierarchy for the coefficient matrix
+    """
+    return Multigrid(self.coeff_matrix, self.grid_shape,
+                     periodic_x=(self.BC_W == 'Periodic'),
+                     periodic_y=(self.BC_N == 'Periodic'),
+                     tol=self.iterative_ConvergenceTolerance)
+
+  def preconditioner(self):
+    """
+    Preconditioner for the iterative solver, as a LinearOperator (or None):
+    incomplete LU ('ilu'), the inverse of the diagonal ('jacobi'), or a
+    multigrid V-cycle ('multigrid')
+    """
+    from scipy.sparse.linalg import LinearOperator, spilu
+    shape = self.coeff_matrix.shape
+    if self.Preconditioner is None or str(self.Preconditioner).lower() in ['', 'none']:
+      return None
+    elif not scipy.sparse.issparse(self.coeff_matrix) \
+      and self.Preconditioner.lower() in ['ilu', 'multigrid']:
+      # These need the matrix itself
+      if self.Quiet == False:
+        print("Preconditioner", self.Preconditioner, "needs the coefficient matrix:")
+        print("Defaulting to Jacobi preconditioner for matrix-free solution")
+      inverse_diagonal = 1./self.coeff_matrix.diagonal()
+      return LinearOperator(shape, matvec=lambda r: inverse_diagonal*r)
+    elif self.Preconditioner.lower() == 'ilu':
+      # Minimum-degree ordering on A^T+A keeps the incomplete factors close
+      # to the symmetric structure of the plate operator; COLAMD ordering
+      # gives much poorer factors for free-edge boundary conditions
+      ilu = spilu(self.coeff_matrix.tocsc(), drop_tol=1E-6, fill_factor=20,
+                  permc_spec='MMD_AT_PLUS_A')
+      M = LinearOperator(shape, matvec=ilu.solve)
+      # The size of the incomplete factors (see factor_nnz)
+      M.nnz = ilu.L.nnz + ilu.U.nnz
+      return M
+    elif self.Preconditioner.lower() == 'jacobi':
+      inverse_diagonal = 1./self.coeff_matrix.diagonal()
+      return LinearOperator(shape, matvec=lambda r: inverse_diagonal*r)
+    elif self.Preconditioner.lower() == 'multigrid':
+      return self.multigrid().aslinearoperator()
+    else:
+      sys.exit("Preconditioner must be 'ilu', 'jacobi', 'multigrid', or None. Exiting.")
 
   def calc_max_flexural_wavelength(self):
     """
@@ -1484,10 +2163,8 @@ class F2D(Flexure):
     case, the flexural wavelength is a good characteristic distance for any 
     truncation limit
     """
-    if np.isscalar(self.D):
-      Dmax = self.D
-    else:
-      Dmax = self.D.max()
+    # From Te, which (unlike D) is not padded by the boundary conditions
+    Dmax = self.E*np.max(self.Te)**3/(12*(1-self.nu**2))
     # This is an approximation if there is fill that evolves with iterations 
     # (e.g., water), but should be good enough that this won't do much to it
     alpha = (4*Dmax/(self.drho*self.g))**.25 # 2D flexural parameter
@@ -1495,6 +2172,170 @@ class F2D(Flexure):
     self.maxFlexuralWavelength_ncells_x = int(np.ceil(self.maxFlexuralWavelength / self.dx))
     self.maxFlexuralWavelength_ncells_y = int(np.ceil(self.maxFlexuralWavelength / self.dy))
     
+  def factor_options(self):
+    """
+    As for Flexure, and for the quadtree solver, its settings and the
+    loads, which the quadtree is refined around
+    """
+    options = super(F2D, self).factor_options()
+    if self.Padding:
+      options += (self.padding_cells,)
+    if self.Solver == "quadtree" or self.Solver == "Quadtree":
+      import hashlib
+      loads = hashlib.sha1(np.ascontiguousarray(self.qs, dtype=float).tobytes())
+      options += (self.QuadtreeLevels, self.QuadtreeTolerance,
+                  self.QuadtreeGrading, loads.hexdigest())
+    elif self.coarsened_padding():
+      options += (self.QuadtreeLevels, self.QuadtreeGrading)
+    return options
+
+  def pad_domain(self):
+    """
+    Pads the grid out by one maximum flexural wavelength past each edge
+    that is not periodic or mirrored, so that the boundary condition there
+    is applied far enough from the loads to have little effect on their
+    deflections. The load is zero in the padding, and the elastic thickness
+    that at the edge of the grid; crop_domain() undoes this.
+
+    The padding is at the full resolution of the grid, but with the direct
+    solver, it is coarsened as for the quadtree solver (see quadtree()),
+    away from the grid inside of it: the unknowns are then those of the
+    grid and few more. The quadtree solver coarsens it along with the grid,
+    and the other solvers solve on the whole padded grid.
+    """
+    self.calc_max_flexural_wavelength()
+    def padding(BC, ncells):
+      if BC == 'Periodic' or BC == 'Mirror':
+        return 0
+      else:
+        return ncells
+    self.padding_cells = (padding(self.BC_N, self.maxFlexuralWavelength_ncells_y),
+                          padding(self.BC_S, self.maxFlexuralWavelength_ncells_y),
+                          padding(self.BC_W, self.maxFlexuralWavelength_ncells_x),
+                          padding(self.BC_E, self.maxFlexuralWavelength_ncells_x))
+    north, south, west, east = self.padding_cells
+    self.unpadded_domain = (self.qs, self.Te)
+    pad = [(0, 0)] * (self.qs.ndim - 2) + [(north, south), (west, east)]
+    self.qs = np.pad(self.qs, pad, mode='constant')
+    if not np.isscalar(self.Te):
+      self.Te = np.pad(self.Te, pad[-2:], mode='edge')
+    self.grid_shape = self.qs.shape[-2:]
+    if self.Quiet == False and not self.coarsened_padding() \
+      and self.Solver.lower() != 'quadtree':
+      print("Padding is at the full resolution of the grid with the",
+            self.Solver, "solver")
+
+  def crop_domain(self):
+    """
+    Returns the loads and elastic thickness to what they were before
+    pad_domain(), and the deflections to their grid (keeping those on the
+    padded grid as w_padded)
+    """
+    north, south, west, east = self.padding_cells
+    ny, nx = self.grid_shape
+    self.w_padded = self.w
+    self.w = self.w[..., north:ny-south, west:nx-east]
+    self.qs, self.Te = self.unpadded_domain
+    # (and for finalize(), which resets Te to this)
+    self.Te_unpadded = self.Te
+    self.grid_shape = self.qs.shape[-2:]
+
+  def coarsened_padding(self):
+    """
+    True if the grid is padded (see pad_domain()) for the direct solver,
+    which then solves on the grid with its padding coarsened
+    """
+    return self.Padding and (self.Solver == "direct" or self.Solver == "Direct")
+
+  def sweep_Te(self, Te_values, Processes=None):
+    """
+    w = sweep_Te(Te_values)
+
+    Deflections for each of a list of elastic thicknesses (scalars or
+    grids), with the same loads and all other parameters, stacked along a
+    new leading axis (so w[i] is for Te_values[i]). The model's own Te and
+    coefficient matrix are left as they are.
+
+    The sparsity pattern of the coefficient matrix depends only on the grid
+    and the boundary conditions, so the fill-reducing ordering of its
+    unknowns is found once, for the first member of the sweep, and each
+    further one is only assembled and factorized numerically in that order.
+    Without a chosen Ordering, nested dissection is used.
+    (The orderings inside of SuperLU, such as 'colamd', cannot be kept;
+    with them, each member is factorized from the start.)
+
+    The members after the first are split among Processes worker processes
+    (by default self.Processes, or one for each core if this is None).
+    """
+    import copy
+    import multiprocessing
+    if self.Method != 'FD':
+      sys.exit("Te sweeps are only available for the finite difference\n"+
+               "solution method. Exiting.")
+    sweep_start_time = time.time()
+    member = copy.copy(self)
+    member.Quiet = True
+    member.Verbose = False
+    member.Debug = False
+    member.ReuseFactorization = True
+    if member.Ordering is None:
+      member.Ordering = 'nested_dissection'
+    # A Schwarz factorization would otherwise be shared with its workers
+    member.coeff_factor = None
+    member.coeff_factor_matrix = None
+    Te_values = list(Te_values)
+    w = [member.sweep_member(Te_values[0])]
+    if Processes is None:
+      Processes = self.Processes
+    if Processes is None:
+      Processes = multiprocessing.cpu_count()
+    Processes = max(1, min(Processes, len(Te_values) - 1))
+    groups = [list(range(i, len(Te_values), Processes))
+              for i in range(1, Processes + 1)]
+    if Processes == 1:
+      w += [member.sweep_member(Te) for Te in Te_values[1:]]
+    else:
+      # The first member's coefficient matrix and factors stay here
+      member.coeff_matrix = None
+      member.coeff_factor = None
+      member.coeff_factor_matrix = None
+      connections = []
+      workers = []
+      for group in groups:
+        connection, worker_connection = multiprocessing.Pipe()
+        worker = multiprocessing.Process(target=sweep_worker,
+                   args=(worker_connection, member, [Te_values[i] for i in group]))
+        worker.daemon = True
+        worker.start()
+        connections.append(connection)
+        workers.append(worker)
+      w += [None] * (len(Te_values) - 1)
+      for group, connection, worker in zip(groups, connections, workers):
+        for i, wi in zip(group, connection.recv()):
+          w[i] = wi
+        connection.close()
+        worker.join()
+    self.sweep_time = time.time() - sweep_start_time
+    if self.Quiet == False:
+      print("Time to solve for", len(Te_values), "elastic thicknesses [s]:",
+            self.sweep_time)
+    return np.array(w)
+
+  def sweep_member(self, Te):
+    """
+    Deflections for the elastic thickness Te, solved by this model (a copy
+    made by sweep_Te), which keeps its ordering of the unknowns from one
+    member of the sweep to the next
+    """
+    if np.isscalar(Te):
+      self.Te = float(Te)
+    else:
+      self.Te = np.array(Te, dtype=float)
+    self.coeff_matrix = None
+    self.coeff_matrix_signature = None
+    self.run()
+    return self.w
+
   def fd_solve(self):
     """
     w = fd_solve()
@@ -1516,14 +2357,104 @@ class F2D(Flexure):
       self.calc_max_flexural_wavelength()
       print("maxFlexuralWavelength_ncells: (x, y):", self.maxFlexuralWavelength_ncells_x, self.maxFlexuralWavelength_ncells_y)
     
-    q0vector = self.qs.reshape(-1, order='C')
+    # One column per load: a stack of loads is solved as multiple
+    # right-hand sides against the same operator
+    ncells = self.grid_shape[0] * self.grid_shape[1]
+    q0vector = self.qs.reshape(-1, ncells, order='C').T
+    if self.coeff_load_weights is not None:
+      # Control-volume weighting of the loads for the "energy" operator
+      q0vector = q0vector * self.coeff_load_weights[:,np.newaxis]
+    # Warm start for iterative solutions: the previous deflections, if they
+    # are for the same grid (e.g., from the last step of a time series)
+    x0vector = None
+    if self.WarmStart:
+      try:
+        if self.w.shape == self.qs.shape:
+          x0vector = -self.w.reshape(-1, ncells, order='C').T
+      except AttributeError:
+        pass
+    if not scipy.sparse.issparse(self.coeff_matrix) \
+      and self.Solver not in ["iterative", "Iterative", "schwarz", "Schwarz"]:
+      sys.exit("A matrix-free coefficient matrix (MatrixFree) can only be used\n"+
+               "with the iterative or Schwarz solvers. Exiting.")
+    self.convergence = None
     if self.Solver == "iterative" or self.Solver == "Iterative":
-      if self.Debug:
-        print("Using generalized minimal residual method for iterative solution")
+      if self.PlateSolutionType == 'energy':
+        # Symmetric positive-definite: conjugate gradients
+        method = scipy.sparse.linalg.cg
+        if self.Debug:
+          print("Using conjugate gradients for iterative solution")
+      else:
+        method = scipy.sparse.linalg.lgmres
+        if self.Debug:
+          print("Using generalized minimal residual method for iterative solution")
       if self.Verbose:
-        print("Converging to a tolerance of", self.iterative_ConvergenceTolerance, "m between iterations")
-      wvector = scipy.sparse.linalg.isolve.lgmres(self.coeff_matrix, q0vector)#, tol=1E-10)#,x0=woldvector)#,x0=wvector,tol=1E-15)    
-      wvector = wvector[0] # Reach into tuple to get my array back
+        print("Converging to a relative residual of", self.iterative_ConvergenceTolerance)
+      # The preconditioner is stored in the same way as a factorization
+      self.factorize_coeff_matrix()
+      options = {'M': self.coeff_factor}
+      if self.MaxIterations is not None:
+        options['maxiter'] = self.MaxIterations
+      wvector = np.zeros(q0vector.shape)
+      history = []
+      info = []
+      for i in range(q0vector.shape[1]):
+        if x0vector is not None:
+          options['x0'] = x0vector[:,i]
+        # Records the residual at each iteration
+        monitor = KrylovMonitor(self.coeff_matrix, q0vector[:,i],
+                                self.iterative_callbacks)
+        wi = krylov(method, self.coeff_matrix, q0vector[:,i],
+                    self.iterative_ConvergenceTolerance, monitor=monitor,
+                    **options)
+        wvector[:,i] = wi[0] # Reach into tuple to get my array back
+        history.append(monitor.history)
+        info.append(wi[1])
+      self.record_convergence(self.coeff_matrix, wvector, q0vector, history, info)
+    elif self.Solver == "multigrid" or self.Solver == "Multigrid":
+      if self.Debug:
+        print("Using multigrid-preconditioned GMRES")
+      # The multigrid hierarchy is stored in the same way as a factorization
+      self.factorize_coeff_matrix()
+      wvector = self.coeff_factor.solve(q0vector, x0=x0vector,
+                                        tol=self.iterative_ConvergenceTolerance,
+                                        maxiter=self.MaxIterations,
+                                        callbacks=self.iterative_callbacks)
+      self.record_convergence(self.coeff_matrix, wvector, q0vector,
+                              self.coeff_factor.history, self.coeff_factor.info)
+    elif self.Solver == "schwarz" or self.Solver == "Schwarz":
+      if self.Debug:
+        print("Using Schwarz-preconditioned GMRES")
+      # The subdomain factorizations are stored in the same way as a
+      # factorization
+      self.factorize_coeff_matrix()
+      wvector = self.coeff_factor.solve(q0vector, x0=x0vector,
+                                        tol=self.iterative_ConvergenceTolerance,
+                                        maxiter=self.MaxIterations,
+                                        callbacks=self.iterative_callbacks)
+      self.record_convergence(self.coeff_matrix, wvector, q0vector,
+                              self.coeff_factor.history, self.coeff_factor.info)
+    elif self.Solver == "quadtree" or self.Solver == "Quadtree" \
+      or self.coarsened_padding():
+      if self.Debug:
+        print("Using adaptive (quadtree) solution")
+      # The reduced operator is factorized and kept as for "direct"
+      self.factorize_coeff_matrix()
+      wvector = self.coeff_factor.solve(q0vector)
+    elif self.Solver == "mixed" or self.Solver == "Mixed":
+      if self.Debug:
+        print("Using single-precision factorization with iterative refinement")
+      # The single-precision factors are stored and reused as for "direct"
+      self.factorize_coeff_matrix()
+      wvector = self.coeff_factor.solve(q0vector)
+      self.refinement_residual = self.coeff_factor.residual
+      if self.coeff_factor.precision == 'double' and self.Quiet == False:
+        print("Coefficient matrix is too poorly conditioned for iterative")
+        print("refinement of a single-precision factorization:")
+        print("factorized in double precision instead")
+      if self.Quiet == False:
+        print("Relative residual after", self.coeff_factor.iterations,
+              "refinement steps:", self.refinement_residual)
     else:
       if self.Solver == "direct" or self.Solver == "Direct":
         if self.Debug:
@@ -1532,10 +2463,26 @@ class F2D(Flexure):
         if self.Quiet == False:
           print("Solution type not understood:")
           print("Defaulting to direct solution with UMFpack")
-      wvector = scipy.sparse.linalg.spsolve(self.coeff_matrix, q0vector, use_umfpack=True)
+      if self.ReuseFactorization or self.PlateSolutionType == 'energy' \
+        or self.Ordering is not None:
+        # Factorize once and keep the factor for subsequent runs (always
+        # done for the "energy" operator, to use its symmetry, and with a
+        # chosen fill-reducing ordering)
+        self.factorize_coeff_matrix()
+        wvector = self.coeff_factor.solve(q0vector)
+      else:
+        wvector = scipy.sparse.linalg.spsolve(self.coeff_matrix, q0vector, use_umfpack=True)
 
-    # Reshape into grid
-    self.w = -wvector.reshape(self.qs.shape)
+    # Reshape into grid (or stack of grids)
+    self.w = -wvector.reshape(ncells, -1).T.reshape(self.qs.shape)
     self.w_padded = self.w.copy() # for troubleshooting
 
     # Time to solve used to be here
+
+def sweep_worker(connection, flex, Te_values):
+  """
+  Runs in a worker process for F2D.sweep_Te: sends back the list of
+  deflections for the given elastic thicknesses, solved by flex
+  """
+  connection.send([flex.sweep_member(Te) for Te in Te_values])
+  connection.close()
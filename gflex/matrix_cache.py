@@ -0,0 +1,315 @@
+"""
+This file is part of gFlex.
+gFlex computes lithospheric flexural isostasy with heterogeneous rigidity
+Copyright (C) 2010-2018 Andrew D. Wickert
+
+gFlex is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+gFlex is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with gFlex.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from __future__ import division, print_function # No automatic floor division
+import os
+import time
+import json
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import scipy.sparse
+from solvers import factor_nnz, Schwarz
+
+# On-disk cache of finite difference coefficient matrices: one compressed
+# .npz file for each matrix, named by the signature (hash) of the model
+# parameters that it was built from (see Flexure.operator_signature), and a
+# record of the numbers of cache hits and misses
+
+# Version of the assembly and storage of the cached matrices, which is part
+# of their signatures (along with the version of gFlex): raise it when
+# either changes, so that matrices cached before are not used
+FORMAT_VERSION = 1
+
+def cache_file(directory, signature):
+  """
+  Path of the cached coefficient matrix with the given signature
+  """
+  return os.path.join(directory, 'coeff_matrix_' + signature + '.npz')
+
+def read_coeff_matrix(directory, signature):
+  """
+  A, load_weights = read_coeff_matrix(directory, signature)
+
+  The cached coefficient matrix (CSR) with the given signature, and the
+  weights for the loads that were stored with it (or None), or (None, None)
+  if it is not in the cache. Its file is touched, so that the least
+  recently used matrices are evicted first.
+  """
+  path = cache_file(directory, signature)
+  try:
+    with np.load(path) as f:
+      A = scipy.sparse.csr_matrix((f['data'], f['indices'], f['indptr']),
+                                  shape=tuple(f['shape']))
+      if 'load_weights' in f:
+        load_weights = f['load_weights']
+      else:
+        load_weights = None
+  except (IOError, OSError, KeyError, ValueError):
+    return None, None
+  try:
+    os.utime(path, None)
+  except OSError:
+    pass
+  return A, load_weights
+
+def replace_file(source, target):
+  """
+  Moves the file source to target, replacing target if it exists: os.rename
+  does not do so on Windows, and os.replace is not in Python 2
+  """
+  if hasattr(os, 'replace'):
+    os.replace(source, target)
+  else:
+    os.rename(source, target)
+
+def write_atomically(target, write, suffix=''):
+  """
+  Writes the file target by passing write() a binary file object for a
+  temporary file in the same directory, which is then moved into place, so
+  that other runs using the same cache never read a partly-written file
+  """
+  handle, path = tempfile.mkstemp(suffix=suffix,
+                                  dir=os.path.dirname(target))
+  try:
+    with os.fdopen(handle, 'wb') as f:
+      write(f)
+    replace_file(path, target)
+  except:
+    os.remove(path)
+    raise
+
+def write_coeff_matrix(directory, signature, A, load_weights=None):
+  """
+  Stores the coefficient matrix A (and the weights for the loads, if not
+  None) in the cache, under the given signature
+  """
+  if not os.path.isdir(directory):
+    os.makedirs(directory)
+  A = A.tocsr()
+  arrays = {'data': A.data, 'indices': A.indices, 'indptr': A.indptr,
+            'shape': np.array(A.shape)}
+  if load_weights is not None:
+    arrays['load_weights'] = load_weights
+  write_atomically(cache_file(directory, signature),
+                   lambda f: np.savez_compressed(f, **arrays), '.npz')
+
+def cached_files(directory):
+  """
+  List of (path, size [bytes], time of last use) for the cached matrices,
+  least recently used first
+  """
+  files = []
+  try:
+    names = os.listdir(directory)
+  except OSError:
+    return files
+  for name in names:
+    if name.startswith('coeff_matrix_') and name.endswith('.npz'):
+      path = os.path.join(directory, name)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      files.append((path, stat.st_size, stat.st_mtime))
+  return sorted(files, key=lambda f: f[2])
+
+def evict(directory, max_size=None, max_age=None):
+  """
+  Removes the cached matrices that have not been used for more than
+  max_age days, and then the least recently used ones until the rest take
+  up no more than max_size megabytes. Either limit may be None (no limit).
+  Returns the number of matrices removed.
+  """
+  files = cached_files(directory)
+  removed = []
+  if max_age is not None:
+    oldest = time.time() - max_age * 86400.
+    removed += [f for f in files if f[2] < oldest]
+  if max_size is not None:
+    kept = [f for f in files if f not in removed]
+    size = sum(f[1] for f in kept)
+    for f in kept:
+      if size <= max_size * 1E6:
+        break
+      removed.append(f)
+      size -= f[1]
+  for path, size, mtime in removed:
+    try:
+      os.remove(path)
+    except OSError:
+      pass
+  return len(removed)
+
+def record_lookup(directory, hit):
+  """
+  Adds a cache hit (or miss) to the counts kept in the cache directory
+  """
+  counts = cache_report(directory)
+  if hit:
+    counts['hits'] += 1
+  else:
+    counts['misses'] += 1
+  try:
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    stats = json.dumps({'hits': counts['hits'], 'misses': counts['misses']})
+    write_atomically(os.path.join(directory, 'stats.json'),
+                     lambda f: f.write(stats.encode('utf-8')), '.json')
+  except (IOError, OSError):
+    pass
+
+def cache_report(directory):
+  """
+  Summary of the cache: a dict with the number of matrices stored in it
+  ('entries'), their total size in megabytes ('size'), and the numbers of
+  hits and misses for all of the runs that have used it ('hits', 'misses')
+  """
+  try:
+    with open(os.path.join(directory, 'stats.json')) as f:
+      counts = json.load(f)
+  except (IOError, OSError, ValueError):
+    counts = {}
+  files = cached_files(directory)
+  return {'entries': len(files),
+          'size': sum(f[1] for f in files) / 1E6,
+          'hits': counts.get('hits', 0),
+          'misses': counts.get('misses', 0)}
+
+# In-memory cache of coefficient matrices and their factorizations, shared
+# by the models in this process that set ShareOperators
+
+def nbytes(value):
+  """
+  Approximate memory used by a cached coefficient matrix or factorization:
+  the arrays of a sparse matrix, or 12 bytes (a value and an index) for
+  each nonzero entry in the factors of a factorization (including those of
+  an incomplete LU preconditioner), or None if its size cannot be counted
+  (as for the multigrid hierarchy and the other preconditioners)
+  """
+  if scipy.sparse.issparse(value):
+    value = value.tocsr()
+    return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+  nnz = factor_nnz(value)
+  if nnz is None:
+    return None
+  return 12 * nnz
+
+class OperatorCache(object):
+  """
+  Least recently used (LRU) cache of coefficient matrices and their
+  factorizations, keyed by the signature of the model parameters that they
+  were built from (see Flexure.operator_signature), so that models with the
+  same plate share one operator rather than each building its own.
+
+  Only the models with ShareOperators set use it, and what they store in
+  it is kept after they are finalized, until it is evicted or clear() is
+  called. Entries are evicted, least recently used first, to keep their
+  total size within max_size megabytes and their number within max_entries
+  (either may be None: no limit). A max_size of 0 turns the cache off.
+  stats() reports its use.
+  """
+
+  def __init__(self, max_size=512, max_entries=None):
+    self.max_size = max_size
+    self.max_entries = max_entries
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def enabled(self):
+    return self.max_size is None or self.max_size > 0
+
+  def get(self, key):
+    """
+    The value stored under key (which becomes the most recently used), or
+    None if there is none
+    """
+    if not self.enabled():
+      return None
+    try:
+      value, size = self.entries.pop(key)
+    except KeyError:
+      self.misses += 1
+      return None
+    self.entries[key] = (value, size)
+    self.hits += 1
+    return value
+
+  def put(self, key, value, size=None):
+    """
+    Stores value under key, and evicts the least recently used entries if
+    the cache is over its limits. A value larger than max_size on its own,
+    or whose size is not given and cannot be counted (see nbytes), is not
+    stored; nor is a Schwarz solver, whose worker processes belong to the
+    model that started them, which stops them when it is done with it.
+    """
+    if not self.enabled() or isinstance(value, Schwarz):
+      return
+    if size is None:
+      size = nbytes(value)
+    self.entries.pop(key, None)
+    if size is None:
+      return
+    if self.max_size is not None and size > self.max_size * 1E6:
+      return
+    self.entries[key] = (value, size)
+    self.evict()
+
+  def evict(self):
+    """
+    Removes the least recently used entries until the cache is within its
+    limits
+    """
+    while self.entries and (
+      (self.max_size is not None and self.size() > self.max_size * 1E6) or
+      (self.max_entries is not None and len(self.entries) > self.max_entries)):
+      self.entries.popitem(last=False)
+      self.evictions += 1
+
+  def holds(self, value):
+    """
+    Whether value (a matrix, for instance) is stored in the cache, and so
+    may be in use by other models
+    """
+    return any(cached is value or (type(cached) is tuple and
+                                   any(item is value for item in cached))
+               for cached, size in self.entries.values())
+
+  def size(self):
+    """
+    Total size of the entries [bytes]
+    """
+    return sum(size for value, size in self.entries.values())
+
+  def clear(self):
+    self.entries.clear()
+
+  def stats(self):
+    """
+    Summary of the cache: a dict with the number of entries ('entries'),
+    their total size in megabytes ('size'), and the numbers of hits,
+    misses and evictions since it was created
+    """
+    return {'entries': len(self.entries), 'size': self.size() / 1E6,
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions}
+
+operator_cache = OperatorCache()
@@ -0,0 +1,197 @@
+"""
+This file is part of gFlex.
+gFlex computes lithospheric flexural isostasy with heterogeneous rigidity
+Copyright (C) 2010-2018 Andrew D. Wickert
+
+gFlex is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+gFlex is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with gFlex.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+from __future__ import division, print_function # No automatic floor division
+import os
+import sys
+import time
+import json
+import csv
+try:
+  import tracemalloc
+except ImportError:
+  # Python 2
+  tracemalloc = None
+try:
+  import resource
+except ImportError:
+  # Windows
+  resource = None
+
+# Metrics of each stage of a run (see Flexure.stage): its wall time and,
+# optionally, the peak memory that it allocates, recorded in a dict that can
+# be written to a JSON or CSV file
+
+# Stages that are running, outermost first (stages may be nested; e.g., the
+# factorization within the solution)
+open_stages = []
+# Whether memory tracing was started here (and so should be stopped here)
+started_tracing = False
+
+def max_rss():
+  """
+  Peak resident memory of this process so far [bytes], including that of
+  compiled libraries (e.g., SuperLU), or None where this is not available
+  """
+  if resource is None:
+    return None
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin':
+    return rss
+  else:
+    # [kB]
+    return rss * 1024
+
+def stop_tracing():
+  """
+  Stops tracing memory allocations, if it was started by a Stage and no
+  stage is running
+  """
+  global started_tracing
+  if started_tracing and not open_stages:
+    tracemalloc.stop()
+    started_tracing = False
+
+class Stage(object):
+  """
+  with Stage(metrics, name, trace_memory, callbacks):
+    ...
+
+  Adds the wall time [s] of what it encloses to metrics['stages'][name],
+  along with the number of times that it has been run and the peak resident
+  memory of the process at its end (max_rss, [bytes]). With trace_memory,
+  the peak memory allocated within it, above what was in use at its start,
+  is recorded as well (peak_memory, [bytes]): this is traced by tracemalloc,
+  which counts numpy arrays, but not the memory of compiled libraries, and
+  slows down the run.
+
+  Each of the callbacks is then called as callback(name, record), with the
+  record of the stage.
+  """
+
+  def __init__(self, metrics, name, trace_memory=False, callbacks=()):
+    self.metrics = metrics
+    self.name = name
+    self.trace_memory = trace_memory and tracemalloc is not None
+    self.callbacks = callbacks
+
+  def __enter__(self):
+    global started_tracing
+    if self.trace_memory:
+      if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+      self.start_memory = self.traced_peak()
+      self.peak = self.start_memory
+    open_stages.append(self)
+    self.start_time = time.time()
+    return self
+
+  def __exit__(self, *exception):
+    elapsed = time.time() - self.start_time
+    if self.trace_memory:
+      self.traced_peak()
+    open_stages.remove(self)
+    # Memory is only traced within stages
+    stop_tracing()
+    record = self.metrics['stages'].setdefault(self.name,
+               {'time': 0., 'calls': 0, 'peak_memory': None, 'max_rss': None})
+    record['time'] += elapsed
+    record['calls'] += 1
+    if self.trace_memory:
+      peak_memory = self.peak - self.start_memory
+      if record['peak_memory'] is None or peak_memory > record['peak_memory']:
+        record['peak_memory'] = peak_memory
+    record['max_rss'] = max_rss()
+    for callback in self.callbacks:
+      callback(self.name, record)
+    return False
+
+  def traced_peak(self):
+    """
+    Passes the peak of traced memory since the last call on to all of the
+    running stages (and this one), and starts a new peak from the memory
+    in use now, which it returns
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    for stage in open_stages + [self]:
+      stage.peak = max(getattr(stage, 'peak', current), peak)
+    if hasattr(tracemalloc, 'reset_peak'):
+      tracemalloc.reset_peak()
+    return current
+
+def flat_metrics(metrics, prefix=''):
+  """
+  The metrics as a flat list of (name, value) pairs, with the names of
+  nested entries joined by '.' (e.g., 'stages.factorization.time')
+  """
+  items = []
+  for name in sorted(metrics):
+    value = metrics[name]
+    if isinstance(value, dict):
+      items += flat_metrics(value, prefix + name + '.')
+    else:
+      if isinstance(value, (list, tuple)):
+        value = 'x'.join(str(v) for v in value)
+      items.append((prefix + name, value))
+  return items
+
+def write_metrics(metrics, filename):
+  """
+  Writes the metrics to a JSON file or, if the filename ends in ".csv", to
+  a row of a CSV file with one column for each of them. A CSV file that is
+  already there has the row added to it, so that runs can be compared; if
+  the metrics have columns that it does not, it is rewritten with the
+  columns of both (the rows that it had are kept, and are left blank in the
+  new columns, as is the new row in any columns of theirs that it lacks).
+  """
+  if filename.endswith('.csv'):
+    row = dict((name, '' if value is None else value)
+               for name, value in flat_metrics(metrics))
+    header = sorted(row)
+    rows = []
+    if os.path.exists(filename):
+      with open(filename) as f:
+        reader = csv.reader(f)
+        old_header = next(reader, None) or []
+        rows = list(reader)
+      if set(header) <= set(old_header):
+        # The same columns (or more): only the row need be added
+        with open(filename, 'a') as f:
+          csv.DictWriter(f, old_header, restval='').writerow(row)
+        return
+      header = old_header + [name for name in header if name not in old_header]
+      rows = [dict(zip(old_header, old_row)) for old_row in rows]
+    with open(filename, 'w') as f:
+      writer = csv.DictWriter(f, header, restval='')
+      writer.writeheader()
+      writer.writerows(rows)
+      writer.writerow(row)
+  else:
+    with open(filename, 'w') as f:
+      json.dump(metrics, f, indent=2, sort_keys=True, default=json_value)
+
+def json_value(value):
+  """
+  numpy scalars and arrays, for json.dump
+  """
+  if hasattr(value, 'tolist'):
+    return value.tolist()
+  raise TypeError(repr(value) + " is not JSON serializable")
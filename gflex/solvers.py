@@ -0,0 +1,1014 @@
+"""
+This file is part of gFlex.
+gFlex computes lithospheric flexural isostasy with heterogeneous rigidity
+Copyright (C) 2010-2018 Andrew D. Wickert
+
+gFlex is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+gFlex is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with gFlex.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from __future__ import division, print_function # No automatic floor division
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+from scipy.linalg import lapack, lu_factor, lu_solve
+
+def bandwidths(A):
+  """
+  kl, ku = bandwidths(A)
+
+  Numbers of sub- (kl) and super- (ku) diagonals that hold the nonzero
+  entries of the sparse matrix A
+  """
+  A = A.tocsr()
+  if A.nnz == 0:
+    return 0, 0
+  offsets = A.indices - csr_rows(A)
+  return max(-offsets.min(), 0), max(offsets.max(), 0)
+
+def cyclic_bandwidths(A):
+  """
+  kl, ku = cyclic_bandwidths(A)
+
+  As bandwidths(A), but with the band allowed to wrap around the corners
+  of the matrix (as it does for periodic boundary conditions)
+  """
+  A = A.tocsr()
+  if A.nnz == 0:
+    return 0, 0
+  n = A.shape[0]
+  offsets = (A.indices - csr_rows(A) + n//2) % n - n//2
+  return max(-offsets.min(), 0), max(offsets.max(), 0)
+
+def csr_rows(A):
+  """
+  Row index of each stored entry of the CSR matrix A
+  """
+  return np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))
+
+def diagonals_to_csr(diagonals, grid_shape, block_size=32768):
+  """
+  A = diagonals_to_csr(diagonals, grid_shape)
+
+  Sparse (CSR) matrix for a finite difference operator on a 2D grid (cells
+  in row-major order), given as a list of (array, (x, y) shift, offset):
+  each array, np.roll-ed by the shift and flattened, is the diagonal at
+  that offset -- as scipy.sparse.spdiags would place it, with the value in
+  the column of each cell. Infinite values and zeros are left out, and
+  values on the same diagonal are added together.
+
+  The values are written straight into the CSR data array, one slot in
+  each row for every diagonal that crosses it, working through the rows a
+  block at a time; the empty slots are then squeezed out in place. No
+  full-size shifted or stacked copies of the arrays are made, and there is
+  no conversion from another sparse format.
+  """
+  ny, nx = grid_shape
+  N = ny * nx
+  offsets = np.array(sorted(set(offset for array, shift, offset in diagonals)))
+  by_offset = [[(array, shift) for array, shift, o in diagonals if o == offset]
+               for offset in offsets]
+  # Row r is crossed by the diagonals with -r <= offset < N-r: a run of the
+  # sorted offsets that only changes at these rows
+  breaks = np.concatenate(([0, N], -offsets, N - offsets,
+                           np.arange(0, N, block_size)))
+  breaks = np.unique(breaks[(breaks >= 0) & (breaks <= N)])
+  lo = np.searchsorted(offsets, -breaks[:-1], side='left')
+  hi = np.searchsorted(offsets, N - breaks[:-1], side='left')
+  ends = np.concatenate(([0], np.cumsum((hi - lo) * np.diff(breaks))))
+  if ends[-1] < np.iinfo(np.int32).max:
+    index_dtype = np.int32
+  else:
+    index_dtype = np.int64
+  data = np.empty(ends[-1])
+  indices = np.empty(ends[-1], dtype=index_dtype)
+  indptr = np.empty(N+1, dtype=index_dtype)
+  indptr[0] = 0
+  for r0, r1, k0, k1, p0, p1 in zip(breaks[:-1], breaks[1:], lo, hi,
+                                    ends[:-1], ends[1:]):
+    width = k1 - k0
+    indptr[r0+1:r1+1] = p0 + width * np.arange(1, r1 - r0 + 1)
+    if width == 0:
+      continue
+    block = np.zeros((width, r1 - r0))
+    for k in range(k0, k1):
+      c0 = r0 + offsets[k]
+      c1 = r1 + offsets[k]
+      # Those grid rows of each shifted array
+      rows = np.arange(c0 // nx, (c1 - 1) // nx + 1)
+      for array, (sx, sy) in by_offset[k]:
+        values = np.roll(array[(rows - sy) % ny], sx, axis=1).ravel()
+        values = values[c0 - rows[0]*nx : c1 - rows[0]*nx]
+        values[np.isinf(values)] = 0
+        block[k - k0] += values
+    data[p0:p1].reshape(r1 - r0, width)[:] = block.T
+    indices[p0:p1].reshape(r1 - r0, width)[:] = \
+      np.arange(r0, r1)[:,np.newaxis] + offsets[k0:k1]
+  A = scipy.sparse.csr_matrix((data, indices, indptr), shape=(N, N))
+  A.eliminate_zeros()
+  return A
+
+def factor_nnz(factor):
+  """
+  Number of nonzero entries stored in the factors of a factorization (from
+  splu, or one of the factor classes here), or None if it does not have
+  sparse factors (e.g., a preconditioner)
+  """
+  try:
+    return factor.nnz
+  except AttributeError:
+    pass
+  try:
+    return factor.L.nnz + factor.U.nnz
+  except AttributeError:
+    return None
+
+def fd_weights(x, order):
+  """
+  weights = fd_weights(x, order)
+
+  Finite difference weights for the derivative of the given order at
+  x = 0 from the values at the points x (which need not be evenly spaced),
+  by the recursion of Fornberg (1988, Math. Comp. 51, 699-706).
+
+  x is an (npoints, n) array: the points of n stencils, one in each column,
+  relative to the point at which each derivative is taken. The weights are
+  returned in an array of the same shape; for evenly spaced points, they
+  are the usual central differences.
+  """
+  x = np.asarray(x, dtype=float)
+  npoints = x.shape[0]
+  # C[j][k]: weight of point j for the derivative of order k
+  C = [[np.zeros(x.shape[1:]) for k in range(order+1)] for j in range(npoints)]
+  C[0][0] = np.ones(x.shape[1:])
+  c1 = np.ones(x.shape[1:])
+  c4 = x[0]
+  for i in range(1, npoints):
+    mn = min(i, order)
+    c2 = np.ones(x.shape[1:])
+    c5 = c4
+    c4 = x[i]
+    for j in range(i):
+      c3 = x[i] - x[j]
+      c2 = c2 * c3
+      if j == i - 1:
+        for k in range(mn, 0, -1):
+          C[i][k] = c1 * (k*C[i-1][k-1] - c5*C[i-1][k]) / c2
+        C[i][0] = -c1 * c5 * C[i-1][0] / c2
+      for k in range(mn, 0, -1):
+        C[j][k] = (c4*C[j][k] - k*C[j][k-1]) / c3
+      C[j][0] = c4 * C[j][0] / c3
+    c1 = c2
+  return np.array([C[j][order] for j in range(npoints)])
+
+def nested_dissection(grid_shape, periodic_x=False, periodic_y=False,
+                      separator_width=2, leaf_size=8):
+  """
+  permutation = nested_dissection(grid_shape)
+
+  Nested dissection ordering of the cells of a (ny, nx) grid (numbered in
+  row-major order) for a finite difference stencil that reaches
+  separator_width cells in each direction.
+
+  The grid is cut across its longer side by a separator strip of
+  separator_width cells, which decouples the two halves; each half is
+  ordered in the same way, recursively, down to blocks of leaf_size cells
+  on a side, and the separator is ordered after both of them. With
+  periodic boundaries, the strip along the wraparound is the first
+  separator. Eliminating the unknowns in this order limits fill-in to
+  O(N log N) entries for a sparse factorization of the N x N operator,
+  rather than the O(N^1.5) of a banded ordering.
+
+  Returns the permutation: the (row-major) indices of the cells in their
+  new order.
+  """
+  ny, nx = grid_shape
+  s = separator_width
+  cells = np.arange(ny*nx).reshape(ny, nx)
+  parts = []
+  def dissect(i0, i1, j0, j1):
+    h = i1 - i0
+    w = j1 - j0
+    if h <= 0 or w <= 0:
+      return
+    elif max(h, w) <= max(leaf_size, 2*s):
+      parts.append(cells[i0:i1, j0:j1].ravel())
+    elif w >= h:
+      m = j0 + (w - s)//2
+      dissect(i0, i1, j0, m)
+      dissect(i0, i1, m+s, j1)
+      parts.append(cells[i0:i1, m:m+s].ravel())
+    else:
+      m = i0 + (h - s)//2
+      dissect(i0, m, j0, j1)
+      dissect(m+s, i1, j0, j1)
+      parts.append(cells[m:m+s, j0:j1].ravel())
+  j1 = nx - s if periodic_x and nx > 2*s else nx
+  i1 = ny - s if periodic_y and ny > 2*s else ny
+  dissect(0, i1, 0, j1)
+  parts.append(cells[i1:, :j1].ravel())
+  parts.append(cells[:, j1:].ravel())
+  return np.concatenate(parts)
+
+class PermutedFactor(object):
+  """
+  Factorization of A with its rows and columns in the order given by
+  "permutation" (e.g., a fill-reducing ordering from nested_dissection):
+  P A P^T is factorized by "factorization", which should keep that order
+  (e.g., SuperLU with permc_spec='NATURAL').
+
+  Same solve() interface as the SuperLU objects from splu.
+  """
+
+  def __init__(self, A, permutation, factorization):
+    self.permutation = permutation
+    A = A.tocsr()[permutation][:,permutation]
+    self.factor = factorization(A.tocsc())
+    self.nnz = factor_nnz(self.factor)
+
+  def solve(self, b):
+    y = self.factor.solve(np.asarray(b)[self.permutation])
+    x = np.empty_like(y)
+    x[self.permutation] = y
+    return x
+
+class BandedFactor(object):
+  """
+  LU factorization of a banded matrix, with the diagonals held in LAPACK
+  band storage (gbtrf / gbtrs) rather than as a general sparse matrix.
+  For the pentadiagonal 1D flexure operator this takes O(n) time and memory
+  with no fill-in beyond the band.
+
+  It has the same solve() interface as the SuperLU objects returned by
+  scipy.sparse.linalg.splu, so it can be stored and reused in the same way:
+  b may be a vector or an (n, nrhs) array of right-hand sides.
+  """
+
+  def __init__(self, A, kl=None, ku=None):
+    A = A.tocsr()
+    if not A.has_canonical_format:
+      A = A.copy()
+      A.sum_duplicates()
+    self.n = A.shape[0]
+    if kl is None or ku is None:
+      kl, ku = bandwidths(A)
+    self.kl = kl
+    self.ku = ku
+    # A[i,j] goes to ab[kl + ku + i - j, j]; the top kl rows are extra space
+    # that gbtrf needs for the fill-in produced by row interchanges
+    ab = np.zeros((2*kl + ku + 1, self.n))
+    ab[kl + ku + csr_rows(A) - A.indices, A.indices] = A.data
+    self.lu, self.piv, info = lapack.dgbtrf(ab, kl, ku, overwrite_ab=True)
+    if info > 0:
+      raise RuntimeError("Factor is exactly singular")
+    elif info < 0:
+      raise ValueError("Illegal value in argument "+str(-info)+" of gbtrf")
+
+  def solve(self, b):
+    b = np.asarray(b, dtype=float)
+    x, info = lapack.dgbtrs(self.lu, self.kl, self.ku, b.reshape(self.n, -1),
+                            self.piv)
+    return x.reshape(b.shape)
+
+class CyclicBandedFactor(object):
+  """
+  Factorization of a banded matrix whose band wraps around its corners, as
+  produced by periodic boundary conditions.
+
+  The matrix is split into its banded part B, which is factorized with
+  BandedFactor, and the few corner rows, which form a low-rank correction
+  U V^T (U selects the corner rows; V^T holds their out-of-band entries).
+  Solutions follow from the Sherman-Morrison-Woodbury formula:
+    x = y - Z (I + V^T Z)^-1 V^T y,  with  y = B^-1 b  and  Z = B^-1 U
+  Z and the small capacitance matrix are computed once, so each solve costs
+  one banded solve plus O(n) work for the correction.
+
+  It has the same solve() interface as BandedFactor.
+  """
+
+  def __init__(self, A, kl=None, ku=None):
+    A = A.tocsr()
+    if not A.has_canonical_format:
+      A = A.copy()
+      A.sum_duplicates()
+    self.n = A.shape[0]
+    if kl is None or ku is None:
+      kl, ku = cyclic_bandwidths(A)
+    rows = csr_rows(A)
+    offsets = A.indices - rows
+    inband = (offsets >= -kl) & (offsets <= ku)
+    B = scipy.sparse.csr_matrix((A.data[inband], (rows[inband], A.indices[inband])),
+                                shape=A.shape)
+    self.band_factor = BandedFactor(B, kl, ku)
+    # Low-rank correction from the corner entries
+    self.corner_rows, corner_index = np.unique(rows[~inband], return_inverse=True)
+    m = len(self.corner_rows)
+    self.VT = scipy.sparse.csr_matrix((A.data[~inband], (corner_index, A.indices[~inband])),
+                                      shape=(m, self.n))
+    U = np.zeros((self.n, m))
+    U[self.corner_rows, np.arange(m)] = 1.
+    self.Z = self.band_factor.solve(U)
+    self.capacitance = lu_factor(np.eye(m) + self.VT.dot(self.Z))
+
+  def solve(self, b):
+    b = np.asarray(b, dtype=float)
+    y = self.band_factor.solve(b.reshape(self.n, -1))
+    x = y - self.Z.dot(lu_solve(self.capacitance, self.VT.dot(y)))
+    return x.reshape(b.shape)
+
+def krylov(method, A, b, tol, monitor=None, **kwargs):
+  """
+  x, info = krylov(method, A, b, tol, monitor=None, **kwargs)
+
+  Calls one of the scipy.sparse.linalg Krylov solvers (e.g., gmres, lgmres)
+  with a relative residual tolerance, which is called "rtol" in newer
+  versions of scipy and "tol" in older ones, and with the callback
+  "monitor" (a KrylovMonitor), if one is given, called at each iteration
+  """
+  try:
+    from inspect import signature
+    parameters = signature(method).parameters
+  except ImportError:
+    # Python 2: older scipy
+    parameters = {}
+  if monitor is not None:
+    kwargs['callback'] = monitor
+    if 'callback_type' in parameters:
+      # Each (inner) iteration of gmres, rather than each restart
+      kwargs['callback_type'] = 'pr_norm'
+  if 'rtol' in parameters:
+    return method(A, b, rtol=tol, **kwargs)
+  else:
+    return method(A, b, tol=tol, **kwargs)
+
+class KrylovMonitor(object):
+  """
+  Callback for a Krylov solution of A x = b (see krylov) that records the
+  relative residual at each iteration in self.history, and passes it on to
+  each of the callbacks, as callback(iteration, residual). This is the
+  norm of the preconditioned residual, relative to that of b, as gmres
+  reports it, or otherwise |b - A x| / |b|, from the solution at that
+  iteration (of the outer loop, for lgmres).
+  """
+
+  def __init__(self, A, b, callbacks=()):
+    self.A = A
+    self.b = b
+    self.bnorm = np.linalg.norm(b)
+    if self.bnorm == 0:
+      self.bnorm = 1.
+    self.callbacks = callbacks
+    self.history = []
+
+  def __call__(self, x):
+    if np.ndim(x) == 0:
+      residual = float(x)
+    else:
+      residual = np.linalg.norm(self.b - self.A.dot(x)) / self.bnorm
+    self.history.append(residual)
+    for callback in self.callbacks:
+      callback(len(self.history), residual)
+
+def cell_centered_prolongation(n, periodic=False):
+  """
+  Linear interpolation from a grid of (n+1)//2 coarse cells to n fine cells,
+  with each coarse cell covering two fine cells, as a sparse (n x nc)
+  matrix. Each fine cell takes 3/4 of the coarse cell that contains it and
+  1/4 of the next-nearest coarse cell: across the ends if the grid is
+  periodic, or none (i.e., the value of the containing cell) if not.
+  """
+  nc = (n + 1)//2
+  fine = np.arange(n)
+  near = fine//2
+  far = np.where(fine % 2 == 0, near - 1, near + 1)
+  if periodic:
+    far %= nc
+  inside = (far >= 0) & (far < nc)
+  rows = np.hstack((fine, fine[inside]))
+  cols = np.hstack((near, far[inside]))
+  vals = np.hstack((np.where(inside, 0.75, 1.), 0.25*np.ones(inside.sum())))
+  return scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(n, nc))
+
+class Multigrid(object):
+  """
+  Geometric multigrid for the finite difference plate operator on a
+  (ny, nx) grid (unknowns in C order, as in F2D).
+
+  Grids are coarsened by a factor of two in each direction that has at
+  least 2*min_size cells. Coarse-grid operators are Galerkin products
+  P^T A P of the next-finer operator with the bilinear prolongation P, so
+  the rigidity structure and every boundary condition of the fine operator
+  carry through to all levels. The coarsest level is solved with SuperLU.
+
+  The smoother alternates damped line relaxation along x and along y
+  (using BandedFactor on the pentadiagonal part of the stencil along each
+  grid line) with an exact solve of the frame of boundary_width cells
+  along each non-periodic edge, where the boundary conditions make the
+  operator least regular.
+
+  vcycle() performs one V-cycle; aslinearoperator() wraps it as a
+  preconditioner for any scipy Krylov solver; solve() uses it to
+  precondition GMRES to the relative residual tolerance "tol" (with at most
+  "maxiter" restart cycles of "restart" iterations each).
+  """
+
+  def __init__(self, A, grid_shape, periodic_x=False, periodic_y=False,
+               min_size=8, boundary_width=8, sweeps=2, omega=0.8,
+               tol=1E-8, maxiter=100, restart=30):
+    self.sweeps = sweeps
+    self.omega = omega
+    self.tol = tol
+    self.maxiter = maxiter
+    self.restart = restart
+    self.periodic_x = periodic_x
+    self.periodic_y = periodic_y
+    self.operators = [A.tocsr()]
+    self.shapes = [tuple(grid_shape)]
+    self.prolongations = []
+    while True:
+      ny, nx = self.shapes[-1]
+      coarsen_x = nx >= 2*min_size
+      coarsen_y = ny >= 2*min_size
+      if not (coarsen_x or coarsen_y):
+        break
+      if coarsen_x:
+        Px = cell_centered_prolongation(nx, periodic_x)
+      else:
+        Px = scipy.sparse.identity(nx, format='csr')
+      if coarsen_y:
+        Py = cell_centered_prolongation(ny, periodic_y)
+      else:
+        Py = scipy.sparse.identity(ny, format='csr')
+      P = scipy.sparse.kron(Py, Px, format='csr')
+      self.prolongations.append(P)
+      self.operators.append(P.T.dot(self.operators[-1]).dot(P).tocsr())
+      self.shapes.append((Py.shape[1], Px.shape[1]))
+    self.line_factors = []
+    self.frames = []
+    for A, shape in zip(self.operators[:-1], self.shapes[:-1]):
+      self.line_factors.append(self.line_relaxation_factors(A, shape))
+      self.frames.append(self.frame_factor(A, shape, boundary_width))
+    from scipy.sparse.linalg import splu
+    self.coarse_factor = splu(self.operators[-1].tocsc())
+    self.n = self.operators[0].shape[0]
+
+  def line_relaxation_factors(self, A, shape):
+    """
+    Banded factorizations of the couplings along x-lines (rows of the grid)
+    and along y-lines (columns of the grid, reordered to be contiguous)
+    """
+    ny, nx = shape
+    rows = csr_rows(A)
+    cols = A.indices
+    on_x = (rows//nx == cols//nx) & (np.abs(cols - rows) <= 2)
+    Mx = scipy.sparse.csr_matrix((A.data[on_x], (rows[on_x], cols[on_x])),
+                                 shape=A.shape)
+    # Column-major ordering for the y-lines
+    order = np.arange(ny*nx).reshape(ny, nx).T.ravel()
+    position = np.empty_like(order)
+    position[order] = np.arange(order.size)
+    on_y = (rows % nx == cols % nx) & (np.abs(cols - rows) <= 2*nx)
+    My = scipy.sparse.csr_matrix((A.data[on_y], (position[rows[on_y]],
+                                  position[cols[on_y]])), shape=A.shape)
+    return BandedFactor(Mx, 2, 2), BandedFactor(My, 2, 2), order
+
+  def frame_factor(self, A, shape, width):
+    """
+    Indices of and LU factorization for the cells within "width" of any
+    non-periodic edge
+    """
+    from scipy.sparse.linalg import splu
+    frame = np.zeros(shape, dtype=bool)
+    if width > 0:
+      if not self.periodic_x:
+        frame[:, :width] = True
+        frame[:, -width:] = True
+      if not self.periodic_y:
+        frame[:width, :] = True
+        frame[-width:, :] = True
+    cells = np.flatnonzero(frame)
+    if cells.size == 0 or cells.size == A.shape[0]:
+      return cells, None
+    return cells, splu(A[cells][:, cells].tocsc())
+
+  def smooth(self, level, x, b):
+    A = self.operators[level]
+    x_factor, y_factor, order = self.line_factors[level]
+    cells, frame_factor = self.frames[level]
+    for sweep in range(self.sweeps):
+      x = x + self.omega * x_factor.solve(b - A.dot(x))
+      r = b - A.dot(x)
+      x[order] += self.omega * y_factor.solve(r[order])
+      if frame_factor is not None:
+        r = b - A.dot(x)
+        x[cells] += frame_factor.solve(r[cells])
+    return x
+
+  def vcycle(self, b, x=None, level=0):
+    """
+    One V-cycle for A x = b, starting from x (or zero)
+    """
+    if level == len(self.operators) - 1:
+      return self.coarse_factor.solve(b)
+    if x is None:
+      x = np.zeros(b.shape)
+    else:
+      x = x.copy()
+    x = self.smooth(level, x, b)
+    r = b - self.operators[level].dot(x)
+    P = self.prolongations[level]
+    x += P.dot(self.vcycle(P.T.dot(r), level=level+1))
+    x = self.smooth(level, x, b)
+    return x
+
+  def aslinearoperator(self):
+    from scipy.sparse.linalg import LinearOperator
+    return LinearOperator((self.n, self.n), matvec=self.vcycle)
+
+  def solve(self, b, x0=None, tol=None, maxiter=None, callbacks=()):
+    """
+    Multigrid-preconditioned GMRES solution for one or more (columns of)
+    right-hand sides, optionally starting from the initial guess(es) x0.
+    tol and maxiter override those given at setup. The convergence flag
+    and residual history (see KrylovMonitor, which passes the residuals on
+    to the callbacks) of each are kept in self.info and self.history.
+    """
+    from scipy.sparse.linalg import gmres
+    if tol is None:
+      tol = self.tol
+    if maxiter is None:
+      maxiter = self.maxiter
+    b = np.asarray(b, dtype=float)
+    B = b.reshape(self.n, -1)
+    X = np.zeros(B.shape)
+    if x0 is not None:
+      X0 = np.asarray(x0, dtype=float).reshape(self.n, -1)
+    M = self.aslinearoperator()
+    self.info = []
+    self.history = []
+    for i in range(B.shape[1]):
+      if x0 is None:
+        xi0 = None
+      else:
+        xi0 = X0[:, i]
+      monitor = KrylovMonitor(self.operators[0], B[:, i], callbacks)
+      X[:, i], info = krylov(gmres, self.operators[0], B[:, i], tol,
+                             monitor=monitor, x0=xi0, M=M,
+                             restart=self.restart, maxiter=maxiter)
+      self.info.append(info)
+      self.history.append(monitor.history)
+    return X.reshape(b.shape)
+
+def factorize_in_order(A, permutation):
+  """
+  Sparse LU factorization of A, with its unknowns in the order given by
+  "permutation" (or COLAMD ordering if this is None)
+  """
+  from scipy.sparse.linalg import splu
+  if permutation is None:
+    return splu(A.tocsc())
+  else:
+    return PermutedFactor(A, permutation, lambda A: \
+             splu(A, permc_spec='NATURAL', diag_pivot_thresh=0.1))
+
+def schwarz_worker(connection, subdomains):
+  """
+  Runs in a worker process for Schwarz: factorizes its share of the
+  subdomain matrices, given as (matrix, permutation) pairs, and then
+  answers each list of subdomain residuals that it is sent with the list
+  of subdomain solutions, until it is sent None
+  """
+  factors = [factorize_in_order(A, permutation) for A, permutation in subdomains]
+  connection.send(sum(factor_nnz(factor) for factor in factors))
+  while True:
+    residuals = connection.recv()
+    if residuals is None:
+      break
+    connection.send([factor.solve(r) for factor, r in zip(factors, residuals)])
+  connection.close()
+
+class Schwarz(object):
+  """
+  Overlapping domain decomposition for a finite difference operator A (a
+  sparse matrix or a LinearOperator, such as StencilOperator).
+
+  "subdomains" is a list of (cells, owned, matrix, permutation): the
+  indices of the cells in each overlapping subdomain, which of them it
+  owns (the subdomains without their overlap, which do not intersect),
+  and the rows and columns of A for those cells, to be factorized in the
+  order of the unknowns given by "permutation" (or None).
+  The subdomain matrices are factorized by "processes" worker processes,
+  each of which keeps its factors for as long as this object exists, and
+  solves for its subdomains in parallel with the others.
+
+  Without a coarse grid, the preconditioner, precondition(r), is
+  restricted additive Schwarz: the solution on each subdomain, kept only
+  in the cells that it owns. With one -- "coarse" is (P, Ac), for a
+  prolongation P from the coarse grid and the coarse-grid operator Ac --
+  it is additive Schwarz (the sum of the whole subdomain solutions)
+  between two coarse-grid corrections. (Restricted Schwarz is not used
+  with the coarse grid: the two together can make GMRES diverge.)
+  solve() uses it to precondition GMRES, with the same interface as
+  Multigrid.solve().
+  """
+
+  def __init__(self, A, subdomains, coarse=None, processes=1, tol=1E-8,
+               maxiter=100, restart=30):
+    self.A = A
+    self.n = A.shape[0]
+    self.tol = tol
+    self.maxiter = maxiter
+    self.restart = restart
+    self.cells = [cells for cells, owned, matrix, permutation in subdomains]
+    self.owned = [owned for cells, owned, matrix, permutation in subdomains]
+    self.connections = []
+    self.workers = []
+    self.factors = None
+    processes = max(1, min(processes, len(subdomains)))
+    # Subdomains for each worker (or for this process)
+    self.groups = [list(range(i, len(subdomains), processes))
+                   for i in range(processes)]
+    if processes == 1:
+      self.factors = [factorize_in_order(matrix, permutation)
+                      for cells, owned, matrix, permutation in subdomains]
+      self.nnz = sum(factor_nnz(factor) for factor in self.factors)
+    else:
+      import multiprocessing
+      for group in self.groups:
+        connection, worker_connection = multiprocessing.Pipe()
+        worker = multiprocessing.Process(target=schwarz_worker,
+                   args=(worker_connection, [subdomains[i][2:] for i in group]))
+        worker.daemon = True
+        worker.start()
+        self.connections.append(connection)
+        self.workers.append(worker)
+    if coarse is None:
+      self.P = None
+    else:
+      # Factorized here while the workers factorize the subdomains
+      self.P = coarse[0].tocsr()
+      self.coarse_factor = factorize_in_order(coarse[1], None)
+    if self.workers:
+      self.nnz = sum(connection.recv() for connection in self.connections)
+    if self.P is not None:
+      self.nnz += factor_nnz(self.coarse_factor)
+
+  def close(self):
+    """
+    Stops the worker processes
+    """
+    for connection in self.connections:
+      try:
+        connection.send(None)
+        connection.close()
+      except (IOError, OSError):
+        pass
+    for worker in self.workers:
+      worker.join()
+    self.connections = []
+    self.workers = []
+
+  def __del__(self):
+    self.close()
+
+  def subdomain_solutions(self, r):
+    """
+    Solutions for the residual r on all of the subdomains
+    """
+    residuals = [r[cells] for cells in self.cells]
+    if self.factors is not None:
+      return [factor.solve(ri) for factor, ri in zip(self.factors, residuals)]
+    # Send everything first, so that the workers solve at the same time
+    for connection, group in zip(self.connections, self.groups):
+      connection.send([residuals[i] for i in group])
+    solutions = [None] * len(self.cells)
+    for connection, group in zip(self.connections, self.groups):
+      for i, solution in zip(group, connection.recv()):
+        solutions[i] = solution
+    return solutions
+
+  def coarse_correction(self, r):
+    return self.P.dot(self.coarse_factor.solve(self.P.T.dot(r)))
+
+  def precondition(self, r):
+    r = np.asarray(r, dtype=float).ravel()
+    if self.P is None:
+      x = np.zeros(self.n)
+      for cells, owned, solution in zip(self.cells, self.owned,
+                                        self.subdomain_solutions(r)):
+        x[cells[owned]] += solution[owned]
+      return x
+    x = self.coarse_correction(r)
+    for cells, solution in zip(self.cells,
+                               self.subdomain_solutions(r - self.A.dot(x))):
+      x[cells] += solution
+    return x + self.coarse_correction(r - self.A.dot(x))
+
+  def aslinearoperator(self):
+    from scipy.sparse.linalg import LinearOperator
+    return LinearOperator((self.n, self.n), matvec=self.precondition)
+
+  def solve(self, b, x0=None, tol=None, maxiter=None, callbacks=()):
+    """
+    Schwarz-preconditioned GMRES solution for one or more (columns of)
+    right-hand sides, optionally starting from the initial guess(es) x0.
+    tol and maxiter override those given at setup. The convergence flag
+    and residual history (see KrylovMonitor) of each are kept in self.info
+    and self.history.
+    """
+    from scipy.sparse.linalg import gmres
+    if tol is None:
+      tol = self.tol
+    if maxiter is None:
+      maxiter = self.maxiter
+    b = np.asarray(b, dtype=float)
+    B = b.reshape(self.n, -1)
+    X = np.zeros(B.shape)
+    if x0 is not None:
+      X0 = np.asarray(x0, dtype=float).reshape(self.n, -1)
+    M = self.aslinearoperator()
+    self.info = []
+    self.history = []
+    for i in range(B.shape[1]):
+      if x0 is None:
+        xi0 = None
+      else:
+        xi0 = X0[:, i]
+      monitor = KrylovMonitor(self.A, B[:, i], callbacks)
+      X[:, i], info = krylov(gmres, self.A, B[:, i], tol, monitor=monitor,
+                             x0=xi0, M=M, restart=self.restart,
+                             maxiter=maxiter)
+      self.info.append(info)
+      self.history.append(monitor.history)
+    return X.reshape(b.shape)
+
+class SymmetricFactor(object):
+  """
+  Factorization of a symmetric positive-definite matrix. A sparse Cholesky
+  factorization (CHOLMOD, from scikit-sparse) is used if it is available;
+  otherwise SuperLU is run in its symmetric mode: a minimum-degree ordering
+  on the structure of A + A^T, with pivots taken from the diagonal.
+  Either needs roughly half of the memory and time of a general sparse LU
+  factorization of the nonsymmetric operator.
+
+  permc_spec = 'NATURAL' keeps the order of the unknowns (e.g., for a
+  matrix that has already been permuted by PermutedFactor).
+
+  Same solve() interface as the SuperLU objects from splu.
+  """
+
+  def __init__(self, A, permc_spec='MMD_AT_PLUS_A'):
+    A = A.tocsc()
+    try:
+      from sksparse.cholmod import cholesky
+    except ImportError:
+      from scipy.sparse.linalg import splu
+      self.method = 'SuperLU (symmetric mode)'
+      self.factor = splu(A, permc_spec=permc_spec, diag_pivot_thresh=0.,
+                         options=dict(SymmetricMode=True))
+      self.nnz = self.factor.L.nnz + self.factor.U.nnz
+    else:
+      self.method = 'Cholesky (CHOLMOD)'
+      if permc_spec == 'NATURAL':
+        self.factor = cholesky(A, ordering_method='natural')
+      else:
+        self.factor = cholesky(A)
+      self.nnz = self.factor.L().nnz
+
+  def solve(self, b):
+    if self.method == 'Cholesky (CHOLMOD)':
+      return self.factor(b)
+    else:
+      return self.factor.solve(b)
+
+def bspline_basis(n, spacing, periodic=False):
+  """
+  Cubic B-splines with knots every "spacing" cells, sampled at the centers
+  of a row of n cells: an (n, nfunctions) sparse matrix. B-spline m has
+  its knots at the edges of the blocks of cells m to m+3 (m = -3 to the
+  number of blocks - 1, so that every B-spline that reaches into the row
+  is included); with periodic boundaries, n must be a whole number of
+  blocks, and they wrap around (m = 0 to the number of blocks - 1).
+  """
+  x = (np.arange(n) + 0.5) / spacing
+  if periodic:
+    nblocks = n // spacing
+    m = np.arange(nblocks)
+    t = x[:,np.newaxis] - (m + 2)
+    t = (t + nblocks/2.) % nblocks - nblocks/2.
+  else:
+    m = np.arange(-3, -(-n // spacing))
+    t = x[:,np.newaxis] - (m + 2)
+  t = np.abs(t)
+  B = np.where(t < 1, 2/3. - t**2 + t**3/2., np.where(t < 2, (2 - t)**3/6., 0.))
+  return scipy.sparse.csr_matrix(B)
+
+class QuadtreeFactor(object):
+  """
+  Ritz-Galerkin solution of A w = b in the space spanned by the columns of
+  P (hierarchical B-splines on a quadtree; see F2D.quadtree): P^T A P is
+  factorized, and solve(b) returns w = P (P^T A P)^-1 P^T b, on the grid of
+  A. For a symmetric positive-definite A, this is the closest solution in
+  that space in the energy norm. P^T A P is factorized with its unknowns in
+  the order given by "permutation" (as by PermutedFactor), if there is one.
+
+  Same solve() interface as the SuperLU objects from splu.
+  """
+
+  def __init__(self, A, P, symmetric=False, permutation=None):
+    from scipy.sparse.linalg import splu
+    self.P = P.tocsr()
+    PT = self.P.T.tocsr()
+    self.A = PT.dot(A.tocsr().dot(self.P)).tocsc()
+    self.unknowns = self.A.shape[0]
+    if permutation is not None:
+      if symmetric:
+        in_order = lambda A: SymmetricFactor(A, 'NATURAL')
+      else:
+        in_order = lambda A: splu(A, permc_spec='NATURAL', diag_pivot_thresh=0.1)
+      self.factor = PermutedFactor(self.A, permutation, in_order)
+    elif symmetric:
+      self.factor = SymmetricFactor(self.A)
+    else:
+      self.factor = splu(self.A)
+    self.nnz = factor_nnz(self.factor)
+
+  def solve(self, b):
+    b = np.asarray(b, dtype=float)
+    x = self.factor.solve(self.P.T.dot(b.reshape(self.P.shape[0], -1)))
+    return self.P.dot(x).reshape(b.shape)
+
+class MixedPrecisionFactor(object):
+  """
+  Factorization of A in single precision (float32), which needs about half
+  of the memory of a double-precision factorization for its values, with
+  solutions brought to double-precision accuracy by iterative refinement:
+  the residual b - A x is computed with A in double precision, and the
+  correction is solved for with the single-precision factors.
+  "factorization" makes the factor object from a sparse matrix (SuperLU by
+  default); it must have a solve() method.
+
+  Refinement stops when x is as accurate as a double-precision direct
+  solution would be: when the backward error |b - A x| / (|A| |x| + |b|)
+  (infinity norms) is within a few units of double-precision round-off.
+  Each step reduces the error by roughly the condition number of A times
+  single-precision round-off. If A is too poorly conditioned for that to
+  reach the target within maxiter steps, A is instead factorized in double
+  precision (once; self.precision records which is in use).
+  The relative residual |b - A x| / |b| reached (the largest over all
+  columns) is stored in self.residual and the number of refinement steps
+  in self.iterations.
+
+  Same solve() interface as the SuperLU objects from splu.
+  """
+
+  def __init__(self, A, factorization=None, maxiter=10):
+    self.A = A.tocsr()
+    self.maxiter = maxiter
+    self.A_norm = abs(self.A).sum(axis=1).max()
+    if factorization is None:
+      from scipy.sparse.linalg import splu
+      factorization = splu
+    self.factorization = factorization
+    self.factor = factorization(A.tocsc().astype(np.float32))
+    self.precision = 'single'
+    self.residual = None
+    self.iterations = 0
+
+  @property
+  def nnz(self):
+    return factor_nnz(self.factor)
+
+  def correction(self, r):
+    """
+    Solution for the (double-precision) residual r with the factors; in
+    single precision, r is scaled so that small residuals stay within its
+    range
+    """
+    if self.precision == 'double':
+      return self.factor.solve(r)
+    scale = np.abs(r).max(axis=0)
+    scale[scale == 0] = 1.
+    d = self.factor.solve((r/scale).astype(np.float32))
+    return d.astype(float) * scale
+
+  def solve(self, b):
+    b = np.asarray(b, dtype=float)
+    B = b.reshape(self.A.shape[0], -1)
+    target = 8 * np.finfo(float).eps
+    def backward_error(R, X):
+      return np.abs(R).max(axis=0) / (self.A_norm * np.abs(X).max(axis=0)
+                                      + np.abs(B).max(axis=0) + 1E-300)
+    X = self.correction(B)
+    R = B - self.A.dot(X)
+    error = backward_error(R, X)
+    self.iterations = 0
+    while (error > target).any():
+      if self.iterations == self.maxiter:
+        break
+      X += self.correction(R)
+      R = B - self.A.dot(X)
+      last_error = error
+      error = backward_error(R, X)
+      self.iterations += 1
+      # Steps still needed at this rate
+      rate = np.max(error / last_error)
+      if rate > 0.5 or (error > target).any() and \
+         np.log(target / error.max()) / np.log(rate) > self.maxiter - self.iterations:
+        break
+    if (error > target).any() and self.precision == 'single':
+      # Too poorly conditioned for single precision
+      self.factor = self.factorization(self.A.tocsc())
+      self.precision = 'double'
+      X = self.factor.solve(B)
+      R = B - self.A.dot(X)
+    bnorm = np.linalg.norm(B, axis=0)
+    bnorm[bnorm == 0] = 1.
+    self.residual = (np.linalg.norm(R, axis=0) / bnorm).max()
+    return X.reshape(b.shape)
+
+class StencilOperator(scipy.sparse.linalg.LinearOperator):
+  """
+  Matrix-free finite difference operator on a 2D grid (cells in row-major
+  order), for iterative solutions.
+
+  Away from the edges, the stencil coefficients are computed from the
+  (padded) flexural rigidity D each time that the operator is applied,
+  a block of rows at a time, and applied with array slicing:
+  coefficients(D[i0:i1+2]) must return the coefficients for grid rows
+  i0 to i1 (all columns), in the order of "offsets" (x, y).
+  The rows of the cells within two cells of any edge, where the boundary
+  conditions change the stencil, are given explicitly, as the sparse
+  matrix frame_matrix (rows frame_rows of the full operator).
+
+  Only D (and the boundary rows) is stored, rather than the 13 (or more)
+  diagonals of the full sparse matrix.
+  """
+
+  def __init__(self, coefficients, D, grid_shape, offsets, frame_rows,
+               frame_matrix, block_rows=256):
+    self.coefficients = coefficients
+    self.D = D
+    self.grid_shape = tuple(grid_shape)
+    self.offsets = offsets
+    self.frame_rows = frame_rows
+    self.frame_matrix = frame_matrix.tocsr()
+    self.block_rows = block_rows
+    if np.isscalar(D):
+      # Constant coefficients: compute them once
+      self.constant_coefficients = coefficients(D)
+    else:
+      self.constant_coefficients = None
+    n = self.grid_shape[0] * self.grid_shape[1]
+    super(StencilOperator, self).__init__(dtype=np.dtype(float), shape=(n, n))
+
+  def interior_blocks(self):
+    """
+    Row ranges (i0, i1) and stencil coefficients for the cells away from
+    the edges
+    """
+    ny, nx = self.grid_shape
+    for i0 in range(2, ny-2, self.block_rows):
+      i1 = min(i0 + self.block_rows, ny-2)
+      if self.constant_coefficients is None:
+        c = [ck[:, 2:nx-2] for ck in self.coefficients(self.D[i0:i1+2])]
+      else:
+        c = self.constant_coefficients
+      yield i0, i1, c
+
+  def _matvec(self, x):
+    ny, nx = self.grid_shape
+    x = np.asarray(x, dtype=float).ravel()
+    X = x.reshape(ny, nx)
+    Y = np.zeros((ny, nx))
+    for i0, i1, c in self.interior_blocks():
+      for (dx, dy), ck in zip(self.offsets, c):
+        Y[i0:i1, 2:nx-2] += ck * X[i0+dy:i1+dy, 2+dx:nx-2+dx]
+    y = Y.ravel()
+    y[self.frame_rows] = self.frame_matrix.dot(x)
+    return y
+
+  def _matmat(self, X):
+    return np.column_stack([self._matvec(X[:, i]) for i in range(X.shape[1])])
+
+  def diagonal(self):
+    ny, nx = self.grid_shape
+    center = self.offsets.index((0, 0))
+    d = np.zeros((ny, nx))
+    for i0, i1, c in self.interior_blocks():
+      d[i0:i1, 2:nx-2] = c[center]
+    d = d.ravel()
+    F = self.frame_matrix.tocoo()
+    on_diagonal = self.frame_rows[F.row] == F.col
+    d[self.frame_rows[F.row[on_diagonal]]] = F.data[on_diagonal]
+    return d
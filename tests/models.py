@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+
+# Models for the tests: plates with the standard parameters for Earth, set
+# up through the API (as in input/run_in_script_2D.py) or a configuration
+# file (as in input/input_f2d)
+
+import os
+import numpy as np
+import gflex
+
+CONFIG = """[mode]
+dimension=%(dimension)d
+method=%(Method)s
+PlateSolutionType=vWC1994
+
+[parameter]
+YoungsModulus=65E9
+PoissonsRatio=0.25
+GravAccel=9.8
+MantleDensity=3300
+InfillMaterialDensity=0
+
+[input]
+Loads=loads.txt
+ElasticThickness=%(Te)s
+
+[output]
+DeflectionOut=
+Plot=
+
+[numerical]
+GridSpacing_x=5000
+BoundaryCondition_West=%(BC_W)s
+BoundaryCondition_East=%(BC_E)s
+Solver=direct
+ConvergenceTolerance=1E-3
+
+[numerical2D]
+GridSpacing_y=5000
+BoundaryCondition_North=%(BC_N)s
+BoundaryCondition_South=%(BC_S)s
+
+[verbosity]
+Verbose=false
+Debug=false
+Quiet=true
+"""
+
+def make_flex(qs, Te, BCs, flex=None, Method='FD', Solver='direct',
+              PlateSolutionType='vWC1994', dx=5000., dy=5000., **attributes):
+    """
+    Returns a model with the loads qs, elastic thickness Te and boundary
+    conditions BCs (west and east, and in 2D, north and south), and any
+    other attributes given. It is an F1D or an F2D by the number of
+    boundary conditions, unless a model is given as flex.
+    """
+    if flex is None:
+        if len(BCs) == 2:
+            flex = gflex.F1D()
+        else:
+            flex = gflex.F2D()
+    flex.Quiet = True
+    flex.Method = Method
+    flex.Solver = Solver
+    flex.g = 9.8
+    flex.E = 65E9
+    flex.nu = 0.25
+    flex.rho_m = 3300.
+    flex.rho_fill = 0.
+    flex.Te = Te
+    flex.qs = qs
+    flex.dx = dx
+    flex.BC_W, flex.BC_E = BCs[:2]
+    if len(BCs) == 4:
+        flex.PlateSolutionType = PlateSolutionType
+        flex.dy = dy
+        flex.BC_N, flex.BC_S = BCs[2:]
+    for name in attributes:
+        setattr(flex, name, attributes[name])
+    return flex
+
+def solve(flex, finalize=True):
+    """
+    Initializes and runs the model, and finalizes it unless asked not to
+    (to keep its coefficient matrix); returns the model
+    """
+    flex.initialize()
+    flex.run()
+    if finalize:
+        flex.finalize()
+    return flex
+
+def write_config(directory, qs, Te, BCs, Method='FD'):
+    """
+    Writes a configuration file, and the loads (and elastic thickness, if
+    it is an array) that it points to, to the directory; returns its path
+    """
+    np.savetxt(os.path.join(directory, 'loads.txt'), qs)
+    if np.ndim(Te):
+        np.savetxt(os.path.join(directory, 'Te.txt'), Te)
+        Te = 'Te.txt'
+    # No north and south boundary conditions in 1D
+    BC_W, BC_E, BC_N, BC_S = (list(BCs) + ['', ''])[:4]
+    filename = os.path.join(directory, 'input')
+    with open(filename, 'w') as f:
+        f.write(CONFIG % {'dimension': np.ndim(qs), 'Method': Method, 'Te': Te,
+                          'BC_W': BC_W, 'BC_E': BC_E, 'BC_N': BC_N,
+                          'BC_S': BC_S})
+    return filename
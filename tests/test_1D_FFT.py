@@ -0,0 +1,38 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def solve_with(Method, Te, qs, BC):
+    return solve(make_flex(qs, Te, [BC, BC], Method=Method, dx=2000.))
+
+def loads(n):
+    qs = np.zeros(n)
+    qs[n//2-50:n//2+50] = 1E7
+    # Near an edge
+    qs[10:20] = 2E6
+    return qs
+
+def test_periodic():
+    # The same as the finite difference solution, to rounding error
+    n = 1000
+    fft = solve_with('FFT', 20000., loads(n), 'Periodic')
+    fd = solve_with('FD', 20000. * np.ones(n), loads(n), 'Periodic')
+    assert np.abs(fft.w - fd.w).max() < 1E-9 * np.abs(fd.w).max()
+
+def test_no_outside_loads():
+    # An isolated plate, as in the analytical solution
+    n = 1000
+    fft = solve_with('FFT', 20000., loads(n), 'NoOutsideLoads')
+    sas = solve_with('SAS', 20000., loads(n), 'NoOutsideLoads')
+    assert fft.w.shape == (n,)
+    assert np.abs(fft.w - sas.w).max() < 1E-3 * np.abs(sas.w).max()
+    assert 'FFT' in fft.metrics['stages']
+
+def test_stack():
+    n = 300
+    qs = np.array([loads(n), 2 * loads(n)])
+    fft = solve_with('FFT', 20000. * np.ones(n), qs, '')
+    assert fft.BC_W == 'NoOutsideLoads'
+    assert fft.w.shape == (2, n)
+    assert np.allclose(fft.w[1], 2 * fft.w[0])
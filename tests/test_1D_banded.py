@@ -0,0 +1,31 @@
+#! /usr/bin/env python
+
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from models import make_flex, solve
+
+BCs = ['0Displacement0Slope', '0Moment0Shear', '0Slope0Shear', 'Mirror']
+
+def solve_both(BC_W, BC_E, Solver):
+    Te = 20000. + 10000.*np.sin(np.arange(300)/20.)
+    qs = np.zeros(300)
+    qs[100:150] = 1E6
+    flex = solve(make_flex(qs, Te, [BC_W, BC_E], Solver=Solver, dx=4000.),
+                 finalize=False)
+    w_sparse = spsolve(flex.coeff_matrix.tocsc(), -flex.qs)
+    flex.finalize()
+    return flex.w, w_sparse
+
+def test_main():
+    for BC_W in BCs:
+        for BC_E in BCs:
+            for Solver in ['direct', 'banded']:
+                w, w_sparse = solve_both(BC_W, BC_E, Solver)
+                assert np.abs(w - w_sparse).max() < 1E-10 * np.abs(w_sparse).max()
+    # Cyclic (periodic) band
+    for Solver in ['direct', 'banded']:
+        w, w_sparse = solve_both('Periodic', 'Periodic', Solver)
+        assert np.abs(w - w_sparse).max() < 1E-10 * np.abs(w_sparse).max()
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+BCs = ['0Displacement0Slope', '0Moment0Shear', '0Slope0Shear', 'Mirror']
+
+def solve_nodes(x, BC_W, BC_E, dx=None):
+    # At the nodes x, or evenly spaced by dx
+    Te = 20000. + 10000.*np.tanh((x - 600E3)/50E3)
+    qs = 1E6 * ((x > 400E3) & (x < 500E3))
+    flex = make_flex(qs, Te, [BC_W, BC_E], dx=dx)
+    if dx is None:
+        flex.x_nodes = x
+    return solve(flex).w
+
+def test_uniform():
+    # Evenly spaced nodes give the same operator as dx
+    x = np.arange(300) * 4000.
+    for BC_W in BCs:
+        for BC_E in BCs:
+            w = solve_nodes(x, BC_W, BC_E)
+            assert np.abs(w - solve_nodes(x, BC_W, BC_E, 4000.)).max() < 1E-10 * np.abs(w).max()
+    w = solve_nodes(x, 'Periodic', 'Periodic')
+    assert np.abs(w - solve_nodes(x, 'Periodic', 'Periodic', 4000.)).max() < 1E-10 * np.abs(w).max()
+
+def test_nonuniform():
+    # 500 m nodes near the edges of the load, growing smoothly to 16 km in
+    # the far field, against 500 m nodes everywhere
+    dx_fine = 500.
+    x_fine = np.arange(0., 2000E3 + dx_fine/2., dx_fine)
+    edges = np.array([400E3, 500E3])
+    x = [0.]
+    while x[-1] < 2000E3:
+        distance = np.abs(edges - x[-1]).min()
+        x.append(x[-1] + min(dx_fine + 0.1*distance, 16000.))
+    x = np.array(x) * 2000E3 / x[-1]
+    assert len(x) * 10 < len(x_fine)
+    for BC_W, BC_E in [('0Displacement0Slope', '0Moment0Shear'),
+                       ('Mirror', '0Slope0Shear')]:
+        w = solve_nodes(x, BC_W, BC_E)
+        w_fine = np.interp(x, x_fine, solve_nodes(x_fine, BC_W, BC_E, dx_fine))
+        assert np.abs(w - w_fine).max() < 1E-2 * np.abs(w_fine).max()
+
+if __name__ == '__main__':
+    test_uniform()
+    test_nonuniform()
@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+
+import gflex
+import numpy as np
+import pytest
+import shutil
+import tempfile
+from models import make_flex, solve, write_config
+
+def solve_with(Method, Te, qs, BCs, flex=None, ReuseFactorization=False):
+    # Uneven spacing
+    return solve(make_flex(qs, Te, BCs, flex, Method=Method, dy=7000.,
+                           ReuseFactorization=ReuseFactorization))
+
+def loads(shape):
+    qs = np.zeros(shape)
+    qs[50:80, 100:140] = 1E6
+    # Across a corner
+    qs[:10, -20:] = 3E6
+    return qs
+
+def test_periodic():
+    # The same as the finite difference solution, to rounding error
+    shape = (96, 160)
+    BCs = ['Periodic'] * 4
+    fft = solve_with('FFT', 20000., loads(shape), BCs)
+    fd = solve_with('FD', 20000. * np.ones(shape), loads(shape), BCs)
+    assert np.abs(fft.w - fd.w).max() < 1E-9 * np.abs(fd.w).max()
+    assert 'FFT' in fft.metrics['stages']
+
+def test_no_outside_loads():
+    # An isolated plate, as in the analytical solution (to within the
+    # error of the discretization)
+    shape = (200, 300)
+    qs = np.zeros(shape)
+    qs[50:80, 100:140] = 1E6
+    BCs = ['NoOutsideLoads'] * 4
+    fft = solve_with('FFT', 20000., qs.copy(), BCs)
+    sas = solve_with('SAS', 20000., qs.copy(), BCs)
+    assert fft.w.shape == shape
+    assert np.abs(fft.w - sas.w).max() < 1E-3 * np.abs(sas.w).max()
+
+def test_mixed():
+    # Periodic east-west only: the same as padding north and south by hand
+    shape = (96, 160)
+    pad = 100
+    qs = loads(shape)
+    BCs = ['Periodic', 'Periodic', '', '']
+    fft = solve_with('FFT', 20000., qs, BCs)
+    assert fft.BC_N == fft.BC_S == 'NoOutsideLoads'
+    padded = np.pad(qs, ((pad, pad), (0, 0)))
+    fd = solve_with('FD', 20000. * np.ones(padded.shape), padded,
+                    ['Periodic', 'Periodic', '0Moment0Shear', '0Moment0Shear'])
+    w = fd.w[pad:-pad]
+    assert np.abs(fft.w - w).max() < 1E-4 * np.abs(w).max()
+    with pytest.raises(SystemExit):
+        solve_with('FFT', 20000., qs, ['Periodic', 'NoOutsideLoads', '', ''])
+
+def test_reuse():
+    # The transform of the plate is kept for the next run
+    shape = (96, 160)
+    BCs = ['Periodic'] * 4
+    flex = solve_with('FFT', 20000., loads(shape), BCs, ReuseFactorization=True)
+    transfer = flex.fft_transfer_array
+    w = flex.w
+    flex = solve_with('FFT', 20000., 2 * loads(shape), BCs, flex, True)
+    assert flex.fft_transfer_array is transfer
+    assert np.allclose(flex.w, 2 * w)
+    # But not for another plate
+    flex = solve_with('FFT', 30000., loads(shape), BCs, flex, True)
+    assert flex.fft_transfer_array is not transfer
+
+def test_stack():
+    shape = (96, 160)
+    qs = np.array([loads(shape), 2 * loads(shape)])
+    fft = solve_with('FFT', 20000. * np.ones(shape), qs, [''] * 4)
+    assert fft.w.shape == (2,) + shape
+    assert np.allclose(fft.w[1], 2 * fft.w[0])
+
+def test_variable_Te():
+    shape = (96, 160)
+    Te = 20000. * np.ones(shape)
+    Te[:, 80:] = 10000.
+    with pytest.raises(SystemExit):
+        solve_with('FFT', Te, loads(shape), ['Periodic'] * 4)
+
+def test_config_file():
+    # A scalar elastic thickness, but not a grid
+    shape = (96, 160)
+    BCs = ['Periodic'] * 4
+    w = solve(make_flex(loads(shape), 20000., BCs, Method='FFT')).w
+    directory = tempfile.mkdtemp()
+    try:
+        flex = gflex.F2D(write_config(directory, loads(shape), 20000., BCs, 'FFT'))
+        assert np.allclose(solve(flex).w, w)
+        # Nor for the other methods that need a scalar Te
+        for Method in ['FFT', 'SAS']:
+            flex = gflex.F2D(write_config(directory, loads(shape),
+                                          20000. * np.ones(shape), BCs, Method))
+            with pytest.raises(SystemExit, match=Method + ' solution method'):
+                solve(flex)
+    finally:
+        shutil.rmtree(directory)
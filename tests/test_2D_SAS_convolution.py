@@ -0,0 +1,42 @@
+#! /usr/bin/env python
+
+import numpy as np
+import pytest
+from models import make_flex, solve
+
+def solve_with(qs, SASConvolution):
+    return solve(make_flex(qs, 20000., ['NoOutsideLoads'] * 4, Method='SAS',
+                           dy=7000., SASConvolution=SASConvolution))
+
+def loads(shape):
+    qs = np.zeros(shape)
+    qs[30:60, 50:90] = 1E6
+    # Across a corner: no loads outside of the grid
+    qs[:5, -8:] = 3E6
+    return qs
+
+def test_fft():
+    # The same as summing the solutions for each loaded cell
+    shape = (60, 100)
+    direct = solve_with(loads(shape), 'direct')
+    fft = solve_with(loads(shape), 'fft')
+    assert np.abs(fft.w - direct.w).max() < 1E-12 * np.abs(direct.w).max()
+    # A single point load is deflected symmetrically
+    qs = np.zeros(shape)
+    qs[20, 30] = 1E6
+    w = solve_with(qs, 'auto').w
+    assert np.allclose(w[20, 30-10:30+11], w[20, 30+10:30-11:-1])
+    assert np.allclose(w[20-10:20+11, 30], w[20+10:20-11:-1, 30])
+
+def test_stack():
+    shape = (60, 100)
+    qs = np.array([loads(shape), 2 * loads(shape)])
+    fft = solve_with(qs, 'fft')
+    assert fft.w.shape == (2,) + shape
+    assert np.allclose(fft.w[1], 2 * fft.w[0])
+    direct = solve_with(qs, 'direct')
+    assert np.allclose(fft.w, direct.w, rtol=0, atol=1E-12 * np.abs(direct.w).max())
+
+def test_option():
+    with pytest.raises(SystemExit):
+        solve_with(loads((60, 100)), 'loop')
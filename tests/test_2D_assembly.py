@@ -0,0 +1,44 @@
+#! /usr/bin/env python
+
+import numpy as np
+import scipy.sparse
+from gflex.solvers import diagonals_to_csr
+
+def spdiags_matrix(diagonals, grid_shape):
+    # The matrix as built before: roll and place with spdiags (one diagonal
+    # at a time here, as some offsets are repeated)
+    N = grid_shape[0] * grid_shape[1]
+    A = scipy.sparse.csr_matrix((N, N))
+    for array, (sx, sy), offset in diagonals:
+        diag = np.roll(np.roll(array, sx, 1), sy, 0).ravel()
+        diag[np.isinf(diag)] = 0
+        A = A + scipy.sparse.spdiags(diag, offset, N, N, format='csr')
+    return A
+
+def test_main():
+    np.random.seed(0)
+    for ny, nx in [(17, 23), (6, 5), (40, 3)]:
+        N = ny * nx
+        shifts = [(0, -2), (-1, -1), (0, -1), (1, -1), (-2, 0), (-1, 0), (0, 0),
+                  (1, 0), (2, 0), (-1, 1), (0, 1), (1, 1), (0, 2)]
+        offsets = [-2*nx, -nx-1, -nx, -nx+1, -2, -1, 0, 1, 2, nx-1, nx, nx+1,
+                   2*nx]
+        # Wraparound diagonals, including ones that land on the same offsets
+        shifts += [(-2, 0), (1, -1), (0, 2), (0, -2)]
+        offsets += [nx-2, -N+1, 2*nx-N, N-2*nx]
+        diagonals = []
+        for shift, offset in zip(shifts, offsets):
+            array = np.random.randn(ny, nx)
+            array[np.random.rand(ny, nx) < 0.2] = 0
+            array[np.random.rand(ny, nx) < 0.1] = np.inf
+            diagonals.append((array, shift, offset))
+        A = diagonals_to_csr(diagonals, (ny, nx))
+        B = spdiags_matrix(diagonals, (ny, nx))
+        B.eliminate_zeros()
+        assert A.shape == B.shape
+        assert A.nnz == B.nnz
+        assert abs(A - B).max() < 1E-12
+        assert A.has_sorted_indices
+
+if __name__ == '__main__':
+    test_main()
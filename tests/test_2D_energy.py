@@ -0,0 +1,31 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def solve_energy(PlateSolutionType, Te, BCs, Solver='direct'):
+    qs = np.zeros((30, 40))
+    qs[10:20, 12:25] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver,
+                           PlateSolutionType=PlateSolutionType), finalize=False)
+
+def test_main():
+    y, x = np.mgrid[0:30, 0:40]
+    Te = 20000. + 5000.*np.sin(2*np.pi*x/40.)*np.cos(2*np.pi*y/30.)
+    for BCs in [['0Displacement0Slope']*4, ['Periodic']*4,
+                ['0Moment0Shear', 'Mirror', '0Slope0Shear', '0Displacement0Slope']]:
+        flex = solve_energy('energy', Te, BCs)
+        K = flex.coeff_matrix.toarray()
+        assert np.abs(K - K.T).max() == 0
+        np.linalg.cholesky(K) # Fails if not positive definite
+        for Solver in ['iterative', 'multigrid']:
+            w = solve_energy('energy', Te, BCs, Solver).w
+            assert np.abs(w - flex.w).max() < 1E-6 * np.abs(flex.w).max()
+    # Constant Te, clamped and periodic: the same operator as vWC1994
+    for BCs in [['0Displacement0Slope']*4, ['Periodic']*4]:
+        w_energy = solve_energy('energy', 25000., BCs).w
+        w_vWC1994 = solve_energy('vWC1994', 25000., BCs).w
+        assert np.allclose(w_energy, w_vWC1994)
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+
+import gflex
+import numpy as np
+import shutil
+import tempfile
+from models import make_flex, solve, write_config
+
+def solve_with(BCs, PlateSolutionType='vWC1994', Te=None):
+    if Te is None:
+        y, x = np.mgrid[0:30, 0:40]
+        Te = 20000. + 8000.*np.sin(2*np.pi*x/40.)*np.cos(2*np.pi*y/30.)
+    qs = np.zeros((30, 40))
+    qs[10:20, 15:30] = 1E6
+    return solve(make_flex(qs, Te.copy(), BCs,
+                           PlateSolutionType=PlateSolutionType,
+                           ReuseFactorization=True))
+
+def check(flex):
+    # The patched matrix is the one that a new run would build, and the
+    # next run uses it rather than building its own
+    fresh = solve_with([flex.BC_W, flex.BC_E, flex.BC_N, flex.BC_S],
+                       flex.PlateSolutionType, flex.Te)
+    A = flex.coeff_matrix
+    assert abs(A - fresh.coeff_matrix).max() < 1E-12 * abs(A).max()
+    flex.run()
+    flex.finalize()
+    assert flex.coeff_matrix is A
+    assert np.allclose(flex.w, fresh.w)
+
+def test_update_Te():
+    for BCs in [['Periodic', 'Periodic', 'Periodic', 'Periodic'],
+                ['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic'],
+                ['Mirror', '0Slope0Shear', '0Moment0Shear', '0Displacement0Slope']]:
+        for PlateSolutionType in ['vWC1994', 'G2009', 'energy']:
+            flex = solve_with(BCs, PlateSolutionType)
+            # Inside of the grid, and across the corner of the grid
+            flex.update_Te(15000.*np.ones((4, 5)), 12, 20)
+            check(flex)
+            flex.update_Te(25000.*np.ones((3, 4)), 27, 36)
+            check(flex)
+
+def test_update_Te_config_file():
+    # The new Te is kept, rather than read again from the configuration file
+    qs = np.zeros((30, 40))
+    qs[10:20, 15:30] = 1E6
+    BCs = ['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear']
+    directory = tempfile.mkdtemp()
+    try:
+        flex = gflex.F2D(write_config(directory, qs, 25000., BCs))
+        flex.ReuseFactorization = True
+        solve(flex)
+        w = flex.w.copy()
+        flex.update_Te(15000.*np.ones((4, 5)), 12, 20)
+        flex.run()
+        flex.finalize()
+    finally:
+        shutil.rmtree(directory)
+    assert flex.Te[12, 20] == 15000.
+    assert np.abs(flex.w - w).max() > 1E-3 * np.abs(w).max()
+    assert np.allclose(flex.w, solve_with(BCs, Te=flex.Te).w)
+
+def test_update_boundary_conditions():
+    flex = solve_with(['0Displacement0Slope', '0Moment0Shear',
+                       '0Slope0Shear', 'Mirror'])
+    flex.update_boundary_conditions(BC_E='0Displacement0Slope')
+    check(flex)
+    flex.update_boundary_conditions(BC_N='0Moment0Shear', BC_S='0Slope0Shear')
+    check(flex)
+    flex.update_boundary_conditions(BC_W='Periodic', BC_E='Periodic')
+    check(flex)
+    flex = solve_with(['Mirror', '0Slope0Shear', '0Moment0Shear', 'Mirror'],
+                      'energy')
+    flex.update_boundary_conditions(BC_W='0Displacement0Slope')
+    check(flex)
+
+if __name__ == '__main__':
+    test_update_Te()
+    test_update_Te_config_file()
+    test_update_boundary_conditions()
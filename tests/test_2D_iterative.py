@@ -0,0 +1,28 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def solve_twice(Solver, Preconditioner, qs):
+    # Then for a second, slightly different load: warm start from the first
+    # solution with the stored preconditioner
+    y, x = np.mgrid[0:40, 0:50]
+    Te = 20000. + 5000.*np.sin(2*np.pi*x/50.)
+    BCs = ['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic']
+    flex = make_flex(qs.copy(), Te, BCs, Solver=Solver,
+                     Preconditioner=Preconditioner, ReuseFactorization=True)
+    w = solve(flex).w.copy()
+    flex.qs = 1.01*qs
+    return w, solve(flex).w.copy()
+
+def test_main():
+    qs = np.zeros((40, 50))
+    qs[10:20, 10:25] = 1E6
+    w_direct = solve_twice('direct', None, qs)[0]
+    for Preconditioner in ['ilu', 'jacobi', 'multigrid', None]:
+        w, w_next = solve_twice('iterative', Preconditioner, qs)
+        assert np.abs(w - w_direct).max() < 1E-6 * np.abs(w_direct).max()
+        assert np.abs(w_next - 1.01*w_direct).max() < 1E-6 * np.abs(w_direct).max()
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,36 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def solve_matrix_free(MatrixFree, Te, BCs, Solver='iterative', MaxIterations=None):
+    qs = np.zeros((20, 30))
+    qs[8:14, 10:20] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver, dx=4000.,
+                           Preconditioner='jacobi', MatrixFree=MatrixFree,
+                           MaxIterations=MaxIterations), finalize=False)
+
+def test_main():
+    y, x = np.mgrid[0:20, 0:30]
+    Te = 20000. + 5000.*np.sin(2*np.pi*x/30.)*np.cos(2*np.pi*y/20.)
+    for BCs in [['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic'],
+                ['Periodic', 'Periodic', 'Mirror', '0Slope0Shear'],
+                ['0Moment0Shear', 'Mirror', '0Displacement0Slope', '0Moment0Shear']]:
+        for Te_case in [25000., Te]:
+            # Only the operators are compared here
+            matrix = solve_matrix_free(False, Te_case, BCs, MaxIterations=1)
+            matrix_free = solve_matrix_free(True, Te_case, BCs, MaxIterations=1)
+            v = np.random.rand(600)
+            Av = matrix.coeff_matrix.dot(v)
+            assert np.abs(matrix_free.coeff_matrix.dot(v) - Av).max() < 1E-12 * np.abs(Av).max()
+            d = matrix.coeff_matrix.diagonal()
+            assert np.abs(matrix_free.coeff_matrix.diagonal() - d).max() < 1E-12 * np.abs(d).max()
+    # Solution, on a plate for which the Jacobi-preconditioned solver
+    # converges well
+    BCs = ['0Displacement0Slope', '0Displacement0Slope', 'Periodic', 'Periodic']
+    w = solve_matrix_free(True, Te, BCs).w
+    w_direct = solve_matrix_free(False, Te, BCs, 'direct').w
+    assert np.abs(w - w_direct).max() < 1E-6 * np.abs(w_direct).max()
+
+if __name__ == '__main__':
+    test_main()
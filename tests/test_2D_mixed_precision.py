@@ -0,0 +1,34 @@
+#! /usr/bin/env python
+
+import numpy as np
+import scipy.sparse
+from gflex.solvers import MixedPrecisionFactor
+from models import make_flex, solve
+
+def solve_with(Solver, PlateSolutionType, BCs):
+    y, x = np.mgrid[0:60, 0:70]
+    Te = 20000. + 5000.*np.sin(x/10.)*np.cos(y/12.)
+    qs = np.zeros((60, 70))
+    qs[20:30, 15:35] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver,
+                           PlateSolutionType=PlateSolutionType))
+
+def test_main():
+    BCs = ('0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear')
+    for PlateSolutionType, BCs in [('vWC1994', BCs),
+                                   ('energy', ('Periodic',)*2 + BCs[2:])]:
+        direct = solve_with('direct', PlateSolutionType, BCs)
+        mixed = solve_with('mixed', PlateSolutionType, BCs)
+        assert np.abs(mixed.w - direct.w).max() < 1E-10 * np.abs(direct.w).max()
+        assert mixed.refinement_residual < 1E-9
+    # If refinement cannot reach double-precision accuracy in time, the
+    # matrix is factorized in double precision instead
+    A = scipy.sparse.diags([-1., 2.001, -1.], [-1, 0, 1], shape=(500, 500))
+    b = np.ones(500)
+    factor = MixedPrecisionFactor(A, maxiter=0)
+    x = factor.solve(b)
+    assert factor.precision == 'double'
+    assert np.abs(A.dot(x) - b).max() < 1E-10
+
+if __name__ == '__main__':
+    test_main()
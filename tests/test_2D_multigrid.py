@@ -0,0 +1,22 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def solve_with(Solver, BCs):
+    y, x = np.mgrid[0:40, 0:50]
+    Te = 20000. + 8000.*np.sin(2*np.pi*x/50.)*np.cos(2*np.pi*y/40.)
+    qs = np.zeros((40, 50))
+    qs[10:20, 15:30] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver)).w
+
+def test_main():
+    for BCs in [['Periodic', 'Periodic', 'Periodic', 'Periodic'],
+                ['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic'],
+                ['Mirror', '0Slope0Shear', '0Moment0Shear', '0Displacement0Slope']]:
+        w_mg = solve_with('multigrid', BCs)
+        w_direct = solve_with('direct', BCs)
+        assert np.abs(w_mg - w_direct).max() < 1E-6 * np.abs(w_direct).max()
+
+if __name__ == '__main__':
+    test_main()
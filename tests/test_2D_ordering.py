@@ -0,0 +1,37 @@
+#! /usr/bin/env python
+
+import numpy as np
+from gflex.solvers import nested_dissection
+from models import make_flex, solve
+
+def make_ordered(Ordering, PlateSolutionType, BC):
+    y, x = np.mgrid[0:50, 0:60]
+    Te = 20000. + 5000.*np.sin(x/10.)*np.cos(y/12.)
+    qs = np.zeros((50, 60))
+    qs[20:30, 15:35] = 1E6
+    return make_flex(qs, Te, [BC]*4, PlateSolutionType=PlateSolutionType,
+                     Ordering=Ordering, ReuseFactorization=True)
+
+def test_main():
+    for periodic in [False, True]:
+        p = nested_dissection((50, 60), periodic, periodic)
+        assert (np.sort(p) == np.arange(50*60)).all()
+    for PlateSolutionType, BC in [('vWC1994', '0Moment0Shear'),
+                                  ('energy', 'Periodic')]:
+        w = solve(make_ordered(None, PlateSolutionType, BC), finalize=False).w
+        for Ordering in ['nested_dissection', 'rcm', 'colamd', 'mmd_at_plus_a']:
+            flex = solve(make_ordered(Ordering, PlateSolutionType, BC),
+                         finalize=False)
+            assert flex.factor_nnz > 0
+            assert np.abs(flex.w - w).max() < 1E-10 * np.abs(w).max()
+        # The permutation is kept for a new Te on the same grid
+        flex = solve(make_ordered('nested_dissection', PlateSolutionType, BC),
+                     finalize=False)
+        permutation = flex.coeff_permutation
+        assert permutation is not None
+        flex.Te = flex.Te * 1.1
+        flex.run()
+        assert flex.coeff_permutation is permutation
+
+if __name__ == '__main__':
+    test_main()
@@ -0,0 +1,43 @@
+#! /usr/bin/env python
+
+import gflex
+import numpy as np
+from models import make_flex, solve
+
+def solve_with(Solver, BCs, PlateSolutionType='vWC1994', nloads=None):
+    # A fault: a jump in elastic thickness
+    Te = 25000. * np.ones((128, 128))
+    Te[:, 84:] = 10000.
+    qs = np.zeros((128, 128))
+    qs[40:64, 40:64] = 1E7
+    if nloads is not None:
+        qs = np.array([qs * (i + 1) for i in range(nloads)])
+    return solve(make_flex(qs, Te, BCs, Solver=Solver,
+                           PlateSolutionType=PlateSolutionType), finalize=False)
+
+def test_main():
+    for BCs in [['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear'],
+                ['Periodic', 'Periodic', 'Periodic', 'Periodic']]:
+        for PlateSolutionType in ['vWC1994', 'energy']:
+            w = solve_with('direct', BCs, PlateSolutionType).w
+            flex = solve_with('quadtree', BCs, PlateSolutionType)
+            # Far fewer unknowns than cells, for nearly the same deflections
+            assert flex.coeff_factor.unknowns * 4 < 128 * 128
+            assert flex.quadtree_depth.max() > flex.quadtree_depth.min()
+            assert np.abs(flex.w - w).max() < 1E-2 * np.abs(w).max()
+    # A stack of loads
+    BCs = ['Mirror', '0Slope0Shear', '0Moment0Shear', '0Displacement0Slope']
+    w = solve_with('direct', BCs, nloads=2).w
+    flex = solve_with('quadtree', BCs, nloads=2)
+    assert flex.w.shape == w.shape
+    assert np.abs(flex.w - w).max() < 1E-2 * np.abs(w).max()
+
+def test_bspline_basis():
+    # Cubic B-splines sum to one, on any grid and with periodic boundaries
+    for n, spacing, periodic in [(50, 4, False), (53, 8, False), (64, 8, True)]:
+        B = gflex.bspline_basis(n, spacing, periodic)
+        assert np.allclose(B.sum(axis=1), 1)
+
+if __name__ == '__main__':
+    test_main()
+    test_bspline_basis()
@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+
+import gflex
+import multiprocessing
+import numpy as np
+from models import make_flex, solve
+
+def solve_with(Solver, BCs, PlateSolutionType='vWC1994', MatrixFree=False,
+               Processes=1, MaxIterations=None, finalize=True, **attributes):
+    y, x = np.mgrid[0:40, 0:50]
+    Te = 20000. + 8000.*np.sin(2*np.pi*x/50.)*np.cos(2*np.pi*y/40.)
+    qs = np.zeros((40, 50))
+    qs[10:20, 15:30] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver,
+                           PlateSolutionType=PlateSolutionType,
+                           MatrixFree=MatrixFree, SubdomainSize=16,
+                           SubdomainOverlap=4, Processes=Processes,
+                           MaxIterations=MaxIterations, **attributes),
+                 finalize=finalize)
+
+def test_main():
+    for BCs in [['Periodic', 'Periodic', 'Periodic', 'Periodic'],
+                ['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic'],
+                ['Mirror', '0Slope0Shear', '0Moment0Shear', '0Displacement0Slope']]:
+        w_direct = solve_with('direct', BCs).w
+        for MatrixFree, Processes in [(False, 1), (True, 2)]:
+            w = solve_with('schwarz', BCs, MatrixFree=MatrixFree,
+                           Processes=Processes).w
+            assert np.abs(w - w_direct).max() < 1E-6 * np.abs(w_direct).max()
+    BCs = ['Periodic', 'Periodic', 'Mirror', '0Slope0Shear']
+    w_direct = solve_with('direct', BCs, 'energy').w
+    w = solve_with('schwarz', BCs, 'energy').w
+    assert np.abs(w - w_direct).max() < 1E-6 * np.abs(w_direct).max()
+
+def test_subdomain_matrices():
+    # Assembled from the elastic thickness (matrix-free), and taken from the
+    # full matrix, including parts of the grid that cross periodic boundaries
+    BCs = ['Periodic', 'Periodic', 'Periodic', 'Periodic']
+    matrix = solve_with('direct', BCs, finalize=False)
+    matrix_free = solve_with('iterative', BCs, MatrixFree=True, MaxIterations=1,
+                             finalize=False)
+    for rows in [(-6, 10), (12, 30), (30, 45)]:
+        for cols in [(-5, 12), (20, 38), (40, 60)]:
+            cells, A = matrix.subdomain_coeff_matrix(rows, cols)
+            cells_mf, A_mf = matrix_free.subdomain_coeff_matrix(rows, cols)
+            assert (cells == cells_mf).all()
+            assert abs(A - A_mf).max() < 1E-12 * abs(A).max()
+
+def test_workers():
+    # The worker processes are stopped when the models are finalized,
+    # including ones that share their operators, and when the model is run
+    # again with a new plate
+    BCs = ['Periodic', 'Periodic', 'Periodic', 'Periodic']
+    for ShareOperators in [False, True]:
+        for i in range(3):
+            solve_with('schwarz', BCs, Processes=2,
+                       ShareOperators=ShareOperators)
+        assert multiprocessing.active_children() == []
+    flex = solve_with('schwarz', BCs, Processes=2, finalize=False,
+                      ReuseFactorization=True)
+    workers = flex.coeff_factor.workers
+    assert workers
+    flex.Te = 1.1 * flex.Te
+    flex.run()
+    assert not any(worker.is_alive() for worker in workers)
+    flex.finalize()
+    gflex.operator_cache.clear()
+
+if __name__ == '__main__':
+    test_main()
+    test_subdomain_matrices()
+    test_workers()
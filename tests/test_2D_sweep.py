@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+
+import gflex
+import numpy as np
+import shutil
+import tempfile
+from models import make_flex, solve, write_config
+
+def make_loaded(Te, BCs, PlateSolutionType='vWC1994', Solver='direct',
+                Ordering=None):
+    qs = np.zeros((30, 40))
+    qs[10:20, 15:30] = 1E6
+    return make_flex(qs, Te, BCs, Solver=Solver,
+                     PlateSolutionType=PlateSolutionType, Ordering=Ordering)
+
+def test_main():
+    y, x = np.mgrid[0:30, 0:40]
+    Te_grid = 20000. + 8000.*np.sin(2*np.pi*x/40.)*np.cos(2*np.pi*y/30.)
+    Te_values = [10000., Te_grid, 25000., 0.5*Te_grid, 40000.]
+    for BCs in [['Periodic', 'Periodic', 'Periodic', 'Periodic'],
+                ['Mirror', '0Slope0Shear', '0Moment0Shear', '0Displacement0Slope']]:
+        for PlateSolutionType in ['vWC1994', 'energy']:
+            w_fresh = np.array([solve(make_loaded(Te, BCs, PlateSolutionType)).w
+                                for Te in Te_values])
+            for Processes in [1, 2]:
+                flex = make_loaded(30000., BCs, PlateSolutionType)
+                flex.initialize()
+                w = flex.sweep_Te(Te_values, Processes=Processes)
+                assert w.shape == (len(Te_values), 30, 40)
+                assert np.allclose(w, w_fresh)
+                # The model itself is left as it was
+                assert flex.Te == 30000.
+    # With a chosen ordering, and with an iterative solver
+    BCs = ['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear']
+    w_fresh = np.array([solve(make_loaded(Te, BCs)).w for Te in Te_values])
+    for Solver, Ordering in [('direct', 'rcm'), ('direct', 'colamd'),
+                             ('iterative', None)]:
+        flex = make_loaded(30000., BCs, Solver=Solver, Ordering=Ordering)
+        flex.initialize()
+        w = flex.sweep_Te(Te_values, Processes=2)
+        assert np.abs(w - w_fresh).max() < 1E-6 * np.abs(w_fresh).max()
+
+def test_config_file():
+    # Each member has its own Te, rather than that of the configuration file
+    y, x = np.mgrid[0:30, 0:40]
+    Te_grid = 20000. + 8000.*np.sin(2*np.pi*x/40.)*np.cos(2*np.pi*y/30.)
+    Te_values = [10000., Te_grid, 40000.]
+    BCs = ['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear']
+    qs = np.zeros((30, 40))
+    qs[10:20, 15:30] = 1E6
+    w_fresh = np.array([solve(make_loaded(Te, BCs)).w for Te in Te_values])
+    directory = tempfile.mkdtemp()
+    try:
+        for Processes in [1, 2]:
+            flex = gflex.F2D(write_config(directory, qs, 25000., BCs))
+            flex.initialize()
+            w = flex.sweep_Te(Te_values, Processes=Processes)
+            assert np.abs(w[0] - w[2]).max() > 0.1 * np.abs(w[0]).max()
+            assert np.allclose(w, w_fresh)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    test_main()
+    test_config_file()
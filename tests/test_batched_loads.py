@@ -0,0 +1,33 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+def make_2D(qs):
+    BCs = ['0Displacement0Slope', '0Moment0Shear', 'Periodic', 'Periodic']
+    return solve(make_flex(qs, 25000.*np.ones((20, 30)), BCs)).w
+
+def make_1D(qs, Method):
+    BCs = ['0Displacement0Slope', '0Moment0Shear']
+    return solve(make_flex(qs, 30000., BCs, Method=Method, dx=4000.)).w
+
+def test_main():
+    qs = np.zeros((3, 20, 30))
+    qs[0, 5:10, 5:10] = 1E6
+    qs[1, 12:18, 20:25] = 2E6
+    qs[2, :, 15] = -5E5
+    w = make_2D(qs.copy())
+    assert w.shape == qs.shape
+    for i in range(qs.shape[0]):
+        assert np.allclose(w[i], make_2D(qs[i].copy()))
+    qs = np.zeros((2, 100))
+    qs[0, 40:50] = 1E6
+    qs[1, 80:] = 3E6
+    for Method in ['FD', 'SAS']:
+        w = make_1D(qs.copy(), Method)
+        assert w.shape == qs.shape
+        for i in range(qs.shape[0]):
+            assert np.allclose(w[i], make_1D(qs[i].copy(), Method))
+
+if __name__ == '__main__':
+    test_main()
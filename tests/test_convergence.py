@@ -0,0 +1,62 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex
+
+def make_loaded(dimension, Solver, shape):
+    Te = 20000. + 5000.*np.sin(2*np.pi*np.arange(shape[-1])/50.)
+    BCs = ['0Displacement0Slope', '0Moment0Shear']
+    if dimension == 2:
+        Te = Te * np.ones(shape)
+        BCs += ['Periodic', 'Periodic']
+    qs = np.zeros(shape)
+    qs[..., 10:25] = 1E6
+    return make_flex(qs, Te, BCs, Solver=Solver)
+
+def test_main():
+    for dimension, Solver, shape in [(1, 'iterative', (2, 50)),
+                                     (2, 'iterative', (40, 50)),
+                                     (2, 'multigrid', (40, 50)),
+                                     (2, 'schwarz', (40, 50))]:
+        flex = make_loaded(dimension, Solver, shape)
+        flex.SubdomainSize = 20
+        flex.Processes = 1
+        calls = []
+        flex.iterative_callbacks.append(lambda i, residual: calls.append(residual))
+        flex.initialize()
+        flex.run()
+        convergence = flex.convergence
+        assert convergence['converged']
+        assert sum(convergence['iterations']) == len(calls) > 0
+        assert convergence['history'][-1] == calls[-len(convergence['history'][-1]):]
+        # The true residual, |A w + q|, relative to |q|
+        tol = flex.iterative_ConvergenceTolerance
+        assert max(convergence['relative_residual']) < 100 * tol
+        assert flex.metrics['iterations'] == max(convergence['iterations'])
+        flex.finalize()
+    # Direct solutions have none
+    flex = make_loaded(2, 'direct', (40, 50))
+    flex.initialize()
+    flex.run()
+    assert flex.convergence is None
+
+def test_not_converged():
+    flex = make_loaded(2, 'iterative', (40, 50))
+    flex.Preconditioner = None
+    flex.MaxIterations = 2
+    flex.initialize()
+    flex.run()
+    assert not flex.convergence['converged']
+    assert flex.convergence['info'] != [0]
+    assert flex.convergence['relative_residual'][0] > flex.iterative_ConvergenceTolerance
+    flex.RequireConvergence = True
+    try:
+        flex.run()
+    except SystemExit:
+        pass
+    else:
+        assert False, "did not exit"
+
+if __name__ == '__main__':
+    test_main()
+    test_not_converged()
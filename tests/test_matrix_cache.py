@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+
+import gflex
+import matrix_cache # As imported by gflex
+import numpy as np
+import os
+import scipy.sparse
+import shutil
+import tempfile
+import time
+from models import make_flex, solve
+
+def solve_cached(dimension, CacheDirectory, Te=25000., PlateSolutionType='vWC1994'):
+    if dimension == 1:
+        qs = np.zeros(200)
+        qs[80:120] = 1E6
+        BCs = ['0Displacement0Slope', '0Moment0Shear']
+    else:
+        qs = np.zeros((30, 40))
+        qs[10:20, 15:30] = 1E6
+        BCs = ['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear']
+    return solve(make_flex(qs, Te, BCs, PlateSolutionType=PlateSolutionType,
+                           CacheDirectory=CacheDirectory))
+
+def test_main():
+    directory = tempfile.mkdtemp()
+    try:
+        for dimension, PlateSolutionType in [(1, None), (2, 'vWC1994'),
+                                             (2, 'energy')]:
+            built = solve_cached(dimension, directory,
+                                 PlateSolutionType=PlateSolutionType)
+            assert built.cache_misses == 1 and built.cache_hits == 0
+            loaded = solve_cached(dimension, directory,
+                                  PlateSolutionType=PlateSolutionType)
+            assert loaded.cache_hits == 1 and loaded.cache_misses == 0
+            assert np.allclose(loaded.w, built.w)
+            # Different parameters are a different matrix
+            other = solve_cached(dimension, directory, Te=20000.,
+                                 PlateSolutionType=PlateSolutionType)
+            assert other.cache_misses == 1
+        report = gflex.cache_report(directory)
+        assert report['entries'] == 6
+        assert report['hits'] == 3 and report['misses'] == 6
+        # Least recently used first
+        files = gflex.cached_files(directory)
+        os.utime(files[0][0], (time.time() - 10*86400,)*2)
+        assert gflex.evict(directory, max_age=5) == 1
+        assert gflex.evict(directory, max_size=0) == 5
+        assert gflex.cache_report(directory)['entries'] == 0
+        # Matrices cached by another version are not used
+        solve_cached(2, directory)
+        try:
+            matrix_cache.FORMAT_VERSION += 1
+            assert solve_cached(2, directory).cache_misses == 1
+        finally:
+            matrix_cache.FORMAT_VERSION -= 1
+    finally:
+        shutil.rmtree(directory)
+
+def test_writes():
+    directory = tempfile.mkdtemp()
+    try:
+        # Rewriting a cached matrix replaces it, leaving no temporary files
+        for n in [1, 2]:
+            matrix_cache.write_coeff_matrix(directory, 'test',
+                                            n * scipy.sparse.identity(3))
+        A, load_weights = matrix_cache.read_coeff_matrix(directory, 'test')
+        assert np.allclose(A.toarray(), 2 * np.identity(3))
+        for hit in [True, False]:
+            matrix_cache.record_lookup(directory, hit)
+        assert sorted(os.listdir(directory)) == \
+            ['coeff_matrix_test.npz', 'stats.json']
+        report = gflex.cache_report(directory)
+        assert report['hits'] == 1 and report['misses'] == 1
+        # A cache that cannot be written to does not stop the run
+        path = os.path.join(directory, 'stats.json')
+        flex = solve_cached(2, path)
+        assert flex.cache_misses == 1
+        assert np.allclose(flex.w, solve_cached(2, None).w)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    test_main()
+    test_writes()
@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+
+import numpy as np
+import csv
+import json
+import os
+import tempfile
+from models import make_flex, solve
+
+def make_loaded(Method, shape, Solver='direct'):
+    qs = np.zeros(shape)
+    qs[..., 10:20] = 1E7
+    BCs = ['0Displacement0Slope', '0Moment0Shear']
+    if len(shape) == 2:
+        BCs += ['0Displacement0Slope', '0Slope0Shear']
+    return make_flex(qs, 30000., BCs, Method=Method, Solver=Solver)
+
+def test_main():
+    assembly = ['BC_Rigidity', 'get_coeff_values', 'BC_Flexure', 'build_diagonals']
+    for shape in [(100,), (40, 50)]:
+        flex = make_loaded('FD', shape)
+        flex.ReuseFactorization = True
+        flex.ProfileMemory = True
+        stages = []
+        flex.metrics_callbacks.append(lambda name, record: stages.append(name))
+        flex.initialize()
+        flex.run()
+        metrics = flex.metrics
+        assert stages[-1] == 'solve'
+        for name in assembly + ['solve']:
+            record = metrics['stages'][name]
+            assert record['calls'] == 1
+            assert record['time'] >= 0
+            assert record['peak_memory'] >= 0
+        assert metrics['grid_shape'] == list(shape)
+        assert metrics['cells'] == np.prod(shape)
+        assert metrics['nnz'] == flex.coeff_matrix.nnz
+        assert metrics['unknowns'] == np.prod(shape)
+        # The same plate again: nothing to assemble or factorize
+        flex.run()
+        assert set(flex.metrics['stages']) == set(['solve'])
+        assert flex.metrics['nnz'] == metrics['nnz']
+        flex.finalize()
+    # The direct 2D solver factorizes (within the solution)
+    flex = make_loaded('FD', (40, 50))
+    flex.Ordering = 'nested_dissection'
+    solve(flex, finalize=False)
+    factorization = flex.metrics['stages']['factorization']
+    assert factorization['time'] <= flex.metrics['stages']['solve']['time']
+    assert flex.metrics['factor_nnz'] == flex.factor_nnz
+    # SAS
+    flex = solve(make_loaded('SAS', (20, 30)), finalize=False)
+    assert 'SAS_kernel' in flex.metrics['stages']
+    assert flex.metrics['method'] == 'SAS'
+
+def test_output():
+    directory = tempfile.mkdtemp()
+    flex = solve(make_loaded('FD', (40, 50)))
+    # JSON
+    flex.metricsOutFile = os.path.join(directory, 'metrics.json')
+    flex.output()
+    with open(flex.metricsOutFile) as f:
+        metrics = json.load(f)
+    assert metrics['stages']['output']['calls'] == 1
+    assert metrics['nnz'] == flex.metrics['nnz']
+    # CSV: a row for each run
+    flex.metricsOutFile = os.path.join(directory, 'metrics.csv')
+    flex.output()
+    flex.output()
+    with open(flex.metricsOutFile) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3
+    assert 'stages.solve.time' in lines[0].split(',')
+    # A run with other metrics adds their columns, and keeps the rows before
+    sas = solve(make_loaded('SAS', (20, 30)))
+    sas.metricsOutFile = flex.metricsOutFile
+    sas.output()
+    with open(flex.metricsOutFile) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 3
+    assert rows[0]['stages.solve.time'] != '' and rows[2]['stages.solve.time'] == ''
+    assert rows[0]['stages.SAS.time'] == '' and rows[2]['stages.SAS.time'] != ''
+    assert rows[2]['method'] == 'SAS'
+
+if __name__ == '__main__':
+    test_main()
+    test_output()
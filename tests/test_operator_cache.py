@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+
+import gflex
+import numpy as np
+from models import make_flex, solve
+
+BCs = ['0Displacement0Slope', '0Moment0Shear', 'Mirror', '0Slope0Shear']
+
+def solve_cached(Te, Solver='direct', ShareOperators=True, Preconditioner='ilu'):
+    qs = np.zeros((30, 40))
+    qs[10:20, 15:30] = 1E6
+    return solve(make_flex(qs, Te, BCs, Solver=Solver, ReuseFactorization=True,
+                           ShareOperators=ShareOperators,
+                           Preconditioner=Preconditioner))
+
+def test_main():
+    cache = gflex.operator_cache
+    cache.clear()
+    first = solve_cached(25000.)
+    stats = cache.stats()
+    # Identical models share the matrix and its factorization
+    second = solve_cached(25000.)
+    assert second.coeff_matrix is first.coeff_matrix
+    assert second.coeff_factor is first.coeff_factor
+    assert cache.stats()['hits'] == stats['hits'] + 2
+    assert np.allclose(second.w, first.w)
+    # But not with a different plate or solver
+    other = solve_cached(20000.)
+    assert other.coeff_matrix is not first.coeff_matrix
+    iterative = solve_cached(25000., 'iterative')
+    assert iterative.coeff_matrix is first.coeff_matrix
+    assert iterative.coeff_factor is not first.coeff_factor
+    # Changing the shared matrix in place would change it for all of them
+    A = first.coeff_matrix.copy()
+    second.update_Te(15000.*np.ones((4, 5)), 12, 20)
+    assert second.coeff_matrix is not first.coeff_matrix
+    assert abs(first.coeff_matrix - A).max() == 0
+    # Least recently used entries are evicted to stay within the limits
+    max_entries = cache.max_entries
+    try:
+        cache.max_entries = 1
+        cache.evict()
+        assert cache.stats()['entries'] == 1
+        assert solve_cached(25000.).coeff_matrix is not first.coeff_matrix
+    finally:
+        cache.max_entries = max_entries
+    cache.clear()
+
+def test_sizes():
+    # An incomplete LU preconditioner is counted by the size of its factors,
+    # and one whose size cannot be counted is not stored
+    cache = gflex.operator_cache
+    cache.clear()
+    ilu = solve_cached(25000., 'iterative')
+    size = cache.size()
+    assert size > gflex.nbytes(ilu.coeff_matrix)
+    assert solve_cached(25000., 'iterative').coeff_factor is ilu.coeff_factor
+    solve_cached(25000., 'iterative', Preconditioner='multigrid')
+    assert cache.size() == size
+    cache.clear()
+
+def test_opt_in():
+    # Models that do not set ShareOperators neither use nor fill the cache
+    cache = gflex.operator_cache
+    cache.clear()
+    first = solve_cached(25000., ShareOperators=False)
+    second = solve_cached(25000., ShareOperators=False)
+    assert second.coeff_matrix is not first.coeff_matrix
+    assert cache.stats()['entries'] == 0
+
+if __name__ == '__main__':
+    test_main()
+    test_sizes()
+    test_opt_in()
@@ -0,0 +1,66 @@
+#! /usr/bin/env python
+
+import numpy as np
+import pytest
+from models import make_flex, solve
+
+def solve_padded(Te, qs, BCs, Padding, Solver='direct'):
+    return solve(make_flex(qs, Te, BCs, Solver=Solver, Padding=Padding))
+
+def test_1D():
+    # A load near the edges of a small grid, and the same load far from the
+    # edges of a large one
+    n, far = 100, 500
+    Te = 20000. * np.ones(n + 2*far)
+    Te[far+60:] = 10000.
+    qs = np.zeros(n + 2*far)
+    qs[far+5:far+20] = 1E7
+    BCs = ['0Displacement0Slope', '0Moment0Shear']
+    w = solve_padded(Te, qs, BCs, False).w[far:far+n]
+    unpadded = solve_padded(Te[far:far+n], qs[far:far+n], BCs, False)
+    padded = solve_padded(Te[far:far+n], qs[far:far+n], BCs, True)
+    assert np.abs(unpadded.w - w).max() > 0.05 * np.abs(w).max()
+    assert np.abs(padded.w - w).max() < 0.005 * np.abs(w).max()
+    # Cropped back to the grid, with far fewer cells in the padding than in
+    # a flexural wavelength
+    assert padded.w.shape == (n,)
+    assert padded.Te.shape == (n,)
+    assert sum(padded.padding_cells) < padded.maxFlexuralWavelength_ncells
+    assert padded.w_padded.shape == (n + sum(padded.padding_cells),)
+    # Mirror (and periodic) boundaries are not padded
+    mirrored = solve_padded(Te[far:far+n], qs[far:far+n],
+                            ['Mirror', '0Displacement0Slope'], True)
+    assert mirrored.padding_cells[0] == 0
+    # Padding cells that shrink away from the grid are refused
+    for PaddingGrowth in [0.9, 0.]:
+        with pytest.raises(SystemExit):
+            solve(make_flex(qs[far:far+n], Te[far:far+n], BCs, Padding=True,
+                            PaddingGrowth=PaddingGrowth))
+
+def test_2D():
+    n = 48
+    Te = 15000. * np.ones((n, n))
+    Te[:, 30:] = 8000.
+    qs = np.zeros((n, n))
+    qs[4:16, 4:16] = 1E7
+    BCs = ['0Displacement0Slope', '0Moment0Shear', '0Displacement0Slope', 'Mirror']
+    padded = solve_padded(Te, qs, BCs, True)
+    north, south, west, east = padded.padding_cells
+    assert south == 0
+    # The same grid, padded at the full resolution
+    pad = ((north, south), (west, east))
+    Te_padded = np.pad(Te, pad, mode='edge')
+    qs_padded = np.pad(qs, pad, mode='constant')
+    w = solve_padded(Te_padded, qs_padded, BCs, False).w
+    w = w[north:north+n, west:west+n]
+    unpadded = solve_padded(Te, qs, BCs, False)
+    assert padded.w.shape == (n, n)
+    assert np.abs(unpadded.w - w).max() > 0.05 * np.abs(w).max()
+    assert np.abs(padded.w - w).max() < 0.005 * np.abs(w).max()
+    for Solver in ['quadtree', 'iterative']:
+        flex = solve_padded(Te, qs, BCs, True, Solver)
+        assert np.abs(flex.w - w).max() < 0.01 * np.abs(w).max()
+
+if __name__ == '__main__':
+    test_1D()
+    test_2D()
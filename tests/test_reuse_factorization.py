@@ -0,0 +1,35 @@
+#! /usr/bin/env python
+
+import numpy as np
+from models import make_flex, solve
+
+BCs = ['0Displacement0Slope', '0Moment0Shear', '0Slope0Shear', 'Mirror']
+
+def solve_fresh(Te, qs):
+    return solve(make_flex(qs.copy(), Te, BCs)).w
+
+def test_main():
+    Te = 30000.*np.ones((30, 40))
+    Te[:, 25:] = 15000.
+    flex = make_flex(np.zeros((30, 40)), Te.copy(), BCs, ReuseFactorization=True)
+    flex.initialize()
+    for step in range(3):
+        qs = np.zeros((30, 40))
+        qs[5+step:15+step, 10:20] = 1E6 * (step + 1)
+        flex.qs = qs
+        flex.run()
+        flex.finalize()
+        # The same factorization is used for every load
+        if step == 0:
+            factor = flex.coeff_factor
+        assert flex.coeff_factor is factor
+        assert np.allclose(flex.w, solve_fresh(Te, qs))
+    # Changing Te invalidates the stored operator and its factorization
+    flex.Te[:, :5] = 20000.
+    flex.run()
+    flex.finalize()
+    assert flex.coeff_factor is not factor
+    assert np.allclose(flex.w, solve_fresh(flex.Te, flex.qs))
+
+if __name__ == '__main__':
+    test_main()
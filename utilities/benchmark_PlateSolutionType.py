@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+
+# Benchmark of the 2D finite difference plate solution types on the sample
+# elastic thickness grids: the nonsymmetric vWC1994 operator (LU
+# factorization, LGMRES) against the symmetric positive-definite "energy"
+# operator (Cholesky or symmetric-mode LU factorization, conjugate
+# gradients)
+#
+# Usage: benchmark_PlateSolutionType.py [refinement]
+# Each Te grid is refined by the (integer) factor given, by default 4, to
+# give problem sizes for which the timings mean something
+
+from __future__ import division, print_function
+import os
+import sys
+import time
+import numpy as np
+import gflex
+
+Te_directory = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            '..', 'input', 'Te_sample', '2D')
+
+def run(Te, PlateSolutionType, Solver):
+  flex = gflex.F2D()
+  flex.Quiet = True
+  flex.Method = 'FD'
+  flex.PlateSolutionType = PlateSolutionType
+  flex.Solver = Solver
+  flex.Preconditioner = 'ilu'
+  flex.ReuseFactorization = True
+  flex.g = 9.8
+  flex.E = 65E9
+  flex.nu = 0.25
+  flex.rho_m = 3300.
+  flex.rho_fill = 0.
+  flex.Te = Te
+  flex.dx = 20000. / refinement
+  flex.dy = 20000. / refinement
+  flex.BC_W = '0Displacement0Slope'
+  flex.BC_E = '0Moment0Shear'
+  flex.BC_N = 'Periodic'
+  flex.BC_S = 'Periodic'
+  ny, nx = Te.shape
+  flex.qs = np.zeros(Te.shape)
+  flex.qs[ny//3:2*ny//3, nx//3:2*nx//3] = 1E6
+  flex.initialize()
+  start = time.time()
+  flex.run()
+  elapsed = time.time() - start
+  if Solver == 'direct':
+    try:
+      nnz = flex.coeff_factor.nnz
+    except AttributeError:
+      nnz = flex.coeff_factor.L.nnz + flex.coeff_factor.U.nnz
+  else:
+    nnz = np.nan
+  w = flex.w.copy()
+  flex.finalize()
+  return elapsed, nnz, w
+
+if len(sys.argv) > 1:
+  refinement = int(sys.argv[1])
+else:
+  refinement = 4
+
+print("Refinement:", refinement)
+print("%-52s %-9s %-9s %9s %12s %10s" % ("Te grid", "type", "solver", "time [s]",
+                                          "factor nnz", "rel. diff."))
+for Te_file in sorted(os.listdir(Te_directory)):
+  Te = np.loadtxt(os.path.join(Te_directory, Te_file))
+  Te = np.kron(Te, np.ones((refinement, refinement)))
+  Te_name = Te_file + ' ' + str(Te.shape)
+  w_reference = None
+  for PlateSolutionType in ['vWC1994', 'energy']:
+    for Solver in ['direct', 'iterative']:
+      elapsed, nnz, w = run(Te, PlateSolutionType, Solver)
+      if w_reference is None:
+        w_reference = w
+      difference = np.abs(w - w_reference).max() / np.abs(w_reference).max()
+      print("%-52s %-9s %-9s %9.3f %12.0f %10.2e" % (Te_name, PlateSolutionType,
+            Solver, elapsed, nnz, difference))
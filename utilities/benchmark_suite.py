@@ -0,0 +1,316 @@
+#! /usr/bin/env python
+
+# Benchmark suite: times (and measures the memory of) gFlex on every
+# combination of dimension (F1D, F2D), solution method (FD with the direct
+# and iterative solvers, SAS and SAS_NG), finite difference boundary
+# condition and plate solution type (F2D), on grids of 100 to 4000 cells on
+# a side. Each case runs in a process of its own, so that its peak memory is
+# its own, and it can be stopped if it takes too long.
+#
+# The results are written to a JSON file, stamped with the versions of
+# gFlex, numpy and scipy (and the git commit, if there is one), with the
+# wall time and metrics of each stage of each case (see Flexure.metrics),
+# the peak resident memory above that at the start of the case, and the
+# largest deflection, as a check on the solution. Two such files can be
+# compared, case by case, to see what a change to gFlex does.
+#
+# Usage:
+#   benchmark_suite.py [--sizes 100,200,500,1000,2000,4000] [--dimensions 1,2]
+#                      [--methods FD,SAS,SAS_NG] [--only PATTERN]
+#                      [--max-cells N] [--timeout SECONDS] [--trace-memory]
+#                      [--output FILE.json] [--list]
+#   benchmark_suite.py --compare OLD.json NEW.json [--threshold 1.2]
+#
+# 2D cases with more than --max-cells cells (by default, 1000 x 1000) are
+# skipped (and recorded as such): the largest need many GB of memory. Raise
+# it to run them. --only selects the cases whose names match the (shell-
+# style) pattern, e.g., 'F2D/FD/direct/*'. Nothing is downloaded.
+#
+# It imports the gFlex of the source tree that it is in, so it can be run
+# from anywhere (e.g., python utilities/benchmark_suite.py) without
+# installing that first.
+
+from __future__ import division, print_function
+import os
+import sys
+import time
+import json
+import fnmatch
+import platform
+import argparse
+import subprocess
+import multiprocessing
+import numpy as np
+import scipy
+# The gFlex of this source tree, rather than any other that is installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+import gflex
+# Found through the path that gflex adds
+from _version import __version__
+from profiling import max_rss, json_value
+
+# Version of the layout of the results file
+SCHEMA = 1
+
+SIZES = [100, 200, 500, 1000, 2000, 4000]
+BOUNDARY_CONDITIONS = ['0Displacement0Slope', '0Moment0Shear', '0Slope0Shear',
+                       'Mirror', 'Periodic']
+# Cells on a side of the square load
+LOAD_SIZE = 8
+
+def cases(dimensions, methods, sizes):
+  """
+  Each case to run, as a dict of its parameters and its name
+  """
+  for dimension in dimensions:
+    for size in sizes:
+      for method in methods:
+        if method == 'FD':
+          for Solver in ['direct', 'iterative']:
+            if dimension == 2:
+              PlateSolutionTypes = ['vWC1994', 'energy']
+            else:
+              PlateSolutionTypes = ['vWC1994']
+            for PlateSolutionType in PlateSolutionTypes:
+              for BC in BOUNDARY_CONDITIONS:
+                yield case(dimension, method, size, Solver, PlateSolutionType, BC)
+        else:
+          yield case(dimension, method, size, None, None, 'NoOutsideLoads')
+
+def case(dimension, method, size, Solver, PlateSolutionType, BC):
+  parameters = {'dimension': dimension, 'method': method, 'size': size,
+                'solver': Solver, 'plate_solution_type': PlateSolutionType,
+                'bc': BC}
+  parts = ['F%dD' % dimension, method, Solver, PlateSolutionType, BC, str(size)]
+  parameters['name'] = '/'.join(part for part in parts if part is not None)
+  return parameters
+
+def make_flex(parameters, trace_memory=False):
+  """
+  The model for a case: a square load in the middle of the grid, with an
+  elastic thickness that varies smoothly across it (for the finite
+  difference method; constant for SAS)
+  """
+  dimension = parameters['dimension']
+  method = parameters['method']
+  n = parameters['size']
+  if dimension == 1:
+    flex = gflex.F1D()
+  else:
+    flex = gflex.F2D()
+  flex.Quiet = True
+  flex.ProfileMemory = trace_memory
+  flex.Method = method
+  flex.Solver = parameters['solver']
+  flex.PlateSolutionType = parameters['plate_solution_type'] or 'vWC1994'
+  flex.g = 9.8
+  flex.E = 65E9
+  flex.nu = 0.25
+  flex.rho_m = 3300.
+  flex.rho_fill = 0.
+  flex.dx = 5000.
+  flex.dy = 5000.
+  shape = (n,) * dimension
+  loaded = tuple([slice(n//2 - LOAD_SIZE//2, n//2 + LOAD_SIZE//2)] * dimension)
+  if method == 'FD':
+    x = np.arange(n)
+    Te = 25000. + 10000. * np.sin(2*np.pi*x/n)
+    flex.Te = Te * np.ones(shape)
+  else:
+    flex.Te = 25000.
+  if method == 'SAS_NG':
+    # Point loads at the cells of the load, and the deflections at all of
+    # the cells of the grid
+    centers = (np.arange(n) + 0.5) * flex.dx
+    points = np.meshgrid(*[centers[s] for s in loaded], indexing='ij')
+    points = [p.ravel() for p in points]
+    q = 1E7 * flex.dx**dimension * np.ones(points[0].size)
+    if dimension == 1:
+      flex.q0 = np.column_stack((points[0], q))
+      flex.xw = centers
+    else:
+      flex.q0 = np.column_stack((points[1], points[0], q))
+      yw, xw = np.meshgrid(centers, centers, indexing='ij')
+      flex.xw = xw.ravel()
+      flex.yw = yw.ravel()
+  else:
+    flex.qs = np.zeros(shape)
+    flex.qs[loaded] = 1E7
+  flex.BC_W = flex.BC_E = flex.BC_N = flex.BC_S = parameters['bc']
+  return flex
+
+def current_rss():
+  """
+  Resident memory of this process now [bytes] (Linux), or None
+  """
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+  except (IOError, OSError, ValueError):
+    return None
+
+def run_case(connection, parameters, trace_memory):
+  """
+  Runs in a process of its own: runs the case and sends back its results
+  """
+  try:
+    start_rss = current_rss()
+    flex = make_flex(parameters, trace_memory)
+    flex.initialize()
+    start = time.time()
+    flex.run()
+    wall_time = time.time() - start
+    peak_rss = max_rss()
+    result = {'status': 'ok', 'wall_time': wall_time,
+              'metrics': flex.metrics,
+              'w_max': float(np.abs(flex.w).max())}
+    if peak_rss is not None and start_rss is not None:
+      result['peak_memory'] = peak_rss - start_rss
+  except BaseException as error:
+    # Including the exits of gFlex
+    result = {'status': 'failed', 'error': repr(error)}
+  connection.send(json.loads(json.dumps(result, default=json_value)))
+  connection.close()
+
+def run(parameters, timeout, trace_memory):
+  connection, child_connection = multiprocessing.Pipe()
+  process = multiprocessing.Process(target=run_case,
+              args=(child_connection, parameters, trace_memory))
+  process.start()
+  if connection.poll(timeout):
+    result = connection.recv()
+  else:
+    process.terminate()
+    result = {'status': 'timeout', 'error': 'over %g s' % timeout}
+  process.join()
+  return result
+
+def cells(parameters):
+  return parameters['size'] ** parameters['dimension']
+
+def environment():
+  """
+  What the results were obtained with
+  """
+  try:
+    commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+               cwd=os.path.dirname(os.path.realpath(__file__)),
+               stderr=subprocess.STDOUT).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    commit = None
+  return {'gflex': __version__, 'git_commit': commit,
+          'python': platform.python_version(), 'numpy': np.__version__,
+          'scipy': scipy.__version__, 'machine': platform.machine(),
+          'system': platform.system(), 'processor': platform.processor(),
+          'cpus': multiprocessing.cpu_count()}
+
+def benchmark(arguments):
+  selected = [parameters for parameters in
+              cases(arguments.dimensions, arguments.methods, arguments.sizes)
+              if fnmatch.fnmatch(parameters['name'], arguments.only)]
+  if arguments.list:
+    for parameters in selected:
+      print(parameters['name'])
+    return
+  results = {'schema': SCHEMA, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'environment': environment(), 'cases': []}
+  output = arguments.output
+  if output is None:
+    output = 'benchmark_gflex-%s_%s.json' % (__version__,
+                                             time.strftime('%Y%m%d-%H%M%S'))
+  print("%-52s %-8s %10s %12s" % ("case", "status", "time [s]", "memory [MB]"))
+  for parameters in selected:
+    if parameters['dimension'] == 2 and cells(parameters) > arguments.max_cells:
+      result = {'status': 'skipped', 'error': 'over --max-cells'}
+    else:
+      result = run(parameters, arguments.timeout, arguments.trace_memory)
+    result.update(parameters)
+    results['cases'].append(result)
+    memory = result.get('peak_memory')
+    print("%-52s %-8s %10s %12s" % (parameters['name'], result['status'],
+          '%.3f' % result['wall_time'] if 'wall_time' in result else '',
+          '%.1f' % (memory / 2.**20) if memory is not None else ''))
+    # Written after each case, so that the results so far are kept
+    with open(output, 'w') as f:
+      json.dump(results, f, indent=1, sort_keys=True)
+  print("Results --> " + output)
+
+def compare(old_file, new_file, threshold):
+  """
+  Compares the times, memory and deflections of the cases that were run
+  successfully in both files, and returns the number of cases that are
+  slower or use more memory by more than the threshold (a ratio), or whose
+  deflections differ
+  """
+  with open(old_file) as f:
+    old = json.load(f)
+  with open(new_file) as f:
+    new = json.load(f)
+  old_cases = dict((result['name'], result) for result in old['cases'])
+  for name in ['gflex', 'git_commit', 'numpy', 'scipy']:
+    print("%-10s %-42s %s" % (name, old['environment'].get(name),
+                              new['environment'].get(name)))
+  print("%-52s %9s %9s %9s" % ("case", "time", "memory", "w_max"))
+  regressions = 0
+  for result in new['cases']:
+    previous = old_cases.get(result['name'])
+    if previous is None or previous['status'] != 'ok' or result['status'] != 'ok':
+      continue
+    time_ratio = result['wall_time'] / max(previous['wall_time'], 1E-9)
+    if result.get('peak_memory') and previous.get('peak_memory'):
+      memory_ratio = result['peak_memory'] / previous['peak_memory']
+    else:
+      memory_ratio = np.nan
+    # Relative to the previous deflection, unless that was zero
+    w_change = abs(result['w_max'] - previous['w_max'])
+    if previous['w_max'] != 0:
+      w_change /= abs(previous['w_max'])
+    elif w_change > 0:
+      w_change = np.inf
+    flags = []
+    if time_ratio > threshold:
+      flags.append('slower')
+    if memory_ratio > threshold:
+      flags.append('more memory')
+    if w_change > 1E-6:
+      flags.append('deflection changed')
+    regressions += bool(flags)
+    print("%-52s %8.2fx %8.2fx %9.1e %s" % (result['name'], time_ratio,
+          memory_ratio, w_change, ', '.join(flags)))
+  print(regressions, "regressions")
+  return regressions
+
+def integers(text):
+  return [int(value) for value in text.split(',')]
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="gFlex benchmark suite")
+  parser.add_argument('--sizes', type=integers, default=SIZES,
+                      help="cells on a side, comma-separated")
+  parser.add_argument('--dimensions', type=integers, default=[1, 2])
+  parser.add_argument('--methods', type=lambda text: text.split(','),
+                      default=['FD', 'SAS', 'SAS_NG'])
+  parser.add_argument('--only', default='*',
+                      help="run only the cases whose names match this pattern")
+  parser.add_argument('--max-cells', type=int, default=1000**2,
+                      help="skip 2D cases with more cells than this")
+  parser.add_argument('--timeout', type=float, default=600.,
+                      help="stop a case after this many seconds")
+  parser.add_argument('--trace-memory', action='store_true',
+                      help="record the memory allocated in each stage (slower)")
+  parser.add_argument('--output', help="results file (JSON)")
+  parser.add_argument('--list', action='store_true', help="list the cases")
+  parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                      help="compare two results files")
+  parser.add_argument('--threshold', type=float, default=1.2,
+                      help="ratio of times or memory that is a regression")
+  arguments = parser.parse_args(argv)
+  if arguments.compare:
+    return int(compare(arguments.compare[0], arguments.compare[1],
+                       arguments.threshold) > 0)
+  else:
+    benchmark(arguments)
+    return 0
+
+if __name__ == '__main__':
+  sys.exit(main())